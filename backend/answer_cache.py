@@ -0,0 +1,128 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation so trivial variants share a key"""
+    return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", question.strip().lower()))
+
+
+def context_hash(chunk_ids: Iterable[int], prompt_hash: str) -> str:
+    """Hash of the retrieved chunk IDs, in rank order, and the prompt template that used them"""
+    return hashlib.sha256(f"{prompt_hash}:{','.join(str(i) for i in chunk_ids)}".encode()).hexdigest()[:16]
+
+
+class AnswerCache:
+    """Thread-safe TTL + LRU cache of generated answers.
+
+    Entries are keyed by (document_id, normalized question, context hash), so an answer is
+    only reused when the same chunks were retrieved and the prompt template is unchanged.
+    With a similarity_threshold, a differently worded question whose query embedding is at
+    least that cosine-similar to a cached one, with the same context, also hits.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600,
+                 similarity_threshold: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        # key -> (answer, expires_at, generation_seconds, query_embedding)
+        self._entries: "OrderedDict[Tuple[str, str, str], tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_duplicate_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.seconds_saved = 0.0
+
+    def _live_entry(self, key: Tuple[str, str, str], now: float) -> Optional[tuple]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] <= now:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        return entry
+
+    def get(self, document_id: str, question: str, context: str,
+            query_embedding: Optional[np.ndarray] = None) -> Optional[str]:
+        """Return a cached answer, trying a near-duplicate match when a query embedding is given"""
+        key = (document_id, normalize_question(question), context)
+        now = time.time()
+        with self._lock:
+            entry = self._live_entry(key, now)
+            if entry is None and query_embedding is not None and self.similarity_threshold:
+                key, entry = self._nearest(document_id, context, query_embedding, now)
+                if entry is not None:
+                    self.near_duplicate_hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.seconds_saved += entry[2]
+            return entry[0]
+
+    def _nearest(self, document_id: str, context: str, query_embedding: np.ndarray,
+                 now: float) -> Tuple[Optional[tuple], Optional[tuple]]:
+        """Most similar cached question for the same document and context above the threshold"""
+        candidates = [
+            key for key, entry in self._entries.items()
+            if key[0] == document_id and key[2] == context and entry[3] is not None and entry[1] > now
+        ]
+        if not candidates:
+            return None, None
+        embeddings = np.stack([self._entries[key][3] for key in candidates])
+        similarities = embeddings @ query_embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None, None
+        return candidates[best], self._entries[candidates[best]]
+
+    def put(self, document_id: str, question: str, context: str, answer: str,
+            generation_seconds: float, query_embedding: Optional[np.ndarray] = None):
+        """Cache an answer along with how long it took to generate"""
+        key = (document_id, normalize_question(question), context)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (answer, time.time() + self.ttl_seconds, generation_seconds, query_embedding)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_document(self, document_id: str) -> int:
+        """Drop every answer for a document, e.g. after it is deleted or re-indexed"""
+        with self._lock:
+            keys: List[Tuple[str, str, str]] = [key for key in self._entries if key[0] == document_id]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit rate, latency saved and eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "near_duplicate_hits": self.near_duplicate_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "seconds_saved": round(self.seconds_saved, 3),
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import tarfile
+import zipfile
+import zlib
+from typing import Callable, Iterator, Optional, Set, Tuple
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+def archive_suffix(filename: str) -> Optional[str]:
+    """The archive suffix a filename ends with, or None if it is not an archive"""
+    name = filename.lower()
+    for suffix in ARCHIVE_SUFFIXES:
+        if name.endswith(suffix):
+            return suffix
+    return None
+
+
+class ArchiveEntry:
+    """A file read out of an archive: saved to path, or skipped/failed with a reason"""
+
+    __slots__ = ("name", "path", "size", "sha256", "error", "skipped")
+
+    def __init__(self, name: str, path: Optional[str] = None, size: int = 0, sha256: Optional[str] = None,
+                 error: Optional[str] = None, skipped: bool = False):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.error = error
+        self.skipped = skipped
+
+
+def _copy_entry(source, path: str, max_size: int, chunk_size: int) -> Tuple[int, str]:
+    """Copy one entry in chunks, hashing it on the way; raises ValueError past max_size"""
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "wb") as f:
+            for block in iter(lambda: source.read(chunk_size), b""):
+                size += len(block)
+                # Checked on the bytes actually read, since archive headers can understate sizes
+                if size > max_size:
+                    raise ValueError(f"File size exceeds maximum allowed size of {max_size / (1024*1024)}MB")
+                digest.update(block)
+                f.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return size, digest.hexdigest()
+
+
+def _members(archive_path: str, suffix: str) -> Iterator[Tuple[str, bool, Callable]]:
+    """(name, is_regular_file, open) for each member, in archive order"""
+    if suffix == ".zip":
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                yield info.filename, not info.is_dir(), lambda info=info: archive.open(info)
+    else:
+        # Stream mode reads members strictly in order, without seeking back or indexing the archive
+        with tarfile.open(archive_path, "r|*") as archive:
+            for member in archive:
+                yield member.name, member.isfile(), lambda member=member: archive.extractfile(member)
+
+
+def read_archive(archive_path: str, suffix: str, destination: Callable[[str], str],
+                 allowed_extensions: Set[str], max_file_size: int, max_entries: int,
+                 chunk_size: int = 1024 * 1024) -> Iterator[ArchiveEntry]:
+    """Read the files of a zip or tar archive one at a time.
+
+    Each supported entry is copied to destination(name) only when the iterator reaches it,
+    so the archive is never unpacked as a whole. Entries with other extensions, past
+    max_entries or over max_file_size come back skipped or failed instead. The file names
+    inside the archive are never used as paths.
+    """
+    entries = 0
+    for name, is_file, open_member in _members(archive_path, suffix):
+        if not is_file:
+            continue
+        extension = os.path.splitext(name)[1].lower()
+        if extension not in allowed_extensions:
+            yield ArchiveEntry(name, error=f"File type {extension} not supported", skipped=True)
+            continue
+        entries += 1
+        if entries > max_entries:
+            yield ArchiveEntry(name, error=f"Archive has more than {max_entries} supported files", skipped=True)
+            continue
+        path = destination(name)
+        try:
+            with open_member() as source:
+                size, sha256 = _copy_entry(source, path, max_file_size, chunk_size)
+        except (ValueError, OSError, RuntimeError, zlib.error, zipfile.BadZipFile, tarfile.TarError) as e:
+            yield ArchiveEntry(name, error=str(e))
+            continue
+        yield ArchiveEntry(name, path, size, sha256)
@@ -0,0 +1,410 @@
+"""
+Performance benchmarks for the RAG backend.
+
+Usage:
+    python benchmark.py pdf [--pdf PATH] [--pages 300] [--workers 1 2 4 8]
+    python benchmark.py corpus [--documents 10000] [--chunks-per-document 10]
+    python benchmark.py ann [--vectors 200000] [--queries 200]
+    python benchmark.py llm --base-url http://localhost:8001 [--requests 200] [--distinct 50]
+    python benchmark.py embed [--backends tfidf hashing sentence_transformers] [--batch-sizes 16 32 64]
+    python benchmark.py retrieval [--queries-per-document 200] [--query-words 5]
+
+The llm benchmark load-tests the LLM client against fake_llm_server.py (or any compatible server).
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import faiss
+import numpy as np
+import PyPDF2
+
+from corpus_index import CorpusIndex
+from document_processor import DocumentProcessor, pdf_page_count
+from embeddings import CachedEmbedder, HashingEmbeddingModel, SentenceTransformerEmbedder
+from index_factory import create_index, resolve_index_type, search_parameters
+from llm_client import LLMClient, LLMError, create_provider
+from rank_fusion import reciprocal_rank_fusion
+from vector_store import VectorStore, build_embeddings
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SAMPLE_PDF = os.path.join(ROOT_DIR, "Sample_Test1.pdf")
+SAMPLE_DOCS_DIR = os.path.join(ROOT_DIR, "sample_documents")
+QUESTIONS = [
+    "What is the main conclusion of this document?",
+    "What percentage increase in efficiency was reported?",
+    "What are the three key recommendations?",
+    "What challenges do businesses face with AI adoption?",
+    "How much have sea levels risen?",
+    "What are the trends in renewable energy?",
+]
+
+
+def sample_chunks() -> list:
+    """Chunks of every sample document"""
+    processor = DocumentProcessor()
+    chunks = []
+    for name in sorted(os.listdir(SAMPLE_DOCS_DIR)):
+        path = os.path.join(SAMPLE_DOCS_DIR, name)
+        chunks.extend(processor.chunk_document(path, os.path.splitext(name)[1]))
+    return chunks
+
+
+def percentiles(samples: list) -> str:
+    samples = sorted(samples)
+    p50 = samples[len(samples) // 2] * 1000
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000
+    return f"p50={p50:8.2f}ms p95={p95:8.2f}ms"
+
+
+def build_sample_pdf(pages: int) -> str:
+    """Build a PDF with the requested number of pages by repeating the sample PDF"""
+    reader = PyPDF2.PdfReader(SAMPLE_PDF)
+    writer = PyPDF2.PdfWriter()
+    for i in range(pages):
+        writer.add_page(reader.pages[i % len(reader.pages)])
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        writer.write(f)
+    return path
+
+
+def bench_pdf(args):
+    """Page-parallel PDF extraction speedup over a single process"""
+    path = args.pdf or build_sample_pdf(args.pages)
+    print(f"PDF: {path}")
+
+    baseline = None
+    for workers in args.workers:
+        processor = DocumentProcessor(pdf_workers=workers, pdf_pages_per_task=args.pages_per_task)
+        # A long-lived pool, as the server's CPU pool is; its startup is not part of the timing
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            list(pool.map(pdf_page_count, [path] * workers))
+            start = time.perf_counter()
+            pages = processor.extract_pdf_pages(path, pool if workers > 1 else None)
+            elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+
+        page_times = sorted(page.seconds for page in pages)
+        print(
+            f"  workers={workers:<3} pages={len(pages):<5} total={elapsed:7.3f}s "
+            f"speedup={baseline / elapsed:5.2f}x "
+            f"page_p50={page_times[len(page_times) // 2] * 1000:6.1f}ms "
+            f"page_max={page_times[-1] * 1000:6.1f}ms "
+            f"failed={sum(1 for page in pages if page.error)}"
+        )
+
+    if not args.pdf:
+        os.remove(path)
+
+
+def bench_corpus(args):
+    """Cross-document search: one corpus-wide FAISS call vs one search per document index"""
+    random.seed(0)
+    base_chunks = sample_chunks()
+    corpus = CorpusIndex(index_dir=tempfile.mkdtemp())
+
+    print(f"Building corpus of {args.documents} documents x {args.chunks_per_document} chunks...")
+    per_document = []
+    start = time.perf_counter()
+    for i in range(args.documents):
+        chunks = random.sample(base_chunks, min(args.chunks_per_document, len(base_chunks)))
+        corpus.add_document(f"doc-{i}", chunks, save=False)
+        if i < args.baseline_documents:
+            index = faiss.IndexFlatIP(corpus.embedding_dim)
+            index.add(corpus.model.embed(chunks))
+            per_document.append(index)
+    print(f"  built in {time.perf_counter() - start:.1f}s, {corpus.index.ntotal} vectors")
+
+    def timed(fn):
+        samples = []
+        for _ in range(args.queries):
+            question = random.choice(QUESTIONS)
+            start = time.perf_counter()
+            fn(question)
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    all_docs = timed(lambda q: corpus.search(q, args.top_k))
+    subset = [f"doc-{i}" for i in random.sample(range(args.documents), min(10, args.documents))]
+    filtered = timed(lambda q: corpus.search(q, args.top_k, subset))
+
+    def per_document_search(question):
+        embedding = corpus.model.embed([question])
+        for index in per_document:
+            index.search(embedding, args.top_k)
+
+    baseline = timed(per_document_search)
+    scale = args.documents / max(1, len(per_document))
+
+    print(f"  corpus search, all documents:      {percentiles(all_docs)}")
+    print(f"  corpus search, 10-document filter: {percentiles(filtered)}")
+    print(f"  per-document loop, {len(per_document)} indexes:  {percentiles(baseline)}"
+          f" (~{np.median(baseline) * scale * 1000:.0f}ms extrapolated to {args.documents}, excluding index loads)")
+
+
+def clustered_vectors(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """L2-normalized vectors drawn around random centers, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def bench_ann(args):
+    """Recall@k and latency of approximate index types against the exact flat index"""
+    vectors = clustered_vectors(args.vectors, args.dim, args.clusters, seed=0)
+    queries = clustered_vectors(args.queries, args.dim, args.clusters, seed=1)
+
+    flat = create_index("flat", args.dim, faiss.METRIC_INNER_PRODUCT)
+    flat.add(vectors)
+    _, truth = flat.search(queries, args.k)
+
+    configs = [("flat", [None])]
+    configs += [("ivf_flat", [1, 4, 16, 64]), ("ivf_pq", [4, 16, 64]), ("hnsw", [16, 64, 256])]
+
+    print(f"{args.vectors} vectors, dim={args.dim}, recall@{args.k} against flat over {args.queries} queries")
+    for index_type, knobs in configs:
+        if resolve_index_type(index_type, args.vectors) != index_type:
+            print(f"  {index_type:<9} skipped: too few vectors to train")
+            continue
+        start = time.perf_counter()
+        index = create_index(index_type, args.dim, faiss.METRIC_INNER_PRODUCT, vectors)
+        index.add(vectors)
+        build_time = time.perf_counter() - start
+
+        for knob in knobs:
+            params = search_parameters(index, nprobe=knob, ef_search=knob)
+            samples = []
+            found = np.empty_like(truth)
+            for i, query in enumerate(queries):
+                start = time.perf_counter()
+                _, ids = index.search(query[None, :], args.k, params=params)
+                samples.append(time.perf_counter() - start)
+                found[i] = ids[0]
+            recall = np.mean([len(set(found[i]) & set(truth[i])) / args.k for i in range(len(queries))])
+            knob_name = {"ivf_flat": "nprobe", "ivf_pq": "nprobe", "hnsw": "efSearch"}.get(index_type, "")
+            label = f"{knob_name}={knob}" if knob else ""
+            print(f"  {index_type:<9} {label:<13} recall={recall:5.3f} {percentiles(samples)} build={build_time:6.1f}s")
+
+
+def bench_llm(args):
+    """Concurrent LLM load: throughput, latency and calls saved by request coalescing"""
+    async def run():
+        client = LLMClient(
+            create_provider(args.provider, "benchmark", args.base_url),
+            concurrency=args.concurrency,
+            timeout=args.timeout,
+            max_retries=args.max_retries,
+            backoff_base=0.05
+        )
+        samples, failures = [], 0
+
+        async def one(i: int):
+            nonlocal failures
+            prompt = i % args.distinct
+            messages = [{"role": "user", "content": f"Question: {QUESTIONS[prompt % len(QUESTIONS)]} ({prompt})\n"}]
+            start = time.perf_counter()
+            try:
+                await client.complete(messages, model="benchmark")
+                samples.append(time.perf_counter() - start)
+            except LLMError:
+                failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - start
+        await client.aclose()
+
+        print(f"{args.requests} requests ({args.distinct} distinct prompts), concurrency={args.concurrency}")
+        print(f"  total={elapsed:6.2f}s throughput={args.requests / elapsed:7.1f} req/s {percentiles(samples)} failed={failures}")
+        print(f"  {client.stats()}")
+
+    asyncio.run(run())
+
+
+def bench_embed(args):
+    """Embedding throughput in chunks/sec per backend and batch size, and with a warm embedding cache"""
+    base_chunks = sample_chunks()
+    # Make every chunk distinct so the cache cannot serve repeats within one pass
+    chunks = [f"{base_chunks[i % len(base_chunks)]} ({i})" for i in range(args.chunks)]
+    print(f"{len(chunks)} chunks")
+
+    def report(label: str, embed):
+        start = time.perf_counter()
+        embed(chunks)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<44} {len(chunks) / elapsed:9.1f} chunks/s ({elapsed:6.2f}s)")
+
+    for backend in args.backends:
+        if backend == "tfidf":
+            for batch_size in args.batch_sizes:
+                report(f"tfidf (fit per document) batch={batch_size}",
+                       lambda texts: build_embeddings(texts, batch_size=batch_size))
+            continue
+
+        if backend == "hashing":
+            # Hashing is a single sparse transform with no batch size to tune
+            embedders = {"hashing": HashingEmbeddingModel()}
+        else:
+            embedders = {
+                f"{backend} batch={batch_size}": SentenceTransformerEmbedder(args.model_path, batch_size=batch_size)
+                for batch_size in args.batch_sizes
+            }
+        try:
+            for embedder in embedders.values():
+                embedder.embed(chunks[:1])  # Load the model outside the timing
+        except (ImportError, OSError) as e:
+            print(f"  {backend}: skipped ({e})")
+            continue
+        for label, embedder in embedders.items():
+            report(label, embedder.embed)
+
+        cached = CachedEmbedder(embedder, os.path.join(tempfile.mkdtemp(), "embeddings.sqlite3"))
+        report(f"{label} + cache, cold", cached.embed)
+        report(f"{label} + cache, warm (re-ingest)", cached.embed)
+        cached.close()
+
+
+def sample_documents() -> dict:
+    """Chunks of every sample text document and sample PDF, keyed by file name"""
+    processor = DocumentProcessor()
+    paths = [os.path.join(SAMPLE_DOCS_DIR, name) for name in sorted(os.listdir(SAMPLE_DOCS_DIR))]
+    paths += [os.path.join(ROOT_DIR, name) for name in ("Sample_Test1.pdf", "Sample_Test2.pdf")]
+    return {
+        os.path.basename(path): processor.chunk_document(path, os.path.splitext(path)[1])
+        for path in paths if os.path.exists(path)
+    }
+
+
+def bench_retrieval(args):
+    """Dense FAISS/TF-IDF vs sparse BM25 vs hybrid retrieval: known-item quality, latency and index size.
+
+    Each query is a random run of words from one chunk; a hit is any returned chunk containing it
+    (chunks overlap, so there can be several). This rewards exact lexical matching, which is what
+    the capped TF-IDF vocabulary loses.
+    """
+    random.seed(0)
+    store = VectorStore(store_dir=tempfile.mkdtemp())
+    pool = ThreadPoolExecutor(max_workers=1)
+
+    def hybrid(document_id: str, query: str, concurrent: bool) -> list:
+        # Same shape as the API's hybrid mode: both rankers over the candidate pool, then RRF
+        if concurrent:
+            dense_future = pool.submit(store.search, document_id, query, args.candidates, mode="dense")
+            sparse = store.search(document_id, query, args.candidates, mode="sparse")
+            dense = dense_future.result()
+        else:
+            dense = store.search(document_id, query, args.candidates, mode="dense")
+            sparse = store.search(document_id, query, args.candidates, mode="sparse")
+        return reciprocal_rank_fusion({"dense": dense, "sparse": sparse}, top_k=10)[0]
+
+    modes = {
+        "dense": lambda document_id, query: store.search(document_id, query, 10, mode="dense"),
+        "sparse": lambda document_id, query: store.search(document_id, query, 10, mode="sparse"),
+        "hybrid": lambda document_id, query: hybrid(document_id, query, concurrent=True),
+        "hybrid (sequential)": lambda document_id, query: hybrid(document_id, query, concurrent=False),
+    }
+    totals = {mode: {"recall": 0, "rr": 0.0, "samples": []} for mode in modes}
+    n_queries = 0
+
+    for name, chunks in sample_documents().items():
+        store.process_and_store(name, chunks, {"document_id": name})
+        index, _, model, _ = store.load_index(name)
+        sparse_index, _ = store.load_sparse_index(name)
+        normalized = [" ".join(chunk.split()) for chunk in chunks]
+
+        queries = []
+        for _ in range(args.queries_per_document):
+            words = random.choice(normalized).split()
+            start = random.randrange(max(1, len(words) - args.query_words + 1))
+            queries.append(" ".join(words[start:start + args.query_words]))
+
+        print(f"{name}: {len(chunks)} chunks, dense vocabulary {len(model.vectorizer.vocabulary_)} terms "
+              f"({index.ntotal * index.d * 4} vector bytes), sparse vocabulary {len(sparse_index.terms)} terms "
+              f"({sparse_index.nbytes} bytes)")
+
+        for mode, search in modes.items():
+            total = totals[mode]
+            for query in queries:
+                start = time.perf_counter()
+                results = search(name, query)
+                total["samples"].append(time.perf_counter() - start)
+                ranks = [rank for rank, (_, _, idx) in enumerate(results, 1) if query in normalized[idx]]
+                total["recall"] += bool(ranks) and ranks[0] <= args.k
+                total["rr"] += 1 / ranks[0] if ranks else 0.0
+        n_queries += len(queries)
+
+    pool.shutdown()
+    print(f"{n_queries} known-item queries of {args.query_words} words")
+    for mode, total in totals.items():
+        print(f"  {mode:<20} recall@{args.k}={total['recall'] / n_queries:.3f} MRR@10={total['rr'] / n_queries:.3f} "
+              f"{percentiles(total['samples'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG backend benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    pdf_parser = subparsers.add_parser("pdf", help="Parallel PDF text extraction")
+    pdf_parser.add_argument("--pdf", help="PDF to extract (default: sample PDF repeated to --pages)")
+    pdf_parser.add_argument("--pages", type=int, default=300)
+    pdf_parser.add_argument("--pages-per-task", type=int, default=16)
+    pdf_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    pdf_parser.set_defaults(func=bench_pdf)
+
+    corpus_parser = subparsers.add_parser("corpus", help="Cross-document corpus index search latency")
+    corpus_parser.add_argument("--documents", type=int, default=10000)
+    corpus_parser.add_argument("--chunks-per-document", type=int, default=10)
+    corpus_parser.add_argument("--baseline-documents", type=int, default=1000,
+                               help="Per-document indexes searched for the baseline")
+    corpus_parser.add_argument("--queries", type=int, default=50)
+    corpus_parser.add_argument("--top-k", type=int, default=3)
+    corpus_parser.set_defaults(func=bench_corpus)
+
+    ann_parser = subparsers.add_parser("ann", help="Approximate index recall vs latency")
+    ann_parser.add_argument("--vectors", type=int, default=200000)
+    ann_parser.add_argument("--queries", type=int, default=200)
+    ann_parser.add_argument("--dim", type=int, default=384)
+    ann_parser.add_argument("--clusters", type=int, default=1000)
+    ann_parser.add_argument("--k", type=int, default=10)
+    ann_parser.set_defaults(func=bench_ann)
+
+    llm_parser = subparsers.add_parser("llm", help="LLM client load test against a local stub server")
+    llm_parser.add_argument("--base-url", required=True, help="e.g. http://localhost:8001 for fake_llm_server.py")
+    llm_parser.add_argument("--provider", default="openai_compatible", choices=["groq", "openai_compatible"])
+    llm_parser.add_argument("--requests", type=int, default=200)
+    llm_parser.add_argument("--distinct", type=int, default=50, help="Distinct prompts among the requests")
+    llm_parser.add_argument("--concurrency", type=int, default=16)
+    llm_parser.add_argument("--timeout", type=float, default=30.0)
+    llm_parser.add_argument("--max-retries", type=int, default=3)
+    llm_parser.set_defaults(func=bench_llm)
+
+    embed_parser = subparsers.add_parser("embed", help="Embedding throughput per backend, with and without the cache")
+    embed_parser.add_argument("--backends", nargs="+", default=["tfidf", "hashing", "sentence_transformers"],
+                              choices=["tfidf", "hashing", "sentence_transformers"])
+    embed_parser.add_argument("--model-path", default="models/all-MiniLM-L6-v2",
+                              help="Local sentence-transformers model saved by download_model.py")
+    embed_parser.add_argument("--chunks", type=int, default=2000)
+    embed_parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 32, 64])
+    embed_parser.set_defaults(func=bench_embed)
+
+    retrieval_parser = subparsers.add_parser("retrieval", help="Dense vs sparse BM25 vs hybrid retrieval quality and latency")
+    retrieval_parser.add_argument("--queries-per-document", type=int, default=200)
+    retrieval_parser.add_argument("--query-words", type=int, default=5)
+    retrieval_parser.add_argument("--k", type=int, default=3)
+    retrieval_parser.add_argument("--candidates", type=int, default=20, help="Chunks per ranker before hybrid fusion")
+    retrieval_parser.set_defaults(func=bench_retrieval)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Load a corpus through the bulk ingestion endpoint of a running server.
+
+Paths may be documents, zip/tar archives of documents, or directories, which are searched
+recursively for both. Files are sent in batches of up to BULK_MAX_FILES per request:
+
+    python bulk_ingest.py ../sample_documents reports.zip --api-url http://localhost:8000
+"""
+import argparse
+import os
+import time
+from contextlib import ExitStack
+from typing import Iterator, List
+
+import httpx
+
+from archives import archive_suffix
+from config import config
+
+
+def _supported(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in config.ALLOWED_EXTENSIONS or archive_suffix(path) is not None
+
+
+def collect_files(paths: List[str]) -> List[str]:
+    """Supported files among paths, with directories expanded in sorted order"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names) if _supported(name))
+        elif _supported(path):
+            files.append(path)
+        else:
+            print(f"Skipping unsupported file: {path}")
+    return files
+
+
+def batches(files: List[str], max_files: int, max_bytes: int) -> Iterator[List[str]]:
+    """Group files into requests within the server's file count and size limits"""
+    batch, batch_bytes = [], 0
+    for path in files:
+        size = os.path.getsize(path)
+        if batch and (len(batch) == max_files or batch_bytes + size > max_bytes):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(path)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def upload_batch(client: httpx.Client, api_url: str, paths: List[str]) -> dict:
+    # httpx streams each file from disk rather than loading the batch into memory
+    with ExitStack() as stack:
+        files = [("files", (os.path.basename(path), stack.enter_context(open(path, "rb")))) for path in paths]
+        response = client.post(f"{api_url}/api/documents/bulk", files=files)
+    if response.status_code != 200:
+        raise RuntimeError(f"Bulk upload failed ({response.status_code}): {response.text}")
+    return response.json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--api-url", default="http://localhost:8000")
+    parser.add_argument("--batch-size", type=int, default=config.BULK_MAX_FILES)
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds to wait for each batch")
+    args = parser.parse_args()
+
+    files = collect_files(args.paths)
+    if not files:
+        print("No supported files found")
+        return
+
+    start_time = time.time()
+    completed = failed = skipped = total_bytes = 0
+    with httpx.Client(timeout=args.timeout) as client:
+        for batch in batches(files, min(args.batch_size, config.BULK_MAX_FILES), config.BULK_MAX_UPLOAD_SIZE):
+            result = upload_batch(client, args.api_url.rstrip("/"), batch)
+            for item in result["results"]:
+                detail = item["error"] or f"{item['chunk_count']} chunks, {item['processing_time']}s"
+                if item["duplicate_of"]:
+                    detail += f", duplicate of {item['duplicate_of']}"
+                print(f"{item['status']:>9}  {item['filename']}  ({detail})")
+            completed += result["completed"]
+            failed += result["failed"]
+            skipped += result["skipped"]
+            total_bytes += result["total_bytes"]
+            print(f"Batch: {result['completed']} document(s) at {result['documents_per_second']} docs/s, "
+                  f"{result['mb_per_second']} MB/s")
+
+    elapsed = time.time() - start_time
+    print(f"Ingested {completed} document(s), {failed} failed, {skipped} skipped, "
+          f"{total_bytes / (1024*1024):.1f}MB in {elapsed:.2f}s "
+          f"({completed / elapsed:.2f} docs/s, {total_bytes / (1024*1024) / elapsed:.2f} MB/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import base64
+import bisect
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def _sort_time(upload_time: str) -> str:
+    # Records carry ISO timestamps or "YYYY-MM-DD HH:MM:SS"; both order correctly once alike
+    return (upload_time or "").replace(" ", "T")
+
+
+def _bound(value: datetime) -> str:
+    """A datetime filter as a sortable timestamp string; stored upload times are naive UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+
+def encode_cursor(key: Tuple[str, str]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Raises ValueError for a cursor this catalog did not issue"""
+    try:
+        upload_time, document_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return str(upload_time), str(document_id)
+
+
+class DocumentCatalog:
+    """In-memory index of document records for listing, newest first.
+
+    Loaded once at startup and updated as documents are added and deleted. Records are kept
+    sorted by (upload time, document ID), so a page starts with a binary search from its
+    cursor or date bound, whatever the number of documents.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents: Dict[str, dict] = {}
+        # Ascending; listings walk it backwards
+        self._keys: List[Tuple[str, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    @staticmethod
+    def _key(document: dict) -> Tuple[str, str]:
+        return _sort_time(document["upload_time"]), document["id"]
+
+    def load(self, documents: Iterable[dict]):
+        with self._lock:
+            self._documents = {document["id"]: dict(document) for document in documents}
+            self._keys = sorted(self._key(document) for document in self._documents.values())
+
+    def add(self, document: dict):
+        with self._lock:
+            self._discard(document["id"])
+            self._documents[document["id"]] = dict(document)
+            bisect.insort(self._keys, self._key(document))
+
+    def remove(self, document_id: str):
+        with self._lock:
+            self._discard(document_id)
+
+    def _discard(self, document_id: str):
+        document = self._documents.pop(document_id, None)
+        if document is not None:
+            key = self._key(document)
+            del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def get(self, document_id: str) -> Optional[dict]:
+        return self._documents.get(document_id)
+
+    def page(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+             filename_prefix: Optional[str] = None, uploaded_after: Optional[datetime] = None,
+             uploaded_before: Optional[datetime] = None) -> Tuple[List[dict], Optional[str]]:
+        """One page of documents, newest first, and the cursor for the next page (None at the end).
+
+        filename_prefix matches case-insensitively; the date range includes its bounds.
+        """
+        prefix = filename_prefix.lower() if filename_prefix else None
+        after = _bound(uploaded_after) if uploaded_after else None
+
+        with self._lock:
+            # Everything before this position in _keys is older than the cursor and the upper bound
+            end = len(self._keys)
+            if cursor:
+                end = bisect.bisect_left(self._keys, decode_cursor(cursor))
+            if uploaded_before:
+                # The upper bound is inclusive: "\uffff" sorts after any document ID at that time
+                end = min(end, bisect.bisect_right(self._keys, (_bound(uploaded_before), "\uffff")))
+
+            documents = []
+            last_key = None
+            for position in range(end - 1, -1, -1):
+                key = self._keys[position]
+                if after is not None and key[0] < after:
+                    break
+                document = self._documents[key[1]]
+                if prefix and not document["filename"].lower().startswith(prefix):
+                    continue
+                if limit is not None and len(documents) == limit:
+                    return documents, encode_cursor(last_key)
+                documents.append(document)
+                last_key = key
+        return documents, None
@@ -0,0 +1,59 @@
+import mmap
+import os
+import numpy as np
+from typing import Iterator, List, Sequence, Union
+
+TEXT_FILE = "chunks.bin"
+OFFSETS_FILE = "chunk_offsets.npy"
+
+
+def write_chunks(directory: str, chunks: Sequence[str]):
+    """Write chunk texts as one contiguous UTF-8 file plus an int64 offset table of len(chunks) + 1 entries"""
+    encoded = [chunk.encode("utf-8") for chunk in chunks]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+
+    with open(os.path.join(directory, TEXT_FILE), 'wb') as f:
+        for data in encoded:
+            f.write(data)
+    np.save(os.path.join(directory, OFFSETS_FILE), offsets)
+
+
+def chunks_exist(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, TEXT_FILE)) and \
+        os.path.exists(os.path.join(directory, OFFSETS_FILE))
+
+
+class MappedChunks(Sequence[str]):
+    """Read-only list of a document's chunk texts backed by memory-mapped files.
+
+    Opening maps the files without reading them; indexing decodes a single chunk, so a
+    search touches only the pages holding the chunks it returns.
+    """
+
+    def __init__(self, directory: str):
+        self._offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(directory, TEXT_FILE), 'rb') as f:
+            # Zero-length files cannot be mapped
+            self._text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self._offsets[-1] else b""
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("chunk index out of range")
+        return self._text[int(self._offsets[i]):int(self._offsets[i + 1])].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the mapped text and offset table, all of which may become resident"""
+        return int(self._offsets[-1]) + self._offsets.nbytes
@@ -0,0 +1,101 @@
+from typing import Hashable, List, NamedTuple, Optional, Sequence, Tuple
+
+# Rough characters per token for English text with Llama-family tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count without loading a tokenizer"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class Passage(NamedTuple):
+    """One block of prompt context: a retrieved chunk, or a run of adjacent chunks merged together"""
+    text: str
+    score: float  # Best relevance score among the merged chunks
+    chunk_indices: Tuple[int, ...]
+    group: Optional[Hashable] = None  # Document the chunks came from, when packing several
+
+    @property
+    def label(self) -> str:
+        first, last = self.chunk_indices[0] + 1, self.chunk_indices[-1] + 1
+        return f"Chunk {first}" if first == last else f"Chunks {first}-{last}"
+
+
+class PackedContext(NamedTuple):
+    passages: List[Passage]
+    tokens: int  # Estimated tokens of the packed context
+    tokens_saved: int  # Versus concatenating every retrieved chunk in full
+
+
+def _overlap_words(left: List[str], right: List[str]) -> int:
+    """Length of the longest suffix of left that is also a prefix of right"""
+    for size in range(min(len(left), len(right)), 0, -1):
+        if left[-size:] == right[:size]:
+            return size
+    return 0
+
+
+def _merge_run(run: List[Tuple[str, float, int]], group: Optional[Hashable]) -> Passage:
+    """Join consecutive chunks, dropping the words each one repeats from the previous chunk"""
+    words = run[0][0].split()
+    for chunk_text, _, _ in run[1:]:
+        next_words = chunk_text.split()
+        words.extend(next_words[_overlap_words(words, next_words):])
+    return Passage(" ".join(words), max(score for _, score, _ in run), tuple(idx for _, _, idx in run), group)
+
+
+def merge_adjacent(results: Sequence[Tuple[str, float, int]],
+                   groups: Optional[Sequence[Hashable]] = None) -> List[Passage]:
+    """Merge retrieved chunks with consecutive indices into single passages, best passage first.
+
+    Chunks overlap their predecessor by CHUNK_OVERLAP words, so neighbours share text that
+    would otherwise be sent twice. Chunks only merge within the same group (document).
+    """
+    groups = groups if groups is not None else [None] * len(results)
+    by_group = {}
+    for result, group in zip(results, groups):
+        by_group.setdefault(group, {})[result[2]] = result
+
+    passages = []
+    for group, by_index in by_group.items():
+        run: List[Tuple[str, float, int]] = []
+        for idx in sorted(by_index):
+            if run and idx != run[-1][2] + 1:
+                passages.append(_merge_run(run, group))
+                run = []
+            run.append(by_index[idx])
+        passages.append(_merge_run(run, group))
+
+    return sorted(passages, key=lambda passage: passage.score, reverse=True)
+
+
+def _truncate(passage: Passage, max_tokens: int) -> Passage:
+    """Cut a passage at a word boundary to fit max_tokens"""
+    text = passage.text[:max_tokens * CHARS_PER_TOKEN]
+    if len(text) < len(passage.text) and " " in text:
+        text = text[:text.rindex(" ")]
+    return passage._replace(text=text)
+
+
+def pack_context(results: Sequence[Tuple[str, float, int]], token_budget: Optional[int] = None,
+                 groups: Optional[Sequence[Hashable]] = None) -> PackedContext:
+    """Deduplicate and merge retrieved chunks, then fill the token budget in relevance order.
+
+    Passages that don't fit are skipped in favour of smaller, less relevant ones; the most
+    relevant passage is truncated rather than dropped if it alone exceeds the budget.
+    """
+    full_tokens = sum(estimate_tokens(chunk_text) for chunk_text, _, _ in results)
+
+    packed, tokens = [], 0
+    for passage in merge_adjacent(results, groups):
+        cost = estimate_tokens(passage.text)
+        if token_budget is not None and tokens + cost > token_budget:
+            if packed:
+                continue
+            passage = _truncate(passage, token_budget)
+            cost = estimate_tokens(passage.text)
+        packed.append(passage)
+        tokens += cost
+
+    return PackedContext(packed, tokens, full_tokens - tokens)
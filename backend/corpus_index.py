@@ -0,0 +1,315 @@
+import os
+import json
+import threading
+import faiss
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from embeddings import Embedder, HashingEmbeddingModel
+from store_integrity import fsync_dir
+from index_factory import (
+    create_index, extract_vectors, index_type_of, resolve_index_type,
+    search_parameters, supports_removal, with_ids
+)
+
+# Vector IDs pack the document key into the high 32 bits and the chunk index into the low 32
+CHUNK_BITS = 32
+# An IVF index is retrained once the corpus grows this much past its training set
+RETRAIN_GROWTH_FACTOR = 4
+# The key table and index are saved together in one file: a JSON header line, then the FAISS index
+CORPUS_FILE = "corpus.idx"
+CORPUS_FORMAT = 1
+
+
+class CorpusIndex:
+    """Single FAISS index over every document's chunks for cross-document search.
+
+    Changes are saved at most once per save_interval seconds, so a burst of uploads costs
+    one write of the index rather than one per document. A crash loses at most that
+    window, which sync() backfills from the vector stores at startup.
+    """
+
+    def __init__(self, index_dir: str = "corpus_index", embedding_dim: int = 384, batch_size: int = 256,
+                 index_type: str = "auto", nprobe: int = 16, ef_search: int = 64, hnsw_m: int = 32,
+                 embedder: Optional[Embedder] = None, save_interval: float = 5.0):
+        self.index_dir = index_dir
+        self.save_interval = save_interval
+        # Any shared embedder works; the hashing model needs no download
+        self.model = embedder or HashingEmbeddingModel(embedding_dim)
+        self.embedding_dim = self.model.embedding_dim
+        self.batch_size = batch_size
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.hnsw_m = hnsw_m
+        self._lock = threading.RLock()
+        # Serializes writers of the corpus file; held without _lock while the file is written
+        self._save_lock = threading.Lock()
+        self._version = 0  # Bumped by every change, so a save knows whether it is current
+        self._saved_version = 0
+        self._save_timer: Optional[threading.Timer] = None
+
+        os.makedirs(index_dir, exist_ok=True)
+        self._load()
+
+    def _corpus_path(self) -> str:
+        return os.path.join(self.index_dir, CORPUS_FILE)
+
+    def _legacy_paths(self) -> Tuple[str, str]:
+        # Saved as two files before CORPUS_FORMAT 1
+        return os.path.join(self.index_dir, "index.faiss"), os.path.join(self.index_dir, "documents.json")
+
+    def _read_state(self) -> Tuple[Optional[dict], Optional[faiss.Index]]:
+        if os.path.exists(self._corpus_path()):
+            with open(self._corpus_path(), 'rb') as f:
+                state = json.loads(f.readline())
+                if state.get("format") != CORPUS_FORMAT:
+                    print(f"Corpus index format {state.get('format')} is not supported, rebuilding")
+                    return None, None
+                return state, faiss.deserialize_index(np.frombuffer(f.read(), dtype=np.uint8))
+        index_path, documents_path = self._legacy_paths()
+        if os.path.exists(index_path) and os.path.exists(documents_path):
+            with open(documents_path, 'r') as f:
+                return json.load(f), faiss.read_index(index_path)
+        return None, None
+
+    def _load(self):
+        """Load the index and document key table, or start empty.
+
+        An index built with a different embedder, or that cannot be read, is discarded;
+        sync() then backfills it.
+        """
+        try:
+            state, index = self._read_state()
+        except Exception as e:
+            print(f"Corpus index is unreadable ({e}), rebuilding")
+            state, index = None, None
+        if state is not None:
+            # Indexes saved before embedders were configurable used the 384-d hashing model
+            embedder = state.get("embedder", "hashing-384")
+            if embedder != self.model.name:
+                print(f"Corpus index was built with {embedder}, rebuilding for {self.model.name}")
+                state = None
+        if state is not None:
+            self.index = index
+            self._documents: Dict[str, dict] = state["documents"]
+            self._next_key: int = state["next_key"]
+            self._trained_on: int = state.get("trained_on", 0)
+        else:
+            self.index = self._create(resolve_index_type(self.index_type, 0))
+            self._documents = {}
+            self._next_key = 0
+            self._trained_on = 0
+        self._documents_by_key = {entry["key"]: document_id for document_id, entry in self._documents.items()}
+
+    def save(self):
+        """Persist the index and key table together, replacing the previous version atomically.
+
+        The file is fsynced before it replaces the old one, so after a crash the key table
+        always matches the index vectors.
+        """
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                version = self._version
+                header = json.dumps({
+                    "format": CORPUS_FORMAT,
+                    "documents": self._documents,
+                    "next_key": self._next_key,
+                    "trained_on": self._trained_on,
+                    "embedder": self.model.name
+                }).encode()
+                # A copy, so searches and updates can continue while it is written
+                data = faiss.serialize_index(self.index)
+            
+            tmp_path = self._corpus_path() + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(header + b"\n")
+                f.write(data.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._corpus_path())
+            fsync_dir(self.index_dir)
+            for path in self._legacy_paths():
+                if os.path.exists(path):
+                    os.remove(path)
+            self._saved_version = max(self._saved_version, version)
+
+    def _changed(self, save: bool):
+        """Record a change; with save, write it within save_interval seconds. Called under _lock."""
+        self._version += 1
+        if save and self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_interval, self._save_if_changed)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _save_if_changed(self):
+        with self._lock:
+            self._save_timer = None
+        try:
+            if self._version != self._saved_version:
+                self.save()
+        except Exception as e:
+            print(f"Corpus index save error: {e}")
+
+    def close(self):
+        """Write any change still waiting for its save"""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+        self._save_if_changed()
+
+    def _create(self, index_type: str, training_vectors: Optional[np.ndarray] = None) -> faiss.Index:
+        # Inner product on L2-normalized vectors is cosine similarity
+        return with_ids(create_index(
+            index_type, self.embedding_dim, faiss.METRIC_INNER_PRODUCT, training_vectors, self.hnsw_m
+        ))
+
+    def _rebuild(self, index_type: str, exclude: Optional[Tuple[int, int]] = None):
+        """Rebuild the index as index_type from its current vectors, optionally dropping an ID range"""
+        ids, vectors = extract_vectors(self.index)
+        if exclude is not None:
+            keep = (ids < exclude[0]) | (ids >= exclude[1])
+            ids, vectors = ids[keep], vectors[keep]
+        index = self._create(index_type, vectors)
+        for start in range(0, len(ids), self.batch_size):
+            index.add_with_ids(vectors[start:start + self.batch_size], ids[start:start + self.batch_size])
+        self.index = index
+        self._trained_on = len(ids) if index_type.startswith("ivf") else 0
+
+    def _maybe_rebuild(self):
+        """Switch to a better index type, or retrain IVF lists, as the corpus grows"""
+        current = index_type_of(self.index)
+        target = resolve_index_type(self.index_type, self.index.ntotal)
+        if target != current and target != "flat":
+            self._rebuild(target)
+        elif current.startswith("ivf") and self.index.ntotal >= RETRAIN_GROWTH_FACTOR * self._trained_on:
+            self._rebuild(current)
+
+    def document_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._documents)
+
+    def _id_range(self, key: int) -> Tuple[int, int]:
+        return key << CHUNK_BITS, (key + 1) << CHUNK_BITS
+
+    def add_document(self, document_id: str, chunks: List[str], save: bool = True,
+                     embeddings: Optional[np.ndarray] = None):
+        """Embed a document's chunks into the shared space and add them to the index.
+
+        embeddings, if given, must come from this index's embedder, e.g. when it is shared
+        with the vector store.
+        """
+        # Embed outside the lock; only index mutation needs to be serialized
+        if embeddings is None:
+            embeddings = np.empty((len(chunks), self.embedding_dim), dtype=np.float32)
+            for start in range(0, len(chunks), self.batch_size):
+                embeddings[start:start + self.batch_size] = self.model.embed(chunks[start:start + self.batch_size])
+
+        with self._lock:
+            self._remove(document_id)
+            key = self._next_key
+            self._next_key += 1
+            ids = np.arange(len(chunks), dtype=np.int64) + self._id_range(key)[0]
+            self.index.add_with_ids(embeddings, ids)
+            self._documents[document_id] = {"key": key, "chunk_count": len(chunks)}
+            self._documents_by_key[key] = document_id
+            self._maybe_rebuild()
+            self._changed(save)
+
+    def _remove(self, document_id: str) -> bool:
+        entry = self._documents.pop(document_id, None)
+        if entry is None:
+            return False
+        id_range = self._id_range(entry["key"])
+        index_type = index_type_of(self.index)
+        if supports_removal(index_type):
+            self.index.remove_ids(faiss.IDSelectorRange(*id_range))
+        else:
+            # HNSW graphs cannot drop vectors, so rebuild without them
+            self._rebuild(index_type, exclude=id_range)
+        del self._documents_by_key[entry["key"]]
+        return True
+
+    def remove_document(self, document_id: str, save: bool = True):
+        """Remove all of a document's vectors"""
+        with self._lock:
+            if self._remove(document_id):
+                self._changed(save)
+
+    def sync(self, document_ids: Iterable[str], load_chunks):
+        """Add stored documents missing from the index and drop ones that no longer exist"""
+        document_ids = set(document_ids)
+        changed = False
+        for document_id in set(self.document_ids()) - document_ids:
+            self.remove_document(document_id, save=False)
+            changed = True
+        for document_id in document_ids - set(self.document_ids()):
+            try:
+                self.add_document(document_id, list(load_chunks(document_id)), save=False)
+                changed = True
+            except Exception as e:
+                print(f"Corpus index backfill error for {document_id}: {e}")
+        if changed:
+            self.save()
+
+    def search(self, query: str, top_k: int = 3, document_ids: Optional[List[str]] = None,
+               nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> List[Tuple[str, int, float]]:
+        """Search all documents (or a subset) in one call.
+
+        nprobe (IVF) and ef_search (HNSW) trade recall for latency per query.
+        Returns (document_id, chunk_index, cosine_score) tuples, best first.
+        """
+        query_embedding = self.model.embed([query])
+        nprobe = nprobe or self.nprobe
+
+        with self._lock:
+            selector = None
+            if document_ids is not None:
+                entries = [self._documents[d] for d in document_ids if d in self._documents]
+                if not entries:
+                    return []
+                allowed = np.concatenate([
+                    np.arange(entry["chunk_count"], dtype=np.int64) + self._id_range(entry["key"])[0]
+                    for entry in entries
+                ])
+                selector = faiss.IDSelectorBatch(allowed)
+                if isinstance(self.index, faiss.IndexIVF):
+                    # A filtered subset may sit in lists a normal probe would skip
+                    nprobe = self.index.nlist
+            
+            k = min(top_k, self.index.ntotal)
+            if k == 0:
+                return []
+            if selector is not None and index_type_of(self.index) == "hnsw":
+                # Graph traversal misses most of a small filtered subset; score it exactly instead
+                scores, ids = self._exact_search(query_embedding, allowed, k)
+            else:
+                params = search_parameters(self.index, selector, nprobe, ef_search or self.ef_search)
+                scores, ids = self.index.search(query_embedding, k, params=params)
+            documents_by_key = dict(self._documents_by_key)
+
+        results = []
+        for score, vector_id in zip(scores[0], ids[0]):
+            if vector_id < 0:
+                continue
+            document_id = documents_by_key.get(int(vector_id) >> CHUNK_BITS)
+            if document_id is not None:
+                results.append((document_id, int(vector_id) & ((1 << CHUNK_BITS) - 1), float(score)))
+        return results
+
+    def _exact_search(self, query_embedding: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Brute-force inner product search over the given vector IDs"""
+        scores = self.index.reconstruct_batch(ids) @ query_embedding[0]
+        top = np.argsort(-scores)[:k]
+        return scores[top][None, :], ids[top][None, :]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "documents": len(self._documents),
+                "vectors": self.index.ntotal,
+                "index_type": index_type_of(self.index)
+            }
@@ -1,90 +1,343 @@
-from supabase import create_client, Client
-from config import config
-from typing import List, Dict, Optional
+import queue
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
 
-class DatabaseService:
-    """Handles Supabase database operations"""
-    
-    def __init__(self):
-        self.client: Client = create_client(config.SUPABASE_URL, config.SUPABASE_KEY)
-        self._ensure_table_exists()
-    
-    def _ensure_table_exists(self):
-        """Ensure the documents table exists"""
-        # Note: In production, you would create this table via Supabase dashboard or migration
-        # For now, we'll handle this with try-except blocks during operations
+METADATA_BACKENDS = ("sqlite", "supabase")
+
+
+class MetadataBackend(ABC):
+    """Storage for document records and query history.
+
+    Rows are plain dicts with the columns of the documents and query_history tables.
+    Errors propagate: a failing primary fails the request, and DatabaseService only
+    catches failures of the mirror.
+    """
+
+    @abstractmethod
+    def insert_document(self, row: Dict):
+        ...
+
+    def insert_missing_documents(self, rows: Iterable[Dict]) -> int:
+        """Insert the rows whose document ID is not stored yet; returns how many were inserted"""
+        inserted = 0
+        for row in rows:
+            if self.get_document(row["id"]) is None:
+                self.insert_document(row)
+                inserted += 1
+        return inserted
+
+    @abstractmethod
+    def get_all_documents(self) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def get_document(self, document_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def delete_document(self, document_id: str):
+        ...
+
+    @abstractmethod
+    def insert_query(self, row: Dict):
+        ...
+
+    def insert_queries(self, rows: List[Dict]):
+        for row in rows:
+            self.insert_query(row)
+
+    @abstractmethod
+    def get_query_history(self, document_id: str) -> List[Dict]:
+        ...
+
+    def close(self):
         pass
-    
-    def create_document(self, document_id: str, filename: str, chunk_count: int, file_size: int) -> Dict:
-        """Create a new document record"""
+
+
+class SQLiteBackend(MetadataBackend):
+    """Local SQLite database in WAL mode, so reads never wait for the single writer.
+
+    A fixed pool of connections is shared by the I/O threads. Every statement is a constant
+    string, so each connection's statement cache keeps it prepared after first use.
+    """
+
+    _SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS documents (
+            id TEXT PRIMARY KEY,
+            filename TEXT NOT NULL,
+            chunk_count INTEGER NOT NULL,
+            file_size INTEGER NOT NULL,
+            upload_time TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS query_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            document_id TEXT NOT NULL,
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            query_time TEXT NOT NULL
+        )""",
+        # documents.id is indexed as the primary key
+        "CREATE INDEX IF NOT EXISTS idx_documents_upload_time ON documents (upload_time)",
+        "CREATE INDEX IF NOT EXISTS idx_query_history_document ON query_history (document_id, query_time)",
+    )
+    _INSERT_DOCUMENT = ("INSERT OR REPLACE INTO documents (id, filename, chunk_count, file_size, upload_time) "
+                        "VALUES (:id, :filename, :chunk_count, :file_size, :upload_time)")
+    _INSERT_MISSING_DOCUMENT = ("INSERT OR IGNORE INTO documents (id, filename, chunk_count, file_size, upload_time) "
+                                "VALUES (:id, :filename, :chunk_count, :file_size, :upload_time)")
+    _SELECT_DOCUMENTS = "SELECT * FROM documents ORDER BY upload_time DESC"
+    _SELECT_DOCUMENT = "SELECT * FROM documents WHERE id = ?"
+    _DELETE_DOCUMENT = "DELETE FROM documents WHERE id = ?"
+    _DELETE_HISTORY = "DELETE FROM query_history WHERE document_id = ?"
+    _INSERT_QUERY = ("INSERT INTO query_history (document_id, question, answer, query_time) "
+                     "VALUES (:document_id, :question, :answer, :query_time)")
+    _SELECT_HISTORY = "SELECT * FROM query_history WHERE document_id = ? ORDER BY query_time DESC"
+
+    def __init__(self, path: str = "metadata.sqlite3", pool_size: int = 8, busy_timeout: float = 5.0):
+        self.path = path
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(pool_size):
+            connection = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._pool.put(connection)
+
+        with self._connection() as connection:
+            for statement in self._SCHEMA:
+                connection.execute(statement)
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled connection; commits on success and rolls back on error"""
+        connection = self._pool.get()
         try:
-            data = {
-                "id": document_id,
-                "filename": filename,
-                "chunk_count": chunk_count,
-                "file_size": file_size,
-                "upload_time": datetime.utcnow().isoformat(),
-            }
-            
-            result = self.client.table("documents").insert(data).execute()
-            return result.data[0] if result.data else data
-        except Exception as e:
-            # If table doesn't exist, return the data anyway (we'll handle without DB)
-            print(f"Database insert error: {e}")
-            return {
-                "id": document_id,
-                "filename": filename,
-                "chunk_count": chunk_count,
-                "file_size": file_size,
-                "upload_time": datetime.utcnow().isoformat(),
-            }
-    
+            with connection:
+                yield connection
+        finally:
+            self._pool.put(connection)
+
+    def insert_document(self, row: Dict):
+        with self._connection() as connection:
+            connection.execute(self._INSERT_DOCUMENT, row)
+
+    def insert_missing_documents(self, rows: Iterable[Dict]) -> int:
+        with self._connection() as connection:
+            return connection.executemany(self._INSERT_MISSING_DOCUMENT, list(rows)).rowcount
+
+    def get_all_documents(self) -> List[Dict]:
+        with self._connection() as connection:
+            return [dict(row) for row in connection.execute(self._SELECT_DOCUMENTS)]
+
+    def get_document(self, document_id: str) -> Optional[Dict]:
+        with self._connection() as connection:
+            row = connection.execute(self._SELECT_DOCUMENT, (document_id,)).fetchone()
+            return dict(row) if row else None
+
+    def delete_document(self, document_id: str):
+        # Matches the ON DELETE CASCADE of the Supabase schema
+        with self._connection() as connection:
+            connection.execute(self._DELETE_HISTORY, (document_id,))
+            connection.execute(self._DELETE_DOCUMENT, (document_id,))
+
+    def insert_query(self, row: Dict):
+        with self._connection() as connection:
+            connection.execute(self._INSERT_QUERY, row)
+
+    def insert_queries(self, rows: List[Dict]):
+        # One transaction and one prepared statement for the whole batch
+        with self._connection() as connection:
+            connection.executemany(self._INSERT_QUERY, rows)
+
+    def get_query_history(self, document_id: str) -> List[Dict]:
+        with self._connection() as connection:
+            return [dict(row) for row in connection.execute(self._SELECT_HISTORY, (document_id,))]
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+
+class SupabaseBackend(MetadataBackend):
+    """Remote Supabase tables; every call is a blocking HTTP round-trip.
+
+    Needs the optional supabase package.
+    """
+
+    def __init__(self, url: str, key: str):
+        from supabase import create_client
+        self.client = create_client(url, key)
+
+    def insert_document(self, row: Dict):
+        self.client.table("documents").insert(row).execute()
+
     def get_all_documents(self) -> List[Dict]:
-        """Retrieve all documents"""
+        result = self.client.table("documents").select("*").order("upload_time", desc=True).execute()
+        return result.data or []
+
+    def get_document(self, document_id: str) -> Optional[Dict]:
+        result = self.client.table("documents").select("*").eq("id", document_id).execute()
+        return result.data[0] if result.data else None
+
+    def delete_document(self, document_id: str):
+        self.client.table("documents").delete().eq("id", document_id).execute()
+
+    def insert_query(self, row: Dict):
+        self.client.table("query_history").insert(row).execute()
+
+    def insert_queries(self, rows: List[Dict]):
+        self.client.table("query_history").insert(rows).execute()
+
+    def get_query_history(self, document_id: str) -> List[Dict]:
+        result = self.client.table("query_history").select("*").eq("document_id", document_id) \
+            .order("query_time", desc=True).execute()
+        return result.data or []
+
+
+class DatabaseService:
+    """Document metadata and query history, kept in a primary backend and optionally mirrored.
+
+    Requests only ever touch the primary. Writes are also queued for the mirror and replayed
+    there by a background thread, so a slow or unreachable mirror never delays a request;
+    its failures are counted and logged, and writes beyond the queue's capacity are dropped.
+    """
+
+    _STOP = object()
+
+    def __init__(self, primary: MetadataBackend, mirror: Optional[MetadataBackend] = None,
+                 mirror_queue_size: int = 1000):
+        self.primary = primary
+        self.mirror = mirror
+        self._mirror_queue: "queue.Queue" = queue.Queue(maxsize=mirror_queue_size)
+        self._stats_lock = threading.Lock()
+        self.mirrored = 0
+        self.mirror_failures = 0
+        self.mirror_dropped = 0
+        self._mirror_thread = None
+        if mirror is not None:
+            self._mirror_thread = threading.Thread(target=self._run_mirror, name="metadata-mirror", daemon=True)
+            self._mirror_thread.start()
+
+    def _run_mirror(self):
+        while True:
+            item = self._mirror_queue.get()
+            if item is self._STOP:
+                return
+            method, args = item
+            try:
+                getattr(self.mirror, method)(*args)
+                with self._stats_lock:
+                    self.mirrored += 1
+            except Exception as e:
+                with self._stats_lock:
+                    self.mirror_failures += 1
+                print(f"Metadata mirror {method} error: {e}")
+
+    def _mirror_write(self, method: str, *args):
+        if self.mirror is None:
+            return
         try:
-            result = self.client.table("documents").select("*").order("upload_time", desc=True).execute()
-            return result.data if result.data else []
-        except Exception as e:
-            print(f"Database query error: {e}")
-            return []
-    
+            self._mirror_queue.put_nowait((method, args))
+        except queue.Full:
+            with self._stats_lock:
+                self.mirror_dropped += 1
+
+    def create_document(self, document_id: str, filename: str, chunk_count: int, file_size: int) -> Dict:
+        """Create a new document record"""
+        row = {
+            "id": document_id,
+            "filename": filename,
+            "chunk_count": chunk_count,
+            "file_size": file_size,
+            "upload_time": datetime.utcnow().isoformat(),
+        }
+        self.primary.insert_document(row)
+        self._mirror_write("insert_document", row)
+        return row
+
+    def backfill_documents(self, rows: Iterable[Dict]) -> int:
+        """Record documents that exist on disk but not in the primary; the mirror is left alone"""
+        return self.primary.insert_missing_documents(rows)
+
+    def get_all_documents(self) -> List[Dict]:
+        """Retrieve all documents, newest first"""
+        return self.primary.get_all_documents()
+
     def get_document(self, document_id: str) -> Optional[Dict]:
         """Get a specific document by ID"""
-        try:
-            result = self.client.table("documents").select("*").eq("id", document_id).execute()
-            return result.data[0] if result.data else None
-        except Exception as e:
-            print(f"Database query error: {e}")
-            return None
-    
+        return self.primary.get_document(document_id)
+
     def delete_document(self, document_id: str) -> bool:
         """Delete a document record"""
-        try:
-            self.client.table("documents").delete().eq("id", document_id).execute()
-            return True
-        except Exception as e:
-            print(f"Database delete error: {e}")
-            return False
-    
+        self.primary.delete_document(document_id)
+        self._mirror_write("delete_document", document_id)
+        return True
+
     def save_query_history(self, document_id: str, question: str, answer: str):
-        """Save query history (optional feature)"""
-        try:
-            data = {
-                "document_id": document_id,
-                "question": question,
-                "answer": answer,
-                "query_time": datetime.utcnow().isoformat(),
-            }
-            self.client.table("query_history").insert(data).execute()
-        except Exception as e:
-            print(f"Query history save error: {e}")
-    
+        """Save a question and its answer"""
+        row = {
+            "document_id": document_id,
+            "question": question,
+            "answer": answer,
+            "query_time": datetime.utcnow().isoformat(),
+        }
+        self.primary.insert_query(row)
+        self._mirror_write("insert_query", row)
+
+    def save_query_batch(self, rows: List[Dict]):
+        """Save several history rows, each with its own query_time, in one write"""
+        self.primary.insert_queries(rows)
+        self._mirror_write("insert_queries", rows)
+
     def get_query_history(self, document_id: str) -> List[Dict]:
-        """Retrieve query history for a document"""
+        """Retrieve query history for a document, newest first"""
+        return self.primary.get_query_history(document_id)
+
+    def stats(self) -> Dict[str, object]:
+        with self._stats_lock:
+            return {
+                "primary": type(self.primary).__name__,
+                "mirror": type(self.mirror).__name__ if self.mirror is not None else None,
+                "mirror_pending": self._mirror_queue.qsize(),
+                "mirrored": self.mirrored,
+                "mirror_failures": self.mirror_failures,
+                "mirror_dropped": self.mirror_dropped,
+            }
+
+    def close(self, timeout: float = 5.0):
+        """Give the mirror a moment to drain, then close the backends"""
+        if self._mirror_thread is not None:
+            try:
+                self._mirror_queue.put(self._STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            self._mirror_thread.join(timeout)
+        self.primary.close()
+        if self.mirror is not None:
+            self.mirror.close()
+
+
+def create_database_service(backend: str, db_path: str, mirror: Optional[str] = None,
+                            supabase_url: Optional[str] = None, supabase_key: Optional[str] = None,
+                            pool_size: int = 8) -> DatabaseService:
+    """Build the metadata service: "sqlite" keeps metadata local, optionally mirrored to "supabase";
+    "supabase" uses the remote tables directly, as before local metadata existed.
+    """
+    if backend not in METADATA_BACKENDS:
+        raise ValueError(f"Unknown metadata backend: {backend}. Supported: {', '.join(METADATA_BACKENDS)}")
+    if backend == "supabase":
+        return DatabaseService(SupabaseBackend(supabase_url, supabase_key))
+
+    mirror_backend = None
+    if mirror == "supabase":
         try:
-            result = self.client.table("query_history").select("*").eq("document_id", document_id).order("query_time", desc=True).execute()
-            return result.data if result.data else []
+            mirror_backend = SupabaseBackend(supabase_url, supabase_key)
         except Exception as e:
-            print(f"Query history retrieval error: {e}")
-            return []
+            # The mirror is optional; local metadata works without it
+            print(f"Supabase mirror disabled: {e}")
+    elif mirror:
+        raise ValueError(f"Unknown metadata mirror: {mirror}. Supported: supabase")
+    return DatabaseService(SQLiteBackend(db_path, pool_size), mirror_backend)
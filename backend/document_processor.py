@@ -1,28 +1,102 @@
 import os
+import time
+from concurrent.futures import Executor
 import PyPDF2
-from typing import List, Tuple
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
 import re
+import codecs
+
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+class PageText(NamedTuple):
+    """Text extracted from a single PDF page"""
+    page_number: int
+    text: str
+    seconds: float
+    error: Optional[str] = None
+
+
+def pdf_page_count(file_path: str) -> int:
+    with open(file_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def extract_page_range(file_path: str, start: int, end: int) -> List[PageText]:
+    """Extract pages [start, end) of a PDF; runs in a worker process"""
+    pages = []
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page_number in range(start, end):
+            page_start = time.perf_counter()
+            try:
+                page_text = pdf_reader.pages[page_number].extract_text() or ""
+                pages.append(PageText(page_number, page_text, time.perf_counter() - page_start))
+            except Exception as e:
+                pages.append(PageText(page_number, "", time.perf_counter() - page_start, str(e)))
+    return pages
+
+
+def _is_utf8(file_path: str, block_size: int = 1024 * 1024) -> bool:
+    """Check a file decodes as UTF-8 without reading it into memory at once"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(block_size), b''):
+                decoder.decode(block)
+            decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
 
 class DocumentProcessor:
     """Handles document text extraction and chunking"""
     
-    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50):
+    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50, pdf_workers: int = 1,
+                 pdf_pages_per_task: int = 16, pdf_page_errors: str = "skip"):
+        if pdf_page_errors not in ("skip", "fail"):
+            raise ValueError(f"Unknown PDF page error policy: {pdf_page_errors}")
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.pdf_workers = pdf_workers
+        self.pdf_pages_per_task = pdf_pages_per_task
+        self.pdf_page_errors = pdf_page_errors
     
-    def extract_text_from_pdf(self, file_path: str) -> str:
-        """Extract text from PDF file"""
-        text = ""
+    def page_ranges(self, page_count: int) -> List[Tuple[int, int]]:
+        """Split a PDF into at most pdf_workers page ranges of at least pdf_pages_per_task pages"""
+        per_task = max(self.pdf_pages_per_task, -(-page_count // max(1, self.pdf_workers)))
+        return [(start, min(start + per_task, page_count)) for start in range(0, page_count, per_task)]
+    
+    def check_pages(self, pages: List[PageText]) -> List[PageText]:
+        """Apply the page error policy: under "fail" any unreadable page fails the document"""
+        if self.pdf_page_errors == "fail":
+            for page in pages:
+                if page.error:
+                    raise Exception(f"Error extracting text from PDF page {page.page_number + 1}: {page.error}")
+        return pages
+    
+    def extract_pdf_pages(self, file_path: str, executor: Optional[Executor] = None) -> List[PageText]:
+        """Extract every page of a PDF, spreading its page ranges over executor if one is given.
+        
+        No pool is created here: the server runs ranges on its shared CPU pool instead.
+        """
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
+            ranges = self.page_ranges(pdf_page_count(file_path))
+            if executor is None or len(ranges) <= 1:
+                parts = [extract_page_range(file_path, start, end) for start, end in ranges]
+            else:
+                futures = [executor.submit(extract_page_range, file_path, start, end) for start, end in ranges]
+                parts = [future.result() for future in futures]
         except Exception as e:
             raise Exception(f"Error extracting text from PDF: {str(e)}")
-        return text
+        return self.check_pages([page for part in parts for page in part])
+    
+    def extract_text_from_pdf(self, file_path: str) -> str:
+        """Extract text from PDF file"""
+        pages = self.extract_pdf_pages(file_path)
+        # Join once instead of concatenating page by page
+        return "".join(page.text + "\n" for page in pages if page.text)
     
     def extract_text_from_txt(self, file_path: str) -> str:
         """Extract text from TXT file"""
@@ -52,21 +126,80 @@ class DocumentProcessor:
         text = re.sub(r'[^\w\s.,!?;:()\-\'"]+', '', text)
         return text.strip()
     
-    def chunk_text(self, text: str) -> List[str]:
-        """Split text into overlapping chunks"""
-        # Clean the text first
-        text = self.clean_text(text)
+    def iter_clean_text(self, pieces: Iterable[str]) -> Iterator[str]:
+        """Clean text piece by piece; the joined output equals clean_text on the joined input"""
+        started = False  # Leading whitespace of the whole text is dropped
+        prev_whitespace = False  # Whether the collapsed text so far ends in whitespace
+        pending_space = ""  # Trailing spaces held back in case the text ends here
+        
+        for piece in pieces:
+            # Collapse whitespace, merging runs that span piece boundaries
+            collapsed = re.sub(r'\s+', ' ', piece)
+            if prev_whitespace and collapsed.startswith(' '):
+                collapsed = collapsed[1:]
+            if not collapsed:
+                continue
+            prev_whitespace = collapsed.endswith(' ')
+            
+            # Remove special characters but keep basic punctuation
+            cleaned = re.sub(r'[^\w\s.,!?;:()\-\'"]+', '', collapsed)
+            if not started:
+                cleaned = cleaned.lstrip()
+                if not cleaned:
+                    continue
+                started = True
+            
+            body = cleaned.rstrip()
+            if body:
+                yield pending_space + body
+                pending_space = cleaned[len(body):]
+            else:
+                pending_space += cleaned
+    
+    def iter_sentences(self, cleaned_pieces: Iterable[str]) -> Iterator[str]:
+        """Split cleaned text into sentences as it arrives.
         
-        # Split by sentences (rough approach)
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+        Each piece is scanned once: only a short tail of the text before it (its last
+        character, or a boundary that may continue) is scanned again, so text without
+        sentence boundaries costs linear time.
+        """
+        parts: List[str] = []  # Current sentence, up to the tail
+        tail = ""  # Last scanned character, or a pending boundary with the punctuation before it
+        for piece in cleaned_pieces:
+            window = tail + piece
+            if not window:
+                continue
+            consumed = 0
+            pending = None
+            # Scanning from 1 skips the tail's first character, which only serves the lookbehind
+            for match in _SENTENCE_BOUNDARY.finditer(window, 1 if tail else 0):
+                # A boundary at the very end may continue into the next piece
+                if match.end() == len(window):
+                    pending = match
+                    break
+                parts.append(window[consumed:match.start()])
+                yield "".join(parts)
+                parts = []
+                consumed = match.end()
+            keep = pending.start() - 1 if pending else len(window) - 1
+            parts.append(window[consumed:keep])
+            tail = window[keep:]
+        yield "".join(parts) + tail
+    
+    def iter_chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        """Yield overlapping chunks from text that arrives in pieces (pages or lines).
         
-        chunks = []
+        Memory stays bounded by the current sentence and chunk, and the chunks are
+        identical to chunk_text on the joined pieces.
+        """
         current_chunk = ""
+        produced = False
         
-        for sentence in sentences:
+        for sentence in self.iter_sentences(self.iter_clean_text(pieces)):
             # If adding this sentence exceeds chunk size, save current chunk
             if len(current_chunk) + len(sentence) > self.chunk_size and current_chunk:
-                chunks.append(current_chunk.strip())
+                yield current_chunk.strip()
+                produced = True
                 # Start new chunk with overlap
                 words = current_chunk.split()
                 overlap_words = words[-self.chunk_overlap:] if len(words) > self.chunk_overlap else words
@@ -76,9 +209,61 @@ class DocumentProcessor:
         
         # Add the last chunk
         if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+            yield current_chunk.strip()
+        elif not produced:
+            # Nothing but whitespace: the cleaned text is empty
+            yield ""
+    
+    def chunk_text(self, text: str) -> List[str]:
+        """Split text into overlapping chunks"""
+        return list(self.iter_chunks([text]))
+    
+    def iter_text_pieces(self, file_path: str, file_extension: str) -> Iterator[str]:
+        """Yield a document's text page by page (PDF) or line by line (TXT)"""
+        if file_extension.lower() == '.pdf':
+            for page in self.extract_pdf_pages(file_path):
+                if page.text:
+                    yield page.text + "\n"
+        elif file_extension.lower() == '.txt':
+            encoding = 'utf-8' if _is_utf8(file_path) else 'latin-1'
+            with open(file_path, 'r', encoding=encoding) as file:
+                yield from file
+        else:
+            raise ValueError(f"Unsupported file format: {file_extension}")
+    
+    def iter_document_chunks(self, file_path: str, file_extension: str) -> Iterator[str]:
+        """Stream a document's chunks without holding its full text in memory.
+        
+        Raises ValueError after the last chunk if the document has insufficient text.
+        """
+        return self.iter_piece_chunks(self.iter_text_pieces(file_path, file_extension))
+    
+    def iter_piece_chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        """iter_chunks with process_document's check for documents with insufficient text"""
+        stats = {"offset": 0, "first": None, "last": None}
         
-        return chunks if chunks else [text]  # Return full text as single chunk if chunking fails
+        def tracked(pieces):
+            # Track the span of non-whitespace text to apply the same emptiness check as process_document
+            for piece in pieces:
+                if piece.strip():
+                    if stats["first"] is None:
+                        stats["first"] = stats["offset"] + len(piece) - len(piece.lstrip())
+                    stats["last"] = stats["offset"] + len(piece.rstrip())
+                stats["offset"] += len(piece)
+                yield piece
+        
+        yield from self.iter_chunks(tracked(pieces))
+        
+        if stats["first"] is None or stats["last"] - stats["first"] < 10:
+            raise ValueError("Document appears to be empty or has insufficient text")
+    
+    def chunk_document(self, file_path: str, file_extension: str) -> List[str]:
+        """Extract and chunk a document in a single streaming pass"""
+        return list(self.iter_document_chunks(file_path, file_extension))
+    
+    def chunk_pages(self, pages: List[PageText]) -> List[str]:
+        """Chunk PDF pages extracted separately, exactly as chunk_document would"""
+        return list(self.iter_piece_chunks(page.text + "\n" for page in pages if page.text))
     
     def process_document(self, file_path: str, file_extension: str) -> Tuple[str, List[str]]:
         """Complete document processing pipeline"""
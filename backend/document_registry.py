@@ -0,0 +1,73 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+
+class DocumentRegistry:
+    """Content hashes of uploaded files and the live documents processed from each.
+
+    The documents sharing a hash also share their vector store files, so the number of
+    documents listed under a hash is its reference count: an entry is dropped when the
+    last of them is deleted.
+    """
+
+    def __init__(self, path: str = "document_registry.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self._entries = json.load(f)
+        self._hashes = {
+            document_id: content_hash
+            for content_hash, entry in self._entries.items() for document_id in entry["documents"]
+        }
+
+    def _save(self):
+        with open(self.path + ".tmp", 'w') as f:
+            json.dump(self._entries, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    def documents(self, content_hash: str) -> List[str]:
+        """Live documents processed from a file with this hash, oldest first"""
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            return list(entry["documents"]) if entry else []
+
+    def processing_seconds(self, content_hash: str) -> float:
+        """How long the first document with this hash took to process"""
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            return entry["processing_seconds"] if entry else 0.0
+
+    def add(self, content_hash: str, document_id: str, processing_seconds: float = 0.0):
+        with self._lock:
+            entry = self._entries.setdefault(
+                content_hash, {"documents": [], "processing_seconds": processing_seconds}
+            )
+            if document_id not in entry["documents"]:
+                entry["documents"].append(document_id)
+                self._hashes[document_id] = content_hash
+                self._save()
+
+    def remove(self, document_id: str) -> Optional[int]:
+        """Drop a document; returns how many documents still share its content, or None if unregistered"""
+        with self._lock:
+            content_hash = self._hashes.pop(document_id, None)
+            if content_hash is None:
+                return None
+            documents = self._entries[content_hash]["documents"]
+            documents.remove(document_id)
+            if not documents:
+                del self._entries[content_hash]
+            self._save()
+            return len(documents)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "documents": len(self._hashes),
+                "duplicates": len(self._hashes) - len(self._entries)
+            }
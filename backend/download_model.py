@@ -1,7 +1,15 @@
-"""Download the embedding model before starting the server."""
+"""Download the embedding model and save it locally before starting the server.
+
+The sentence_transformers embedding backend loads the model from EMBEDDING_MODEL_PATH,
+so the server never downloads anything at runtime.
+"""
 from sentence_transformers import SentenceTransformer
 
-print("Downloading embedding model...")
-model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+from config import config
+
+print(f"Downloading embedding model {config.EMBEDDING_MODEL}...")
+model = SentenceTransformer(config.EMBEDDING_MODEL)
+model.save(config.EMBEDDING_MODEL_PATH)
 print("Model downloaded successfully!")
-print(f"Model saved to: {model._model_card_vars.get('model_id')}")
+print(f"Model saved to: {config.EMBEDDING_MODEL_PATH}")
+print("Start the backend with EMBEDDING_BACKEND=sentence_transformers to use it.")
@@ -0,0 +1,310 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from typing import Dict, List, Optional, Tuple
+
+EMBEDDING_BACKENDS = ("tfidf", "hashing", "sentence_transformers")
+
+TFIDF_VOCABULARY_FILE = "tfidf_vocabulary.json"
+TFIDF_IDF_FILE = "tfidf_idf.npy"
+TFIDF_NGRAM_RANGE = (1, 2)
+
+
+class TfidfEmbeddingModel:
+    """Immutable TF-IDF embedding model fitted on the chunks of a single document"""
+
+    __slots__ = ("_vectorizer", "_embedding_dim")
+
+    def __init__(self, vectorizer: TfidfVectorizer, embedding_dim: int = 384):
+        # The vectorizer must already be fitted; it is never refitted afterwards
+        object.__setattr__(self, "_vectorizer", vectorizer)
+        object.__setattr__(self, "_embedding_dim", embedding_dim)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        # Rebuild through __init__ so models can cross process boundaries
+        return (type(self), (self._vectorizer, self._embedding_dim))
+
+    @classmethod
+    def fit(cls, texts: List[str], embedding_dim: int = 384) -> "TfidfEmbeddingModel":
+        """Fit a new model on a document's chunks"""
+        vectorizer = TfidfVectorizer(max_features=embedding_dim, ngram_range=TFIDF_NGRAM_RANGE, min_df=1)
+        vectorizer.fit(texts)
+        return cls(vectorizer, embedding_dim)
+
+    def save(self, directory: str):
+        """Save the fitted state as a JSON term list, in column order, and an .npy of IDF weights"""
+        with open(os.path.join(directory, TFIDF_VOCABULARY_FILE), 'w') as f:
+            json.dump({
+                "embedding_dim": self._embedding_dim,
+                "ngram_range": list(self._vectorizer.ngram_range),
+                "terms": self._vectorizer.get_feature_names_out().tolist()
+            }, f)
+        np.save(os.path.join(directory, TFIDF_IDF_FILE), self._vectorizer.idf_)
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, TFIDF_VOCABULARY_FILE))
+
+    @classmethod
+    def load(cls, directory: str) -> "TfidfEmbeddingModel":
+        """Rebuild a saved model without refitting; it embeds exactly as the original did"""
+        with open(os.path.join(directory, TFIDF_VOCABULARY_FILE), 'r') as f:
+            state = json.load(f)
+        vectorizer = TfidfVectorizer(
+            ngram_range=tuple(state["ngram_range"]),
+            vocabulary={term: i for i, term in enumerate(state["terms"])}
+        )
+        vectorizer.idf_ = np.load(os.path.join(directory, TFIDF_IDF_FILE))
+        return cls(vectorizer, state["embedding_dim"])
+
+    @property
+    def vectorizer(self) -> TfidfVectorizer:
+        return self._vectorizer
+
+    @property
+    def embedding_dim(self) -> int:
+        return self._embedding_dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Generate fixed-size embeddings for a list of texts"""
+        embeddings = self._vectorizer.transform(texts).toarray().astype(np.float32)
+
+        # Pad or truncate to fixed dimension
+        if embeddings.shape[1] < self._embedding_dim:
+            padding = np.zeros((embeddings.shape[0], self._embedding_dim - embeddings.shape[1]), dtype=np.float32)
+            embeddings = np.hstack([embeddings, padding])
+        elif embeddings.shape[1] > self._embedding_dim:
+            embeddings = embeddings[:, :self._embedding_dim]
+
+        return np.ascontiguousarray(embeddings)
+
+
+class Embedder(ABC):
+    """Interface for embedding models shared by every document.
+
+    The same text always maps to the same L2-normalized vector, so embeddings can be cached
+    by content and vectors from different documents are directly comparable.
+    """
+
+    # Identifies the vector space; stored with indexes and used in embedding cache keys
+    name = "embedder"
+
+    @property
+    @abstractmethod
+    def embedding_dim(self) -> int:
+        """Length of each embedding vector"""
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as L2-normalized float32 rows"""
+
+
+class HashingEmbeddingModel(Embedder):
+    """Stateless hashed bag-of-words model shared by every document.
+
+    Unlike per-document TF-IDF, all texts land in the same vector space, so vectors
+    from different documents can live in one index and be compared directly.
+    """
+
+    def __init__(self, embedding_dim: int = 384):
+        self.name = f"hashing-{embedding_dim}"
+        self._embedding_dim = embedding_dim
+        # Stop words are dropped so they don't dominate hash collisions in a small space
+        self._vectorizer = HashingVectorizer(
+            n_features=embedding_dim, ngram_range=(1, 2), alternate_sign=False, norm="l2", stop_words="english"
+        )
+
+    @property
+    def embedding_dim(self) -> int:
+        return self._embedding_dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Generate L2-normalized embeddings for a list of texts"""
+        return np.ascontiguousarray(self._vectorizer.transform(texts).toarray(), dtype=np.float32)
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """Dense sentence embeddings on CPU from a sentence-transformers model saved on local disk.
+
+    The model is loaded on first use so the server starts without paying for it.
+    Needs the optional sentence-transformers package (see download_model.py).
+    """
+
+    def __init__(self, model_path: str, embedding_dim: int = 384, batch_size: int = 32, device: str = "cpu"):
+        self.model_path = model_path
+        self.name = f"sentence-transformers/{os.path.basename(os.path.normpath(model_path))}"
+        self.batch_size = batch_size
+        self.device = device
+        self._embedding_dim = embedding_dim
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def embedding_dim(self) -> int:
+        return self._embedding_dim
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def _load(self):
+        with self._load_lock:
+            if self._model is None:
+                if not os.path.isdir(self.model_path):
+                    raise FileNotFoundError(
+                        f"Embedding model not found at {self.model_path}; run download_model.py first"
+                    )
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(self.model_path, device=self.device)
+                if model.get_sentence_embedding_dimension() != self._embedding_dim:
+                    raise ValueError(
+                        f"Model {self.model_path} produces {model.get_sentence_embedding_dimension()}-d "
+                        f"embeddings, expected {self._embedding_dim}"
+                    )
+                self._model = model
+        return self._model
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Generate L2-normalized embeddings, batch_size texts per forward pass"""
+        if not texts:
+            return np.empty((0, self._embedding_dim), dtype=np.float32)
+        embeddings = self._load().encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=True,
+            convert_to_numpy=True, show_progress_bar=False
+        )
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+
+class CachedEmbedder(Embedder):
+    """On-disk embedding cache in front of another embedder, keyed by a hash of model and content.
+
+    Re-ingesting identical chunks, in the same or another document, skips the model entirely.
+    """
+
+    # SQLite limits the number of bound parameters per statement
+    _LOOKUP_BATCH = 500
+
+    def __init__(self, embedder: Embedder, cache_path: str):
+        self.embedder = embedder
+        self.name = embedder.name
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.compute_seconds = 0.0
+
+        if os.path.dirname(cache_path):
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self._db = sqlite3.connect(cache_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._db.commit()
+
+    @property
+    def embedding_dim(self) -> int:
+        return self.embedder.embedding_dim
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.name}\0{text}".encode()).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), self._LOOKUP_BATCH):
+                batch = keys[start:start + self._LOOKUP_BATCH]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                )
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    @property
+    def seconds_per_text(self) -> float:
+        """Average model time per text embedded, i.e. time saved per cache hit"""
+        with self._lock:
+            return self.compute_seconds / self.misses if self.misses else 0.0
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Serve cached embeddings and compute only texts not seen before"""
+        return self.embed_counted(texts)[0]
+
+    def embed_counted(self, texts: List[str]) -> Tuple[np.ndarray, int]:
+        """Embeddings for texts, plus how many of them were served from the cache"""
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(list(set(keys)))
+
+        # Embed each distinct missing text once, even if it repeats within the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        compute_seconds = 0.0
+        if missing:
+            start = time.perf_counter()
+            vectors = self.embedder.embed(list(missing.values()))
+            compute_seconds = time.perf_counter() - start
+            computed = dict(zip(missing, vectors))
+            with self._lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in computed.items()]
+                )
+                self._db.commit()
+            found.update(computed)
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(keys) - len(missing)
+            self.compute_seconds += compute_seconds
+
+        embeddings = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+        for row, key in enumerate(keys):
+            embeddings[row] = found[key]
+        return embeddings, len(keys) - len(missing)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "model": self.name,
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def create_embedder(backend: str, model_path: Optional[str] = None, embedding_dim: int = 384,
+                    batch_size: int = 32, cache_path: Optional[str] = None) -> Optional[Embedder]:
+    """Build the shared embedder for a backend name.
+
+    "tfidf" returns None: each document fits its own TF-IDF model instead of sharing one.
+    A cache_path puts an on-disk embedding cache in front of the model.
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}. Supported: {', '.join(EMBEDDING_BACKENDS)}")
+    if backend == "tfidf":
+        return None
+    if backend == "hashing":
+        embedder = HashingEmbeddingModel(embedding_dim)
+    else:
+        if not model_path:
+            raise ValueError("The sentence_transformers embedding backend needs a model path")
+        embedder = SentenceTransformerEmbedder(model_path, embedding_dim, batch_size)
+    return CachedEmbedder(embedder, cache_path) if cache_path else embedder
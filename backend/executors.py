@@ -0,0 +1,71 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class ExecutorSaturated(Exception):
+    """Raised when an executor already has its maximum of running and queued tasks"""
+
+
+class BoundedExecutor:
+    """Runs blocking callables from async code on an executor with a bounded queue"""
+
+    def __init__(self, name: str, executor: Executor, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = executor
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturated(f"{self.name} executor is saturated, try again later")
+            self._in_flight += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Submit fn without blocking the event loop, rejecting it if the queue is full"""
+        self._acquire()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, int]:
+        """Return current load and rejection counters"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queued": max(0, self._in_flight - self.max_workers),
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+def create_cpu_executor(max_workers: int, max_queue: int) -> BoundedExecutor:
+    """Process pool for CPU-bound parsing and embedding work"""
+    # Spawn rather than fork so workers never inherit the event loop or thread pools
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+    return BoundedExecutor("cpu", executor, max_workers, max_queue)
+
+
+def create_io_executor(max_workers: int, max_queue: int) -> BoundedExecutor:
+    """Thread pool for blocking database, LLM and disk I/O"""
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="io")
+    return BoundedExecutor("io", executor, max_workers, max_queue)
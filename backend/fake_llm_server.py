@@ -0,0 +1,108 @@
+"""
+Local stand-in for the Groq chat completions API, for developing and testing without an API key.
+
+Usage:
+    python fake_llm_server.py [--port 8001] [--first-token-delay 0.3] [--token-delay 0.02] [--error-rate 0.1]
+
+Then start the backend with LLM_BASE_URL=http://localhost:8001 (any GROQ_API_KEY value works).
+Serves both the Groq path and the OpenAI-style /v1 path, so it works with either LLM_PROVIDER.
+Answers echo the question and stream word by word, like a real model. --error-rate answers
+that fraction of requests with 429 Too Many Requests to exercise client retries.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Fake LLM server")
+settings = {"first_token_delay": 0.3, "token_delay": 0.02, "error_rate": 0.0}
+stats = {"requests": 0, "rate_limited": 0}
+
+
+def _answer_for(messages: list) -> str:
+    prompt = messages[-1]["content"] if messages else ""
+    question = prompt.split("Question:", 1)[-1].split("\n", 1)[0].strip() if "Question:" in prompt else prompt
+    return f"This is a fake answer to: {question} According to [Chunk 1], the document covers it."
+
+
+@app.post("/openai/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    stats["requests"] += 1
+    if random.random() < settings["error_rate"]:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"Retry-After": "0.1"}
+        )
+
+    body = await request.json()
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "fake")
+    answer = _answer_for(body.get("messages", []))
+
+    if not body.get("stream"):
+        await asyncio.sleep(settings["first_token_delay"] + settings["token_delay"] * len(answer.split()))
+        return JSONResponse({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": answer},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(answer.split()), "total_tokens": len(answer.split())}
+        })
+
+    def chunk(delta: dict, finish_reason=None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def events():
+        yield chunk({"role": "assistant", "content": ""})
+        await asyncio.sleep(settings["first_token_delay"])
+        for i, word in enumerate(answer.split(" ")):
+            yield chunk({"content": word if i == 0 else " " + word})
+            await asyncio.sleep(settings["token_delay"])
+        yield chunk({}, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Groq-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--first-token-delay", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests rejected with 429")
+    args = parser.parse_args()
+
+    settings.update(first_token_delay=args.first_token_delay, token_delay=args.token_delay, error_rate=args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
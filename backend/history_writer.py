@@ -0,0 +1,217 @@
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional
+
+OVERFLOW_POLICIES = ("spill", "drop")
+
+
+class HistoryWriter:
+    """Write-behind buffer for query history, flushed in batches by a background task.
+
+    submit() only appends to memory, so requests never wait on persistence. The flush task
+    writes a batch once batch_size rows are pending or flush_interval seconds have passed.
+    Past max_pending rows, new rows are handed to the flush task, which appends them to a
+    JSONL spill file (replayed once the buffer drains, never past max_pending), or dropped,
+    depending on overflow_policy. All spill file I/O happens on the flush task, off the event
+    loop. stop() flushes everything left.
+    """
+
+    def __init__(self, write_batch: Callable[[List[Dict]], None], batch_size: int = 100,
+                 flush_interval: float = 1.0, max_pending: int = 10000,
+                 overflow_policy: str = "spill", spill_path: str = "history_spill.jsonl"):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}. Supported: {', '.join(OVERFLOW_POLICIES)}")
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.overflow_policy = overflow_policy
+        self.spill_path = spill_path
+        # Spilled rows being replayed; new rows keep going to spill_path meanwhile
+        self.replay_path = spill_path + ".replay"
+        self._pending: Deque[Dict] = deque()
+        # Rows past max_pending waiting for the flush task to spill them
+        self._overflow: Deque[Dict] = deque()
+        self._spill_lock = threading.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.corrupt = 0
+        self.last_flush_ms = 0.0
+        self._flush_ms_total = 0.0
+
+    def submit(self, document_id: str, question: str, answer: str):
+        """Queue a question and its answer for the next flush; never blocks"""
+        row = {
+            "document_id": document_id,
+            "question": question,
+            "answer": answer,
+            "query_time": datetime.utcnow().isoformat(),
+        }
+        if len(self._pending) < self.max_pending:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size and self._wake is not None:
+                self._wake.set()
+        elif self.overflow_policy == "spill":
+            self._overflow.append(row)
+            if self._wake is not None:
+                self._wake.set()
+        else:
+            self.dropped += 1
+
+    def pending(self, document_id: str) -> List[Dict]:
+        """Rows for a document not yet flushed, newest first"""
+        rows = list(self._pending) + list(self._overflow)
+        return [row for row in reversed(rows) if row["document_id"] == document_id]
+
+    def _spill(self, rows: List[Dict]):
+        # Only reached while the database cannot keep up
+        with self._spill_lock, open(self.spill_path, 'ab') as f:
+            # Start on a fresh line if a crash left the last one unfinished
+            if f.tell() > 0:
+                with open(self.spill_path, 'rb') as tail:
+                    tail.seek(-1, os.SEEK_END)
+                    if tail.read(1) != b"\n":
+                        f.write(b"\n")
+            f.write("".join(json.dumps(row) + "\n" for row in rows).encode())
+        self.spilled += len(rows)
+
+    async def _spill_overflow(self):
+        rows = list(self._overflow)
+        if not rows:
+            return
+        self._overflow.clear()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._spill, rows)
+        except Exception as e:
+            self.dropped += len(rows)
+            print(f"Query history spill error, {len(rows)} row(s) dropped: {e}")
+
+    def _has_spill(self) -> bool:
+        return os.path.exists(self.replay_path) or os.path.exists(self.spill_path)
+
+    def _take_spill(self, limit: int) -> List[Dict]:
+        """Return up to limit spilled rows, oldest first, leaving the rest on disk.
+
+        Lines that do not parse, such as one cut short by a crash, are skipped and counted.
+        """
+        with self._spill_lock:
+            return self._take_spill_locked(limit)
+
+    def _take_spill_locked(self, limit: int) -> List[Dict]:
+        if not os.path.exists(self.replay_path):
+            if not os.path.exists(self.spill_path):
+                return []
+            # Atomic, so rows spilled while this runs land in a fresh spill file
+            os.replace(self.spill_path, self.replay_path)
+        rows = []
+        with open(self.replay_path, 'rb') as f:
+            while len(rows) < limit:
+                line = f.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    self.corrupt += 1
+                    print(f"Skipping unreadable query history spill line: {line[:80]!r}")
+            rest = f.read(1)
+            if rest:
+                with open(self.replay_path + ".tmp", 'wb') as remainder:
+                    remainder.write(rest)
+                    shutil.copyfileobj(f, remainder)
+        if rest:
+            os.replace(self.replay_path + ".tmp", self.replay_path)
+        else:
+            os.remove(self.replay_path)
+        return rows
+
+    async def _flush_once(self) -> bool:
+        """Write one batch; on failure the rows go back to the front of the buffer"""
+        batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+        if not batch:
+            return True
+        start = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.write_batch, batch)
+        except Exception as e:
+            self.failures += 1
+            self._pending.extendleft(reversed(batch))
+            print(f"Query history flush error: {e}")
+            return False
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+        self._flush_ms_total += self.last_flush_ms
+        self.batches += 1
+        self.written += len(batch)
+        return True
+
+    async def flush(self) -> bool:
+        """Write every pending row; returns False if a batch failed and rows remain"""
+        await self._spill_overflow()
+        while self._pending:
+            await self._spill_overflow()
+            if not await self._flush_once():
+                return False
+        # Replay rows spilled while the buffer was full, as far as there is room
+        room = self.max_pending - len(self._pending)
+        if room > 0 and self._has_spill():
+            self._pending.extend(await asyncio.get_running_loop().run_in_executor(None, self._take_spill, room))
+        return True
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # The next round tries again; the task must outlive any single failure
+                print(f"Query history flush error: {e}")
+
+    async def start(self):
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and write what is left; rows that still fail are spilled"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        while self._pending or self._overflow or self._has_spill():
+            if not await self.flush():
+                self._overflow.extendleft(reversed(self._pending))
+                self._pending.clear()
+                await self._spill_overflow()
+                break
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queue_depth": len(self._pending),
+            "written": self.written,
+            "batches": self.batches,
+            "failures": self.failures,
+            "spilled": self.spilled,
+            "dropped": self.dropped,
+            "corrupt": self.corrupt,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "avg_flush_ms": round(self._flush_ms_total / self.batches, 3) if self.batches else 0.0,
+        }
@@ -0,0 +1,143 @@
+import math
+import faiss
+import numpy as np
+from typing import Optional, Tuple
+
+INDEX_TYPES = ("auto", "flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# Below this many vectors a brute-force scan is fast enough and exact
+FLAT_MAX_VECTORS = 50_000
+# Above this many vectors product quantization keeps memory bounded
+IVF_FLAT_MAX_VECTORS = 1_000_000
+# FAISS wants roughly this many training points per IVF list or PQ centroid
+MIN_POINTS_PER_LIST = 39
+# 8-bit product quantizers have 256 centroids per sub-vector
+PQ_MIN_TRAINING_POINTS = 256 * MIN_POINTS_PER_LIST
+# HNSW build-time search depth; FAISS's default of 40 gives poor recall on 384-d text embeddings
+HNSW_EF_CONSTRUCTION = 200
+
+
+def choose_index_type(n_vectors: int) -> str:
+    """Pick an index type for a collection of the given size.
+
+    HNSW is never chosen automatically because it cannot remove vectors in place.
+    """
+    if n_vectors < FLAT_MAX_VECTORS:
+        return "flat"
+    if n_vectors < IVF_FLAT_MAX_VECTORS:
+        return "ivf_flat"
+    return "ivf_pq"
+
+
+def resolve_index_type(index_type: str, n_vectors: int) -> str:
+    """Resolve 'auto' and fall back to flat when there is too little data to train an IVF index"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type}. Supported: {', '.join(INDEX_TYPES)}")
+    if index_type == "auto":
+        return choose_index_type(n_vectors)
+    if index_type.startswith("ivf") and n_vectors < MIN_POINTS_PER_LIST * 2:
+        return "flat"
+    if index_type == "ivf_pq" and n_vectors < PQ_MIN_TRAINING_POINTS:
+        return "ivf_flat"
+    return index_type
+
+
+def _nlist_for(n_vectors: int) -> int:
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // MIN_POINTS_PER_LIST))
+
+
+def _pq_subquantizers(dim: int) -> int:
+    """Largest sub-quantizer count giving at least 4 dimensions per code byte"""
+    for m in range(dim // 4, 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def create_index(index_type: str, dim: int, metric: int = faiss.METRIC_L2,
+                 training_vectors: Optional[np.ndarray] = None, hnsw_m: int = 32) -> faiss.Index:
+    """Create (and train, when the type needs it) an empty FAISS index"""
+    if index_type == "flat":
+        return faiss.IndexFlat(dim, metric)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, metric)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return index
+    if index_type in ("ivf_flat", "ivf_pq"):
+        if training_vectors is None or len(training_vectors) == 0:
+            raise ValueError(f"{index_type} index needs training vectors")
+        nlist = _nlist_for(len(training_vectors))
+        quantizer = faiss.IndexFlat(dim, metric)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_subquantizers(dim), 8, metric)
+        index.train(training_vectors)
+        return index
+    raise ValueError(f"Unknown index type: {index_type}")
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Name of the index type underneath any ID map wrapper"""
+    index = faiss.downcast_index(index.index) if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) else index
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def supports_removal(index_type: str) -> bool:
+    return index_type != "hnsw"
+
+
+def with_ids(index: faiss.Index) -> faiss.Index:
+    """Make an index accept caller-assigned IDs.
+
+    IVF indexes store IDs natively; wrapping them in an ID map breaks removal.
+    """
+    if isinstance(index, faiss.IndexIVF):
+        return index
+    return faiss.IndexIDMap2(index)
+
+
+def search_parameters(index: faiss.Index, selector: Optional[faiss.IDSelector] = None,
+                      nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> Optional[faiss.SearchParameters]:
+    """Per-query search parameters for the index type, or None for defaults"""
+    index_type = index_type_of(index)
+    if index_type.startswith("ivf"):
+        params = faiss.SearchParametersIVF()
+        if nprobe:
+            params.nprobe = nprobe
+    elif index_type == "hnsw":
+        params = faiss.SearchParametersHNSW()
+        if ef_search:
+            params.efSearch = ef_search
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+def extract_vectors(index: faiss.Index) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (ids, vectors) for every vector in an index built by with_ids.
+
+    PQ indexes return their quantized approximations.
+    """
+    if index.ntotal == 0:
+        return np.empty(0, dtype=np.int64), np.empty((0, index.d), dtype=np.float32)
+    if isinstance(index, faiss.IndexIVF):
+        invlists = index.invlists
+        ids = np.concatenate([
+            faiss.rev_swig_ptr(invlists.get_ids(list_no), invlists.list_size(list_no)).copy()
+            for list_no in range(index.nlist) if invlists.list_size(list_no)
+        ])
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return ids, index.reconstruct_batch(ids)
+    ids = faiss.vector_to_array(index.id_map).astype(np.int64)
+    return ids, faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
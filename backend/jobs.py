@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+# handler(job, progress) -> result dict; progress(stage, fraction) reports intermediate steps
+JobHandler = Callable[[dict, Callable[[str, float], Awaitable[None]]], Awaitable[dict]]
+
+
+class IngestionJobQueue:
+    """Background ingestion jobs persisted as JSON files and run by a fixed pool of workers.
+
+    Finished jobs stay pollable for retention_seconds, and only the newest max_finished of
+    them are kept; older records are removed from memory and disk.
+    """
+
+    def __init__(self, jobs_dir: str, handler: JobHandler, workers: int = 2,
+                 retention_seconds: float = 24 * 3600, max_finished: int = 1000):
+        self.jobs_dir = jobs_dir
+        self.handler = handler
+        self.workers = workers
+        self.retention_seconds = retention_seconds
+        self.max_finished = max_finished
+        self._jobs: Dict[str, dict] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _persist(self, job: dict):
+        """Write a job record atomically so a crash never leaves a partial file"""
+        tmp_path = self._job_path(job["job_id"]) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(job, f, indent=2)
+        os.replace(tmp_path, self._job_path(job["job_id"]))
+
+    def _load_persisted(self) -> List[dict]:
+        jobs = []
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), "r") as f:
+                    jobs.append(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Skipping unreadable job file {name}: {e}")
+        return sorted(jobs, key=lambda job: job["created_at"])
+
+    def _remove_persisted(self, job_ids: List[str]):
+        for job_id in job_ids:
+            try:
+                os.remove(self._job_path(job_id))
+            except FileNotFoundError:
+                pass
+
+    async def _prune(self):
+        """Forget finished jobs past their retention time or beyond the newest max_finished"""
+        finished = sorted(
+            (job for job in self._jobs.values() if job["status"] in (JobStatus.COMPLETED, JobStatus.FAILED)),
+            key=lambda job: job["updated_at"], reverse=True
+        )
+        cutoff = time.time() - self.retention_seconds
+        expired = [
+            job["job_id"] for position, job in enumerate(finished)
+            if position >= self.max_finished or job["updated_at"] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if expired:
+            await asyncio.get_running_loop().run_in_executor(None, self._remove_persisted, expired)
+
+    async def start(self):
+        """Reload persisted jobs, requeue unfinished ones and start the workers"""
+        self._queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+
+        for job in await loop.run_in_executor(None, self._load_persisted):
+            self._jobs[job["job_id"]] = job
+            if job["status"] in (JobStatus.QUEUED, JobStatus.RUNNING):
+                # Jobs interrupted mid-run restart from the beginning
+                job.update(status=JobStatus.QUEUED, stage="queued", progress=0.0)
+                self._queue.put_nowait(job["job_id"])
+        await self._prune()
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers; unfinished jobs stay on disk and resume on next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, payload: dict) -> dict:
+        """Persist and enqueue a new job, returning its record"""
+        now = time.time()
+        job = {
+            **payload,
+            "job_id": str(uuid.uuid4()),
+            "status": JobStatus.QUEUED,
+            "stage": "queued",
+            "progress": 0.0,
+            "error": None,
+            "result": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self._jobs[job["job_id"]] = job
+        await self._update(job)
+        self._queue.put_nowait(job["job_id"])
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self._jobs.get(job_id)
+
+    async def _update(self, job: dict, **fields):
+        job.update(fields, updated_at=time.time())
+        await asyncio.get_running_loop().run_in_executor(None, self._persist, dict(job))
+
+    async def _worker(self):
+        while True:
+            job = self._jobs[await self._queue.get()]
+            try:
+                await self._update(job, status=JobStatus.RUNNING, stage="starting")
+
+                async def progress(stage: str, fraction: float):
+                    await self._update(job, stage=stage, progress=round(fraction, 2))
+
+                result = await self.handler(job, progress)
+                await self._update(job, status=JobStatus.COMPLETED, stage="completed", progress=1.0, result=result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                detail = getattr(e, "detail", None) or str(e)
+                await self._update(job, status=JobStatus.FAILED, stage="failed", error=detail)
+            finally:
+                self._queue.task_done()
+            await self._prune()
+
+    def stats(self) -> Dict[str, int]:
+        """Return job counts by status and the current queue depth"""
+        counts = {status: 0 for status in (JobStatus.QUEUED, JobStatus.RUNNING, JobStatus.COMPLETED, JobStatus.FAILED)}
+        for job in self._jobs.values():
+            counts[job["status"]] += 1
+        counts["workers"] = self.workers
+        counts["queue_depth"] = self._queue.qsize() if self._queue else 0
+        return counts
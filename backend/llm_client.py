@@ -0,0 +1,284 @@
+import asyncio
+import hashlib
+import json
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from groq import AsyncGroq, APIConnectionError, APIStatusError, APITimeoutError
+
+
+class LLMError(Exception):
+    """An LLM call failed and should not be retried"""
+
+
+class LLMRetryableError(LLMError):
+    """An LLM call failed in a way worth retrying: rate limits, server errors, dropped connections"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _retry_after(headers) -> Optional[float]:
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMProvider(ABC):
+    """Interface for chat completion backends.
+
+    Providers raise LLMRetryableError or LLMError; retries, deadlines and concurrency
+    are handled by LLMClient, so providers make exactly one attempt per call.
+    """
+
+    @abstractmethod
+    async def complete(self, messages: List[dict], model: str, temperature: float, max_tokens: int) -> str:
+        """Return the full completion"""
+
+    @abstractmethod
+    def stream(self, messages: List[dict], model: str, temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        """Yield the completion as it is generated"""
+
+    async def aclose(self):
+        pass
+
+
+class GroqProvider(LLMProvider):
+    """Groq chat completions over a pooled async HTTP client"""
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, max_connections: int = 20):
+        self.client = AsyncGroq(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+            )
+        )
+
+    @staticmethod
+    def _translate(e: Exception) -> LLMError:
+        if isinstance(e, APIStatusError):
+            if e.status_code == 429 or e.status_code >= 500:
+                return LLMRetryableError(str(e), _retry_after(e.response.headers))
+            return LLMError(str(e))
+        if isinstance(e, (APIConnectionError, APITimeoutError)):
+            return LLMRetryableError(str(e))
+        return LLMError(str(e))
+
+    async def complete(self, messages: List[dict], model: str, temperature: float, max_tokens: int) -> str:
+        try:
+            chat_completion = await self.client.chat.completions.create(
+                messages=messages, model=model, temperature=temperature, max_tokens=max_tokens
+            )
+        except Exception as e:
+            raise self._translate(e) from e
+        return chat_completion.choices[0].message.content
+
+    async def stream(self, messages: List[dict], model: str, temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        try:
+            stream = await self.client.chat.completions.create(
+                messages=messages, model=model, temperature=temperature, max_tokens=max_tokens, stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise self._translate(e) from e
+
+    async def aclose(self):
+        await self.client.close()
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Any server exposing an OpenAI-style /v1/chat/completions endpoint, e.g. a local stub or vLLM"""
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, max_connections: int = 20):
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers=headers,
+            timeout=None,  # Deadlines are enforced by LLMClient
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    @staticmethod
+    def _check(response: httpx.Response):
+        if response.status_code == 429 or response.status_code >= 500:
+            raise LLMRetryableError(f"LLM server returned {response.status_code}", _retry_after(response.headers))
+        if response.status_code >= 400:
+            raise LLMError(f"LLM server returned {response.status_code}: {response.text[:200]}")
+
+    async def complete(self, messages: List[dict], model: str, temperature: float, max_tokens: int) -> str:
+        try:
+            response = await self.client.post("/v1/chat/completions", json={
+                "messages": messages, "model": model, "temperature": temperature, "max_tokens": max_tokens
+            })
+        except httpx.TransportError as e:
+            raise LLMRetryableError(str(e)) from e
+        self._check(response)
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def stream(self, messages: List[dict], model: str, temperature: float, max_tokens: int) -> AsyncIterator[str]:
+        body = {"messages": messages, "model": model, "temperature": temperature, "max_tokens": max_tokens, "stream": True}
+        try:
+            async with self.client.stream("POST", "/v1/chat/completions", json=body) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                self._check(response)
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: ") or line == "data: [DONE]":
+                        continue
+                    choices = json.loads(line[len("data: "):]).get("choices") or [{}]
+                    content = choices[0].get("delta", {}).get("content")
+                    if content:
+                        yield content
+        except httpx.TransportError as e:
+            raise LLMRetryableError(str(e)) from e
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def create_provider(name: str, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                    max_connections: int = 20) -> LLMProvider:
+    """Build a provider by name: "groq" or "openai_compatible" (which needs base_url)"""
+    if name == "groq":
+        return GroqProvider(api_key, base_url, max_connections)
+    if name == "openai_compatible":
+        if not base_url:
+            raise ValueError("The openai_compatible LLM provider needs a base URL")
+        return OpenAICompatibleProvider(base_url, api_key, max_connections)
+    raise ValueError(f"Unknown LLM provider: {name}. Supported: groq, openai_compatible")
+
+
+class LLMClient:
+    """Async LLM calls with a concurrency limit, deadlines, jittered retries and request coalescing"""
+
+    def __init__(self, provider: LLMProvider, concurrency: int = 4, timeout: float = 30.0,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0):
+        self.provider = provider
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Full-jitter exponential backoff, never shorter than a server-provided Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    @staticmethod
+    def _request_key(messages: List[dict], params: dict) -> str:
+        return hashlib.sha256(json.dumps([messages, params], sort_keys=True).encode()).hexdigest()
+
+    async def complete(self, messages: List[dict], model: str, temperature: float = 0.3,
+                       max_tokens: int = 1024, timeout: Optional[float] = None) -> str:
+        """Return a completion, sharing the result with identical requests already in flight.
+
+        timeout is the deadline for the whole call, retries and waiting for a slot included.
+        """
+        params = {"model": model, "temperature": temperature, "max_tokens": max_tokens}
+        key = self._request_key(messages, params)
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            deadline = time.monotonic() + (timeout or self.timeout)
+            task = asyncio.ensure_future(self._complete_with_retries(messages, params, deadline))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded so one caller giving up doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _complete_with_retries(self, messages: List[dict], params: dict, deadline: float) -> str:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._attempt(lambda: self.provider.complete(messages, **params), deadline)
+            except LLMRetryableError as e:
+                delay = self._backoff(attempt, e.retry_after)
+                if attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                await asyncio.sleep(delay)
+            except LLMError:
+                self.failures += 1
+                raise
+
+    async def _attempt(self, call: Callable[[], Awaitable[str]], deadline: float) -> str:
+        """Run one provider call under the concurrency limit and the remaining deadline"""
+        async def limited():
+            async with self._semaphore:
+                self.calls += 1
+                return await call()
+
+        try:
+            return await asyncio.wait_for(limited(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMError("LLM call timed out")
+
+    async def stream(self, messages: List[dict], model: str, temperature: float = 0.3,
+                     max_tokens: int = 1024, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Stream a completion. Failures before the first token are retried; later ones are raised.
+
+        timeout bounds the time to the first token; once tokens flow the stream runs to completion.
+        """
+        params = {"model": model, "temperature": temperature, "max_tokens": max_tokens}
+        deadline = time.monotonic() + (timeout or self.timeout)
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                async with self._semaphore:
+                    self.calls += 1
+                    tokens = self.provider.stream(messages, **params).__aiter__()
+                    try:
+                        first = await asyncio.wait_for(tokens.__anext__(), max(0.0, deadline - time.monotonic()))
+                    except StopAsyncIteration:
+                        return
+                    except asyncio.TimeoutError:
+                        self.timeouts += 1
+                        raise LLMError("LLM call timed out")
+                    started = True
+                    yield first
+                    async for token in tokens:
+                        yield token
+                return
+            except LLMRetryableError as e:
+                delay = self._backoff(attempt, e.retry_after)
+                if started or attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                await asyncio.sleep(delay)
+            except LLMError:
+                self.failures += 1
+                raise
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "concurrency": self.concurrency,
+            "in_flight": len(self._in_flight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+        }
+
+    async def aclose(self):
+        await self.provider.aclose()
@@ -1,26 +1,12 @@
-from groq import Groq
-from typing import List, Tuple
+from typing import AsyncIterator, List, Optional, Tuple
+import hashlib
 from config import config
+from context_builder import Passage, PackedContext, pack_context
+from llm_client import LLMClient, LLMError, create_provider
 
-class LLMService:
-    """Handles LLM interactions using Groq"""
-    
-    def __init__(self, api_key: str = None):
-        self.api_key = api_key or config.GROQ_API_KEY
-        if not self.api_key:
-            raise ValueError("Groq API key is required")
-        self.client = Groq(api_key=self.api_key)
-        self.model = config.LLM_MODEL
-    
-    def generate_answer(self, question: str, context_chunks: List[Tuple[str, float, int]]) -> str:
-        """Generate an answer using retrieved context chunks"""
-        
-        # Prepare context from chunks
-        context = "\n\n".join([f"[Chunk {idx + 1}]:\n{chunk}" 
-                               for chunk, score, idx in context_chunks])
-        
-        # Construct prompt
-        prompt = f"""You are a helpful AI assistant answering questions about a document. 
+SYSTEM_PROMPT = "You are a helpful assistant that answers questions based on provided document context. Always cite your sources by mentioning chunk numbers."
+
+PROMPT_TEMPLATE = """You are a helpful AI assistant answering questions about a document. 
 Use ONLY the information provided in the context below to answer the question. 
 If the answer cannot be found in the context, say "I cannot find this information in the provided document."
 
@@ -31,38 +17,84 @@ Question: {question}
 
 Please provide a clear, concise answer based solely on the context above. If you reference specific information, mention which chunk it came from."""
 
+class LLMService:
+    """Builds RAG prompts and generates answers through the async LLM client"""
+    
+    def __init__(self, api_key: str = None, base_url: str = None, provider: str = None):
+        self.api_key = api_key or config.GROQ_API_KEY
+        provider = provider or config.LLM_PROVIDER
+        if provider == "groq" and not self.api_key:
+            raise ValueError("Groq API key is required")
+        # base_url points the provider at a compatible server, e.g. fake_llm_server.py in development
+        self.client = LLMClient(
+            create_provider(provider, self.api_key, base_url or config.LLM_BASE_URL, config.LLM_MAX_CONNECTIONS),
+            concurrency=config.LLM_CONCURRENCY,
+            timeout=config.LLM_TIMEOUT_SECONDS,
+            max_retries=config.LLM_MAX_RETRIES,
+            backoff_base=config.LLM_RETRY_BACKOFF_SECONDS,
+            backoff_max=config.LLM_RETRY_BACKOFF_MAX_SECONDS
+        )
+        self.model = config.LLM_MODEL
+        self.context_token_budget = config.CONTEXT_TOKEN_BUDGET
+        # Identifies the prompt, context packing and model that produced an answer,
+        # so cached answers expire when any of them changes
+        self.prompt_hash = hashlib.sha256(
+            f"{self.model}\n{self.context_token_budget}\n{SYSTEM_PROMPT}\n{PROMPT_TEMPLATE}".encode()
+        ).hexdigest()[:16]
+    
+    def pack_context(self, context_chunks: List[Tuple[str, float, int]], groups: Optional[List[str]] = None) -> PackedContext:
+        """Merge overlapping neighbour chunks and fit them to the context token budget"""
+        return pack_context(context_chunks, self.context_token_budget, groups)
+    
+    def _build_messages(self, question: str, passages: List[Passage]) -> List[dict]:
+        """Build the chat messages for a question and its packed context passages"""
+        
+        # Prepare context from passages
+        context = "\n\n".join([f"[{passage.label}]:\n{passage.text}" for passage in passages])
+        
+        return [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": PROMPT_TEMPLATE.format(context=context, question=question)
+            }
+        ]
+    
+    async def generate_answer(self, question: str, passages: List[Passage]) -> str:
+        """Generate an answer using packed context passages"""
         try:
-            # Call Groq API
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant that answers questions based on provided document context. Always cite your sources by mentioning chunk numbers."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+            return await self.client.complete(
+                self._build_messages(question, passages),
                 model=self.model,
                 temperature=0.3,
-                max_tokens=1024,
+                max_tokens=1024
             )
-            
-            answer = chat_completion.choices[0].message.content
-            return answer
-            
-        except Exception as e:
+        except LLMError as e:
             raise Exception(f"Error generating answer with LLM: {str(e)}")
     
-    def validate_api_key(self) -> bool:
-        """Test if the API key is valid"""
+    async def stream_answer(self, question: str, passages: List[Passage]) -> AsyncIterator[str]:
+        """Generate an answer as a stream of text fragments as the model produces them"""
         try:
-            self.client.chat.completions.create(
-                messages=[{"role": "user", "content": "test"}],
+            async for token in self.client.stream(
+                self._build_messages(question, passages),
                 model=self.model,
-                max_tokens=5
-            )
+                temperature=0.3,
+                max_tokens=1024
+            ):
+                yield token
+        except LLMError as e:
+            raise Exception(f"Error generating answer with LLM: {str(e)}")
+    
+    async def validate_api_key(self) -> bool:
+        """Test if the API key is valid"""
+        try:
+            await self.client.complete([{"role": "user", "content": "test"}], model=self.model, max_tokens=5)
             return True
         except Exception:
             return False
+    
+    async def aclose(self):
+        await self.client.aclose()
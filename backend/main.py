@@ -1,12 +1,14 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, HTTPException, Form, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
 import os
 import uuid
 import time
-import shutil
+import json
 from pathlib import Path
-from typing import List
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
 from config import config
 from models import (
@@ -14,13 +16,37 @@ from models import (
     DocumentInfo, 
     QueryRequest, 
     QueryResponse,
+    CorpusQueryRequest,
+    CorpusQueryResponse,
     SourceReference,
-    ErrorResponse
+    ErrorResponse,
+    IngestionJobResponse,
+    BatchSearchRequest,
+    BatchSearchResponse,
+    SearchResult,
+    BatchQueryRequest,
+    BatchQueryResponse,
+    BatchQueryResult,
+    BulkFileResult,
+    BulkIngestResponse
 )
-from document_processor import DocumentProcessor
-from vector_store import VectorStore
+from document_processor import DocumentProcessor, PageText, extract_page_range, pdf_page_count
+from vector_store import VectorStore, build_embeddings
+from migrate_store import migrate_store
+from document_registry import DocumentRegistry
+from corpus_index import CorpusIndex
+from embeddings import CachedEmbedder, create_embedder
+from answer_cache import AnswerCache, context_hash
+from context_builder import PackedContext
+from rank_fusion import reciprocal_rank_fusion
 from llm_service import LLMService
-from database import DatabaseService
+from database import create_database_service
+from history_writer import HistoryWriter
+from upload_stream import UploadRejected, receive_files
+from archives import archive_suffix, read_archive
+from catalog import DocumentCatalog
+from jobs import IngestionJobQueue
+from executors import ExecutorSaturated, create_cpu_executor, create_io_executor
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -38,21 +64,81 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-document_processor = DocumentProcessor(
-    chunk_size=config.CHUNK_SIZE,
-    chunk_overlap=config.CHUNK_OVERLAP
-)
-vector_store = VectorStore(
-    model_name=config.EMBEDDING_MODEL,
-    store_dir=config.VECTOR_STORE_DIR
-)
-llm_service = LLMService(api_key=config.GROQ_API_KEY)
-db_service = DatabaseService()
+# Services are built by the create_services startup hook rather than at import. The CPU pool
+# spawns worker processes that import this module again, and they need none of these.
+document_processor: DocumentProcessor = None
+embedder = None
+vector_store: VectorStore = None
+corpus_index: CorpusIndex = None
+llm_service: LLMService = None
+answer_cache: AnswerCache = None
+db_service = None
+document_registry: DocumentRegistry = None
+document_catalog: DocumentCatalog = None
+history_writer: HistoryWriter = None
+cpu_executor = None
+io_executor = None
+ingestion_queue: IngestionJobQueue = None
+# Content hash -> (lock, uploads holding or waiting for it), for uploads being ingested
+content_locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+# Upload endpoints read the multipart body themselves, so their form is described here for the docs
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+BULK_UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["files"],
+                    "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}}
+                }
+            }
+        }
+    }
+}
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """Run CPU-bound work in the process pool, returning 503 when it is saturated"""
+    try:
+        return await cpu_executor.run(fn, *args, **kwargs)
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+async def run_io(fn, *args, **kwargs):
+    """Run blocking I/O in the thread pool, returning 503 when it is saturated"""
+    try:
+        return await io_executor.run(fn, *args, **kwargs)
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+@app.on_event("shutdown")
+async def shutdown_executors():
+    cpu_executor.shutdown(wait=False)
+    io_executor.shutdown(wait=False)
+
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    await llm_service.aclose()
 
-# Create necessary directories
-os.makedirs(config.UPLOAD_DIR, exist_ok=True)
-os.makedirs(config.VECTOR_STORE_DIR, exist_ok=True)
 
 # Root endpoint
 @app.get("/")
@@ -62,9 +148,13 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "upload": "/api/documents/upload",
+            "upload_async": "/api/documents/upload/async",
+            "job_status": "/api/jobs/{job_id}",
             "list": "/api/documents",
             "query": "/api/documents/query",
-            "delete": "/api/documents/{document_id}"
+            "corpus_query": "/api/corpus/query",
+            "delete": "/api/documents/{document_id}",
+            "metrics": "/api/metrics"
         }
     }
 
@@ -74,120 +164,789 @@ async def health_check():
     return {"status": "healthy", "timestamp": time.time()}
 
 
-@app.post("/api/documents/upload", response_model=DocumentUploadResponse)
-async def upload_document(file: UploadFile = File(...)):
-    """
-    Upload a document (PDF or TXT) and process it for RAG
+# Metrics endpoint
+@app.get("/api/metrics")
+async def get_metrics():
+    return {
+        "index_cache": vector_store.cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "llm": llm_service.client.stats(),
+        "corpus_index": corpus_index.stats(),
+        "embedding_cache": embedder.stats() if isinstance(embedder, CachedEmbedder) else None,
+        "deduplication": document_registry.stats(),
+        "metadata": db_service.stats(),
+        "catalog_documents": len(document_catalog),
+        "query_history": history_writer.stats(),
+        "executors": {
+            "cpu": cpu_executor.stats(),
+            "io": io_executor.stats()
+        },
+        "ingestion_jobs": ingestion_queue.stats()
+    }
+
+
+def _scan_vector_store_documents() -> List[dict]:
+    """List documents from the metadata files in the vector store directory"""
+    documents = []
+    vector_store_path = Path(config.VECTOR_STORE_DIR)
+    if vector_store_path.exists():
+        for doc_dir in vector_store_path.iterdir():
+            # Dot-directories are saves still being staged
+            if doc_dir.is_dir() and not doc_dir.name.startswith("."):
+                metadata_file = doc_dir / "metadata.json"
+                if metadata_file.exists():
+                    with open(metadata_file, 'r') as f:
+                        metadata = json.load(f)
+                        documents.append({
+                            "id": metadata.get("document_id"),
+                            "filename": metadata.get("filename"),
+                            "upload_time": metadata.get("upload_time"),
+                            "chunk_count": metadata.get("chunk_count"),
+                            "file_size": 0
+                        })
+    return documents
+
+
+async def _accept_upload(request: Request) -> Tuple[str, str, str, str, int, str]:
+    """Stream an uploaded file to disk under a new document ID, validating it on the way.
+    
+    Returns the document ID, file path, filename, extension, size and content hash.
     """
-    try:
-        # Validate file type
-        file_extension = Path(file.filename).suffix.lower()
+    # Generate unique document ID
+    document_id = str(uuid.uuid4())
+    
+    def destination(filename: str) -> str:
+        # Validate file type before any of the file is read
+        file_extension = Path(filename).suffix.lower()
         if file_extension not in config.ALLOWED_EXTENSIONS:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File type {file_extension} not supported. Allowed types: {', '.join(config.ALLOWED_EXTENSIONS)}"
-            )
-        
-        # Validate file size
-        file.file.seek(0, 2)  # Seek to end
-        file_size = file.file.tell()
-        file.file.seek(0)  # Reset to beginning
-        
-        if file_size > config.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File size exceeds maximum allowed size of {config.MAX_FILE_SIZE / (1024*1024)}MB"
+            raise UploadRejected(
+                400, f"File type {file_extension} not supported. Allowed types: {', '.join(config.ALLOWED_EXTENSIONS)}"
             )
-        
-        if file_size == 0:
-            raise HTTPException(status_code=400, detail="File is empty")
-        
-        # Generate unique document ID
-        document_id = str(uuid.uuid4())
-        
-        # Save uploaded file
-        file_path = os.path.join(config.UPLOAD_DIR, f"{document_id}{file_extension}")
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Process document: extract text and chunk
+        return os.path.join(config.UPLOAD_DIR, f"{document_id}{file_extension}")
+    
+    # Size is enforced and the content hashed while the file streams in
+    try:
+        uploads = await receive_files(
+            request, destination, config.MAX_FILE_SIZE, chunk_size=config.UPLOAD_CHUNK_SIZE
+        )
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    if not uploads:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+    upload = uploads[0]
+    if upload.size == 0:
+        os.remove(upload.path)
+        raise HTTPException(status_code=400, detail="File is empty")
+    
+    return document_id, upload.path, upload.filename, Path(upload.filename).suffix.lower(), upload.size, upload.sha256
+
+
+async def _no_progress(stage: str, fraction: float):
+    pass
+
+
+def _link_duplicate(document_id: str, content_hash: str, metadata: dict) -> Optional[Tuple[str, dict, int]]:
+    """Share the processed index of a live document with identical content, if there is one.
+    
+    Returns the source document ID, the new document's metadata and the bytes linked.
+    """
+    for source_id in document_registry.documents(content_hash):
         try:
-            full_text, chunks = document_processor.process_document(file_path, file_extension)
-        except Exception as e:
-            # Clean up file if processing fails
-            os.remove(file_path)
-            raise HTTPException(status_code=400, detail=f"Error processing document: {str(e)}")
-        
-        # Create embeddings and store in vector database
-        metadata = {
-            "filename": file.filename,
-            "document_id": document_id,
-            "chunk_count": len(chunks),
-            "upload_time": time.strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
+            metadata, linked_bytes = vector_store.link_document(source_id, document_id, metadata)
+        except (FileNotFoundError, ValueError):
+            # Its store was deleted or quarantined outside the API
+            document_registry.remove(source_id)
+            continue
+        return source_id, metadata, linked_bytes
+    return None
+
+
+def _remove_index(document_id: str):
+    """Undo the indexing of a document whose upload failed after its store was written"""
+    for remove in (vector_store.delete_index, corpus_index.remove_document, document_registry.remove):
         try:
-            vector_store.process_and_store(document_id, chunks, metadata)
+            remove(document_id)
         except Exception as e:
-            # Clean up file if vector storage fails
-            os.remove(file_path)
-            raise HTTPException(status_code=500, detail=f"Error creating vector store: {str(e)}")
-        
-        # Save document metadata to database
-        db_service.create_document(
+            print(f"Rollback of {document_id} failed in {remove.__name__}: {e}")
+    answer_cache.invalidate_document(document_id)
+
+
+async def _rollback_index(document_id: str):
+    # Off the shared I/O pool, so a saturated pool cannot skip the rollback
+    await asyncio.get_running_loop().run_in_executor(None, _remove_index, document_id)
+
+
+async def _create_record(document_id: str, filename: str, chunk_count: int, file_size: int) -> dict:
+    """Record an indexed document in the database, removing its index if that fails"""
+    try:
+        return await run_io(
+            db_service.create_document,
             document_id=document_id,
-            filename=file.filename,
-            chunk_count=len(chunks),
+            filename=filename,
+            chunk_count=chunk_count,
             file_size=file_size
         )
-        
-        return DocumentUploadResponse(
-            document_id=document_id,
-            filename=file.filename,
-            upload_time=metadata["upload_time"],
-            chunk_count=len(chunks),
-            message="Document uploaded and processed successfully"
-        )
-        
+    except Exception as e:
+        await _rollback_index(document_id)
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"Error saving document metadata: {str(e)}")
+
+
+async def _document_name(document_id: str) -> str:
+    """Filename of a document for answers, or "Unknown Document" if it cannot be looked up"""
+    try:
+        doc_metadata = await run_io(db_service.get_document, document_id)
+    except Exception as e:
+        print(f"Metadata lookup for {document_id} failed: {e}")
+        doc_metadata = None
+    return doc_metadata["filename"] if doc_metadata else "Unknown Document"
+
+
+async def _ingest_duplicate(document_id: str, file_path: str, file_size: int, content_hash: str,
+                            metadata: dict, progress, start_time: float) -> Optional[DocumentUploadResponse]:
+    """Register an upload identical to an existing document without processing it again"""
+    duplicate = await run_io(_link_duplicate, document_id, content_hash, metadata)
+    if duplicate is None:
+        return None
+    source_id, metadata, linked_bytes = duplicate
+    # The shared index makes the uploaded copy redundant; a restarted job may have removed it already
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    
+    try:
+        await progress("indexing", 0.7)
+        answer_cache.invalidate_document(document_id)
+        chunks = await run_io(vector_store.load_chunks, document_id)
+        await run_io(corpus_index.add_document, document_id, list(chunks))
     except HTTPException:
+        # The linked store would otherwise be listed as a document at the next startup
+        await _rollback_index(document_id)
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+        await _rollback_index(document_id)
+        raise HTTPException(status_code=500, detail=f"Error creating vector store: {str(e)}")
+    
+    await progress("saving", 0.9)
+    record = await _create_record(document_id, metadata["filename"], metadata["chunk_count"], file_size)
+    document_catalog.add(record)
+    await run_io(document_registry.add, content_hash, document_id)
+    
+    return DocumentUploadResponse(
+        document_id=document_id,
+        filename=metadata["filename"],
+        upload_time=metadata["upload_time"],
+        chunk_count=metadata["chunk_count"],
+        message="Document is identical to an existing one; its processed index was reused",
+        duplicate_of=source_id,
+        reused_chunks=metadata["chunk_count"],
+        bytes_saved=file_size + linked_bytes,
+        seconds_saved=round(max(0.0, document_registry.processing_seconds(content_hash) - (time.time() - start_time)), 3)
+    )
 
 
-@app.get("/api/documents", response_model=List[DocumentInfo])
-async def get_documents():
+async def _chunk_document(file_path: str, file_extension: str) -> Tuple[List[str], List[PageText]]:
+    """Extract and chunk an upload, returning its chunks and, for a PDF, its pages.
+    
+    A PDF's page ranges are extracted in parallel on the shared CPU pool.
     """
-    Retrieve list of all uploaded documents
+    if file_extension != ".pdf":
+        return await run_cpu(document_processor.chunk_document, file_path, file_extension), []
+    try:
+        page_count = await run_cpu(pdf_page_count, file_path)
+        parts = await asyncio.gather(*(
+            run_cpu(extract_page_range, file_path, start, end)
+            for start, end in document_processor.page_ranges(page_count)
+        ))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise Exception(f"Error extracting text from PDF: {str(e)}")
+    pages = document_processor.check_pages([page for part in parts for page in part])
+    return await run_cpu(document_processor.chunk_pages, pages), pages
+
+
+async def _ingest_document(document_id: str, file_path: str, filename: str, file_extension: str,
+                           file_size: int, content_hash: Optional[str] = None,
+                           progress=_no_progress) -> DocumentUploadResponse:
+    """Extract, chunk, embed and index a saved upload, then record it in the database.
+    
+    An upload whose content_hash matches a live document reuses that document's index instead.
+    Uploads with the same content are ingested one at a time, so when identical files arrive
+    together, the first is processed and the others reuse its index.
     """
+    if not content_hash:
+        return await _ingest_content(document_id, file_path, filename, file_extension, file_size, None, progress)
+    lock, waiters = content_locks.get(content_hash, (asyncio.Lock(), 0))
+    content_locks[content_hash] = (lock, waiters + 1)
+    try:
+        async with lock:
+            return await _ingest_content(
+                document_id, file_path, filename, file_extension, file_size, content_hash, progress
+            )
+    finally:
+        lock, waiters = content_locks[content_hash]
+        if waiters == 1:
+            del content_locks[content_hash]
+        else:
+            content_locks[content_hash] = (lock, waiters - 1)
+
+
+async def _ingest_content(document_id: str, file_path: str, filename: str, file_extension: str,
+                          file_size: int, content_hash: Optional[str], progress) -> DocumentUploadResponse:
+    start_time = time.time()
+    metadata = {
+        "filename": filename,
+        "document_id": document_id,
+        "upload_time": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    if content_hash:
+        response = await _ingest_duplicate(
+            document_id, file_path, file_size, content_hash, metadata, progress, start_time
+        )
+        if response is not None:
+            return response
+    
+    # Process document: extract text and chunk
+    await progress("extracting", 0.1)
+    try:
+        chunks, pages = await _chunk_document(file_path, file_extension)
+    except HTTPException as e:
+        # A saturated executor leaves the upload in place for the caller to retry or remove
+        if e.status_code != 503:
+            os.remove(file_path)
+        raise
+    except Exception as e:
+        # Clean up file if processing fails
+        os.remove(file_path)
+        raise HTTPException(status_code=400, detail=f"Error processing document: {str(e)}")
+    
+    # Create embeddings and store in vector database
+    metadata["chunk_count"] = len(chunks)
+    
+    try:
+        await progress("embedding", 0.4)
+        reused = 0
+        if vector_store.embedder is None:
+            model, embeddings = await run_cpu(build_embeddings, chunks, vector_store.embedding_dim, vector_store.batch_size)
+        else:
+            # The shared model stays loaded in this process, and inference releases the GIL.
+            # Chunks unchanged from an earlier upload come from the embedding cache.
+            model, embeddings, reused = await run_io(vector_store.embed_chunks, chunks)
+        await progress("indexing", 0.7)
+        await run_io(vector_store.store_embeddings, document_id, chunks, model, embeddings, metadata)
+        answer_cache.invalidate_document(document_id)
+        shared_embeddings = embeddings if model is corpus_index.model else None
+        await run_io(corpus_index.add_document, document_id, chunks, embeddings=shared_embeddings)
+    except HTTPException as e:
+        # A store already written would otherwise be listed as a document at the next startup
+        await _rollback_index(document_id)
+        if e.status_code != 503:
+            os.remove(file_path)
+        raise
+    except Exception as e:
+        # Clean up file if vector storage fails
+        await _rollback_index(document_id)
+        os.remove(file_path)
+        raise HTTPException(status_code=500, detail=f"Error creating vector store: {str(e)}")
+    
+    # Save document metadata to database
+    await progress("saving", 0.9)
+    try:
+        record = await _create_record(document_id, filename, len(chunks), file_size)
+    except HTTPException as e:
+        if e.status_code != 503:
+            os.remove(file_path)
+        raise
+    document_catalog.add(record)
+    if content_hash:
+        await run_io(document_registry.add, content_hash, document_id, time.time() - start_time)
+    
+    skipped_pages = [page.page_number + 1 for page in pages if page.error]
+    if skipped_pages:
+        print(f"Skipped unreadable page(s) {', '.join(map(str, skipped_pages))} of {filename} ({document_id})")
+    
+    seconds_per_chunk = embedder.seconds_per_text if isinstance(embedder, CachedEmbedder) else 0.0
+    return DocumentUploadResponse(
+        document_id=document_id,
+        filename=filename,
+        upload_time=metadata["upload_time"],
+        chunk_count=len(chunks),
+        message="Document uploaded and processed successfully",
+        reused_chunks=reused,
+        seconds_saved=round(reused * seconds_per_chunk, 3),
+        page_count=len(pages),
+        skipped_pages=skipped_pages,
+        slowest_page_seconds=round(max((page.seconds for page in pages), default=0.0), 3)
+    )
+
+
+async def _ingest_when_available(document_id: str, file_path: str, filename: str, file_extension: str,
+                                file_size: int, content_hash: Optional[str] = None,
+                                progress=_no_progress) -> DocumentUploadResponse:
+    """Run the upload pipeline for background work, retrying while the executors are saturated"""
+    while True:
+        try:
+            return await _ingest_document(
+                document_id, file_path, filename, file_extension, file_size, content_hash, progress
+            )
+        except HTTPException as e:
+            # Executors are saturated by foreground work; wait and retry instead of failing
+            if e.status_code != 503:
+                raise
+            await asyncio.sleep(1)
+
+
+async def _run_ingestion_job(job: dict, progress) -> dict:
+    """Ingestion queue handler: run the upload pipeline for a saved file"""
+    response = await _ingest_when_available(
+        job["document_id"], job["file_path"], job["filename"],
+        job["file_extension"], job["file_size"], job.get("content_hash"), progress
+    )
+    return response.dict()
+
+
+def _sync_corpus_index():
+    """Backfill the corpus index from the per-document vector stores"""
+    document_ids = [doc["id"] for doc in _scan_vector_store_documents() if doc["id"]]
+    corpus_index.sync(document_ids, vector_store.load_chunks)
+
+
+def _create_services():
+    global document_processor, embedder, vector_store, corpus_index, llm_service, answer_cache, db_service
+    global document_registry, document_catalog, history_writer, cpu_executor, io_executor, ingestion_queue
+    # Create necessary directories
+    os.makedirs(config.UPLOAD_DIR, exist_ok=True)
+    os.makedirs(config.VECTOR_STORE_DIR, exist_ok=True)
+    
+    # Initialize services
+    document_processor = DocumentProcessor(
+        chunk_size=config.CHUNK_SIZE,
+        chunk_overlap=config.CHUNK_OVERLAP,
+        pdf_workers=config.PDF_WORKERS,
+        pdf_pages_per_task=config.PDF_PAGES_PER_TASK,
+        pdf_page_errors=config.PDF_PAGE_ERROR_POLICY
+    )
+    embedder = create_embedder(
+        config.EMBEDDING_BACKEND,
+        model_path=config.EMBEDDING_MODEL_PATH,
+        embedding_dim=config.EMBEDDING_DIM,
+        batch_size=config.EMBEDDING_MODEL_BATCH_SIZE,
+        cache_path=config.EMBEDDING_CACHE_PATH
+    )
+    vector_store = VectorStore(
+        embedder=embedder,
+        store_dir=config.VECTOR_STORE_DIR,
+        cache_max_bytes=config.INDEX_CACHE_MAX_BYTES,
+        batch_size=config.EMBEDDING_BATCH_SIZE,
+        index_type=config.VECTOR_INDEX_TYPE,
+        nprobe=config.IVF_NPROBE,
+        ef_search=config.HNSW_EF_SEARCH,
+        hnsw_m=config.HNSW_M,
+        metric=config.VECTOR_METRIC,
+        min_score=config.MIN_RELEVANCE_SCORE
+    )
+    corpus_index = CorpusIndex(
+        index_dir=config.CORPUS_INDEX_DIR,
+        embedding_dim=vector_store.embedding_dim,
+        batch_size=config.EMBEDDING_BATCH_SIZE,
+        index_type=config.CORPUS_INDEX_TYPE,
+        nprobe=config.IVF_NPROBE,
+        ef_search=config.HNSW_EF_SEARCH,
+        hnsw_m=config.HNSW_M,
+        embedder=embedder,
+        save_interval=config.CORPUS_INDEX_SAVE_INTERVAL_SECONDS
+    )
+    llm_service = LLMService(api_key=config.GROQ_API_KEY)
+    answer_cache = AnswerCache(
+        max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=config.ANSWER_CACHE_TTL_SECONDS,
+        similarity_threshold=config.ANSWER_CACHE_SIMILARITY_THRESHOLD
+    )
+    db_service = create_database_service(
+        config.METADATA_BACKEND,
+        config.METADATA_DB_PATH,
+        mirror=config.METADATA_MIRROR,
+        supabase_url=config.SUPABASE_URL,
+        supabase_key=config.SUPABASE_KEY,
+        pool_size=config.METADATA_POOL_SIZE
+    )
+    document_registry = DocumentRegistry(config.DOCUMENT_REGISTRY_PATH)
+    document_catalog = DocumentCatalog()
+    history_writer = HistoryWriter(
+        db_service.save_query_batch,
+        batch_size=config.HISTORY_BATCH_SIZE,
+        flush_interval=config.HISTORY_FLUSH_INTERVAL_SECONDS,
+        max_pending=config.HISTORY_MAX_PENDING,
+        overflow_policy=config.HISTORY_OVERFLOW_POLICY,
+        spill_path=config.HISTORY_SPILL_PATH
+    )
+    
+    # Executors for blocking work, kept off the event loop
+    cpu_executor = create_cpu_executor(config.CPU_WORKERS, config.CPU_QUEUE_SIZE)
+    io_executor = create_io_executor(config.IO_WORKERS, config.IO_QUEUE_SIZE)
+    
+    ingestion_queue = IngestionJobQueue(
+        jobs_dir=config.JOBS_DIR,
+        handler=_run_ingestion_job,
+        workers=config.INGESTION_WORKERS,
+        retention_seconds=config.JOBS_RETENTION_SECONDS,
+        max_finished=config.JOBS_MAX_FINISHED
+    )
+
+
+@app.on_event("startup")
+async def create_services():
+    """Build the services; registered first, so every other startup hook can use them"""
+    _create_services()
+
+
+@app.on_event("startup")
+async def migrate_vector_store():
+    """Convert documents saved in the old pickle format before anything reads them"""
+    migrated = await run_io(migrate_store, config.VECTOR_STORE_DIR)
+    if migrated:
+        print(f"Migrated {len(migrated)} document(s) to the memory-mapped store format")
+
+
+@app.on_event("startup")
+async def verify_vector_store():
+    """Quarantine document stores a crash left incomplete or that fail their checksums"""
+    quarantined = await run_io(vector_store.quarantine_incomplete, config.STORE_SCAN_WORKERS)
+    for document_id, reason in quarantined.items():
+        print(f"Quarantined vector store for document {document_id}: {reason}")
+
+
+def _backfill_metadata() -> int:
+    """Record documents stored before local metadata existed, so they stay listed"""
+    rows = []
+    for doc in _scan_vector_store_documents():
+        if doc["id"] and doc["filename"]:
+            uploads = list(Path(config.UPLOAD_DIR).glob(f"{doc['id']}.*"))
+            rows.append({
+                "id": doc["id"],
+                "filename": doc["filename"],
+                "chunk_count": doc["chunk_count"] or 0,
+                "file_size": uploads[0].stat().st_size if uploads else 0,
+                "upload_time": doc["upload_time"] or ""
+            })
+    return db_service.backfill_documents(rows)
+
+
+@app.on_event("startup")
+async def backfill_metadata():
+    try:
+        backfilled = await run_io(_backfill_metadata)
+    except Exception as e:
+        # Only reachable with a remote metadata backend; listing falls back to the vector store below
+        print(f"Metadata backfill error: {e}")
+        return
+    if backfilled:
+        print(f"Recorded {backfilled} existing document(s) in the metadata database")
+
+
+def _load_catalog():
+    """Build the document catalog once; uploads and deletes keep it current afterwards"""
     try:
-        # Get documents from database
         documents = db_service.get_all_documents()
+    except Exception as e:
+        print(f"Metadata query error: {e}")
+        documents = []
+    if not documents:
+        # Metadata unavailable: list what the vector store holds
+        documents = [doc for doc in _scan_vector_store_documents() if doc["id"]]
+    document_catalog.load(documents)
+
+
+@app.on_event("startup")
+async def load_document_catalog():
+    await run_io(_load_catalog)
+
+
+@app.on_event("startup")
+async def sync_corpus_index():
+    await run_io(_sync_corpus_index)
+
+
+@app.on_event("startup")
+async def start_ingestion_queue():
+    await ingestion_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_ingestion_queue():
+    await ingestion_queue.stop()
+
+
+@app.on_event("startup")
+async def start_history_writer():
+    await history_writer.start()
+
+
+@app.on_event("shutdown")
+async def stop_history_writer():
+    await history_writer.stop()
+
+
+@app.on_event("shutdown")
+async def close_corpus_index():
+    await asyncio.get_running_loop().run_in_executor(None, corpus_index.close)
+
+
+@app.on_event("shutdown")
+async def close_database():
+    await asyncio.get_running_loop().run_in_executor(None, db_service.close)
+
+
+def _job_response(job: dict) -> IngestionJobResponse:
+    return IngestionJobResponse(
+        job_id=job["job_id"],
+        status=job["status"],
+        stage=job["stage"],
+        progress=job["progress"],
+        document_id=job["document_id"],
+        filename=job["filename"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+        error=job["error"],
+        result=job["result"]
+    )
+
+
+@app.post("/api/documents/upload", response_model=DocumentUploadResponse, openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_document(request: Request):
+    """
+    Upload a document (PDF or TXT) and process it for RAG
+    """
+    file_path = None
+    try:
+        document_id, file_path, filename, file_extension, file_size, content_hash = await _accept_upload(request)
+        return await _ingest_document(document_id, file_path, filename, file_extension, file_size, content_hash)
         
-        # If database is empty, try to get from vector store directory
-        if not documents:
-            vector_store_path = Path(config.VECTOR_STORE_DIR)
-            if vector_store_path.exists():
-                documents = []
-                for doc_dir in vector_store_path.iterdir():
-                    if doc_dir.is_dir():
-                        metadata_file = doc_dir / "metadata.json"
-                        if metadata_file.exists():
-                            import json
-                            with open(metadata_file, 'r') as f:
-                                metadata = json.load(f)
-                                documents.append({
-                                    "id": metadata.get("document_id"),
-                                    "filename": metadata.get("filename"),
-                                    "upload_time": metadata.get("upload_time"),
-                                    "chunk_count": metadata.get("chunk_count"),
-                                    "file_size": 0
-                                })
-        
-        return documents
+    except HTTPException as e:
+        # A saturated executor left the upload behind; the client retries with a new request
+        if e.status_code == 503 and file_path and os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@app.post("/api/documents/upload/async", response_model=IngestionJobResponse, status_code=202,
+          openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_document_async(request: Request):
+    """
+    Upload a document and process it in the background, returning a job to poll
+    """
+    try:
+        document_id, file_path, filename, file_extension, file_size, content_hash = await _accept_upload(request)
+        job = await ingestion_queue.submit({
+            "document_id": document_id,
+            "file_path": file_path,
+            "filename": filename,
+            "file_extension": file_extension,
+            "file_size": file_size,
+            "content_hash": content_hash
+        })
+        return _job_response(job)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving documents: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+def _bulk_failure(filename: str, file_path: str, file_size: int, error: str) -> BulkFileResult:
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    return BulkFileResult(filename=filename, status="failed", file_size=file_size, error=error)
+
+
+async def _bulk_ingest_file(filename: str, document_name: str, file_path: str, file_size: int,
+                            content_hash: str) -> BulkFileResult:
+    """Process one file of a bulk upload, saved under its document ID, into a per-file result"""
+    if file_size == 0:
+        return _bulk_failure(filename, file_path, file_size, "File is empty")
+    
+    start_time = time.time()
+    try:
+        response = await _ingest_when_available(
+            Path(file_path).stem, file_path, document_name, Path(file_path).suffix, file_size, content_hash
+        )
+    except HTTPException as e:
+        return _bulk_failure(filename, file_path, file_size, e.detail)
+    except Exception as e:
+        return _bulk_failure(filename, file_path, file_size, str(e))
+    
+    return BulkFileResult(
+        filename=filename,
+        status="completed",
+        document_id=response.document_id,
+        chunk_count=response.chunk_count,
+        file_size=file_size,
+        duplicate_of=response.duplicate_of,
+        processing_time=round(time.time() - start_time, 3)
+    )
+
+
+@app.post("/api/documents/bulk", response_model=BulkIngestResponse, openapi_extra=BULK_UPLOAD_REQUEST_BODY)
+async def bulk_upload_documents(request: Request):
+    """
+    Upload many documents, or zip/tar archives of them, and process them concurrently.
+    
+    Archives are read one entry at a time as workers become free, rather than unpacked up front.
+    Each file gets its own result; failures do not stop the rest of the upload.
+    """
+    start_time = time.time()
+    
+    def destination(filename: str) -> str:
+        suffix = archive_suffix(filename)
+        if suffix:
+            # Removed once its entries have been read
+            return os.path.join(config.UPLOAD_DIR, f".bulk-{uuid.uuid4()}{suffix}")
+        file_extension = Path(filename).suffix.lower()
+        if file_extension not in config.ALLOWED_EXTENSIONS:
+            raise UploadRejected(
+                400, f"File type {file_extension} not supported. Allowed types: "
+                     f"{', '.join(config.ALLOWED_EXTENSIONS)} and zip/tar archives"
+            )
+        # Named by its document ID, like a single upload
+        return os.path.join(config.UPLOAD_DIR, f"{uuid.uuid4()}{file_extension}")
+    
+    def file_size_limit(filename: str) -> int:
+        # An archive may carry the whole upload; the documents in it are checked as they are read
+        return config.BULK_MAX_UPLOAD_SIZE if archive_suffix(filename) else config.MAX_FILE_SIZE
+    
+    try:
+        uploads = await receive_files(
+            request, destination, config.MAX_FILE_SIZE, field_name="files",
+            max_files=config.BULK_MAX_FILES, max_total_size=config.BULK_MAX_UPLOAD_SIZE,
+            file_size_limit=file_size_limit, skip_oversized=True, chunk_size=config.UPLOAD_CHUNK_SIZE
+        )
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if not uploads:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    
+    # Results keyed by their position in the upload, so they come back in order
+    results: Dict[int, BulkFileResult] = {}
+    # Bounded so archive entries are only extracted shortly before a worker takes them
+    pending: asyncio.Queue = asyncio.Queue(maxsize=config.BULK_WORKERS)
+    loop = asyncio.get_running_loop()
+    
+    def entry_destination(name: str) -> str:
+        return os.path.join(config.UPLOAD_DIR, f"{uuid.uuid4()}{Path(name).suffix.lower()}")
+    
+    async def read_uploads():
+        position = 0
+        try:
+            for upload in uploads:
+                suffix = archive_suffix(upload.filename)
+                if upload.error is not None:
+                    results[position] = BulkFileResult(
+                        filename=upload.filename, status="failed", file_size=upload.size, error=upload.error
+                    )
+                    position += 1
+                    continue
+                if suffix is None:
+                    await pending.put((position, upload.filename, upload.filename, upload.path, upload.size, upload.sha256))
+                    position += 1
+                    continue
+                entries = read_archive(
+                    upload.path, suffix, entry_destination, config.ALLOWED_EXTENSIONS, config.MAX_FILE_SIZE,
+                    config.BULK_MAX_ARCHIVE_ENTRIES, config.UPLOAD_CHUNK_SIZE
+                )
+                try:
+                    while True:
+                        # Each step copies one entry out of the archive, so it runs off the event loop
+                        entry = await loop.run_in_executor(None, next, entries, None)
+                        if entry is None:
+                            break
+                        filename = f"{upload.filename}/{entry.name}"
+                        if entry.path is None:
+                            results[position] = BulkFileResult(
+                                filename=filename, status="skipped" if entry.skipped else "failed", error=entry.error
+                            )
+                        else:
+                            await pending.put((position, filename, entry.name, entry.path, entry.size, entry.sha256))
+                        position += 1
+                except Exception as e:
+                    results[position] = BulkFileResult(
+                        filename=upload.filename, status="failed", error=f"Error reading archive: {str(e)}"
+                    )
+                    position += 1
+                finally:
+                    os.remove(upload.path)
+        finally:
+            # Uploads left unread after an error
+            for upload in uploads:
+                if archive_suffix(upload.filename) and upload.path and os.path.exists(upload.path):
+                    os.remove(upload.path)
+            for _ in range(config.BULK_WORKERS):
+                await pending.put(None)
+    
+    async def ingest_pending():
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            position, *file = item
+            results[position] = await _bulk_ingest_file(*file)
+    
+    await asyncio.gather(read_uploads(), *(ingest_pending() for _ in range(config.BULK_WORKERS)))
+    
+    ordered = [results[position] for position in sorted(results)]
+    completed = [result for result in ordered if result.status == "completed"]
+    total_bytes = sum(result.file_size for result in completed)
+    processing_time = time.time() - start_time
+    return BulkIngestResponse(
+        results=ordered,
+        completed=len(completed),
+        failed=sum(1 for result in ordered if result.status == "failed"),
+        skipped=sum(1 for result in ordered if result.status == "skipped"),
+        total_bytes=total_bytes,
+        processing_time=round(processing_time, 3),
+        documents_per_second=round(len(completed) / processing_time, 3) if processing_time else 0.0,
+        mb_per_second=round(total_bytes / (1024*1024) / processing_time, 3) if processing_time else 0.0
+    )
+
+
+@app.get("/api/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_job(job_id: str):
+    """
+    Get the status and progress of a background ingestion job
+    """
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
+
+
+@app.get("/api/documents", response_model=List[DocumentInfo])
+async def get_documents(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=config.DOCUMENT_PAGE_MAX_SIZE),
+    cursor: Optional[str] = None,
+    filename_prefix: Optional[str] = None,
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None
+):
+    """
+    List uploaded documents, newest first, optionally one page at a time.
+    
+    With a limit, the X-Next-Cursor response header holds the cursor for the next page;
+    it is absent on the last page.
+    """
+    try:
+        documents, next_cursor = document_catalog.page(
+            limit, cursor, filename_prefix, uploaded_after, uploaded_before
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return documents
 
 
 @app.post("/api/documents/query", response_model=QueryResponse)
@@ -204,48 +963,44 @@ async def query_document(query_request: QueryRequest):
         
         # Retrieve relevant chunks from vector store
         try:
-            results = vector_store.search(
-                document_id=query_request.document_id,
-                query=query_request.question,
-                top_k=config.TOP_K_RESULTS
+            # Search is thread-safe: each document carries its own embedding model
+            [results], [ranker_scores] = await _search(
+                query_request.document_id,
+                [query_request.question],
+                top_k=config.TOP_K_RESULTS,
+                mode=query_request.retrieval_mode,
+                nprobe=query_request.nprobe,
+                ef_search=query_request.ef_search
             )
         except FileNotFoundError:
             raise HTTPException(status_code=404, detail="Document not found")
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error searching vector store: {str(e)}")
         
         if not results:
             raise HTTPException(status_code=404, detail="No relevant information found in document")
         
-        # Generate answer using LLM
+        # Merge overlapping neighbour chunks and fit them to the context token budget
+        packed = llm_service.pack_context(results)
+        
+        # Generate answer using LLM, or reuse a cached one
         try:
-            answer = llm_service.generate_answer(query_request.question, results)
+            answer, cached = await generate_answer_cached(query_request.document_id, query_request.question, packed)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error generating answer: {str(e)}")
         
         # Get document metadata
-        doc_metadata = db_service.get_document(query_request.document_id)
-        document_name = doc_metadata["filename"] if doc_metadata else "Unknown Document"
+        document_name = await _document_name(query_request.document_id)
         
         # Prepare source references
-        sources = [
-            SourceReference(
-                chunk_text=chunk_text[:300] + "..." if len(chunk_text) > 300 else chunk_text,
-                relevance_score=round(score, 4),
-                chunk_index=idx
-            )
-            for chunk_text, score, idx in results
-        ]
+        sources = _source_references(results, ranker_scores)
         
-        # Save query to history (optional)
-        try:
-            db_service.save_query_history(
-                document_id=query_request.document_id,
-                question=query_request.question,
-                answer=answer
-            )
-        except:
-            pass  # Don't fail if history save fails
+        # Save query to history in the background
+        history_writer.submit(query_request.document_id, query_request.question, answer)
         
         processing_time = time.time() - start_time
         
@@ -255,7 +1010,439 @@ async def query_document(query_request: QueryRequest):
             document_id=query_request.document_id,
             document_name=document_name,
             sources=sources,
-            processing_time=round(processing_time, 2)
+            processing_time=round(processing_time, 2),
+            cached=cached,
+            context_tokens=packed.tokens,
+            context_tokens_saved=packed.tokens_saved
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+async def _cached_query_embedding(document_id: str, question: str):
+    """Query embedding for near-duplicate answer cache lookups, or None when that matching is off"""
+    if not answer_cache.similarity_threshold:
+        return None
+    return (await run_io(vector_store.embed_queries, document_id, [question]))[0]
+
+
+def _answer_context(packed: PackedContext) -> str:
+    """Answer cache context key for the chunks that went into a prompt"""
+    chunk_ids = [idx for passage in packed.passages for idx in passage.chunk_indices]
+    return context_hash(chunk_ids, llm_service.prompt_hash)
+
+
+async def generate_answer_cached(document_id: str, question: str, packed: PackedContext) -> Tuple[str, bool]:
+    """Answer from the answer cache when possible, otherwise call the LLM and cache the result.
+    
+    Returns (answer, cached).
+    """
+    context = _answer_context(packed)
+    query_embedding = await _cached_query_embedding(document_id, question)
+    answer = answer_cache.get(document_id, question, context, query_embedding)
+    if answer is not None:
+        return answer, True
+    
+    generation_start = time.time()
+    answer = await llm_service.generate_answer(question, packed.passages)
+    answer_cache.put(document_id, question, context, answer, time.time() - generation_start, query_embedding)
+    return answer, False
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/api/documents/query/stream")
+async def query_document_stream(query_request: QueryRequest):
+    """
+    Ask a question about a document and stream the answer as Server-Sent Events.
+    
+    Events: "sources" with the retrieved chunks, one "token" per answer fragment,
+    then "done" with timings, or "error" if generation fails midway.
+    """
+    start_time = time.time()
+    
+    if not query_request.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    
+    # Retrieval errors are returned as normal HTTP errors before the stream starts
+    try:
+        [results], [ranker_scores] = await _search(
+            query_request.document_id,
+            [query_request.question],
+            top_k=config.TOP_K_RESULTS,
+            mode=query_request.retrieval_mode,
+            nprobe=query_request.nprobe,
+            ef_search=query_request.ef_search
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Document not found")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching vector store: {str(e)}")
+    
+    if not results:
+        raise HTTPException(status_code=404, detail="No relevant information found in document")
+    
+    document_name = await _document_name(query_request.document_id)
+    
+    packed = llm_service.pack_context(results)
+    
+    async def events():
+        yield _sse_event("sources", {
+            "question": query_request.question,
+            "document_id": query_request.document_id,
+            "document_name": document_name,
+            "sources": [source.dict() for source in _source_references(results, ranker_scores)]
+        })
+        
+        generation_start = time.time()
+        first_token_time = None
+        answer_parts = []
+        try:
+            context = _answer_context(packed)
+            query_embedding = await _cached_query_embedding(query_request.document_id, query_request.question)
+            cached_answer = answer_cache.get(query_request.document_id, query_request.question, context, query_embedding)
+            if cached_answer is not None:
+                # A cached answer goes out as a single token
+                first_token_time = time.time()
+                answer_parts.append(cached_answer)
+                yield _sse_event("token", {"text": cached_answer})
+            else:
+                async for token in llm_service.stream_answer(query_request.question, packed.passages):
+                    if first_token_time is None:
+                        first_token_time = time.time()
+                    answer_parts.append(token)
+                    yield _sse_event("token", {"text": token})
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            yield _sse_event("error", {"detail": detail})
+            return
+        
+        answer = "".join(answer_parts)
+        if cached_answer is None:
+            answer_cache.put(
+                query_request.document_id, query_request.question, context, answer,
+                time.time() - generation_start, query_embedding
+            )
+        history_writer.submit(query_request.document_id, query_request.question, answer)
+        
+        yield _sse_event("done", {
+            "answer": answer,
+            "retrieval_time": round(generation_start - start_time, 3),
+            "time_to_first_token": round(first_token_time - start_time, 3) if first_token_time else None,
+            "total_time": round(time.time() - start_time, 3),
+            "cached": cached_answer is not None,
+            "context_tokens": packed.tokens,
+            "context_tokens_saved": packed.tokens_saved
+        })
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _source_references(results: List[Tuple[str, float, int]],
+                       ranker_scores: Optional[List[Dict[str, float]]] = None) -> List[SourceReference]:
+    """Source references for (chunk_text, score, chunk_index) results, with long chunks truncated"""
+    ranker_scores = ranker_scores or [{} for _ in results]
+    return [
+        SourceReference(
+            chunk_text=chunk_text[:300] + "..." if len(chunk_text) > 300 else chunk_text,
+            relevance_score=round(score, 4),
+            chunk_index=idx,
+            dense_score=round(scores["dense"], 4) if "dense" in scores else None,
+            sparse_score=round(scores["sparse"], 4) if "sparse" in scores else None
+        )
+        for (chunk_text, score, idx), scores in zip(results, ranker_scores)
+    ]
+
+
+async def _search(document_id: str, queries: List[str], top_k: int, mode: Optional[str] = None,
+                  **search_options) -> Tuple[List[list], List[List[Dict[str, float]]]]:
+    """Search one document for every query with the requested retrieval mode.
+    
+    Returns each query's (chunk_text, score, chunk_index) results, and for every result the
+    score each ranker gave it. "hybrid" runs the dense and sparse rankers concurrently over
+    HYBRID_CANDIDATES chunks each and fuses their rankings with reciprocal rank fusion.
+    """
+    mode = mode or config.RETRIEVAL_MODE
+    if mode != "hybrid":
+        results = await run_io(
+            vector_store.search_many, document_id=document_id, queries=queries, top_k=top_k, mode=mode,
+            **search_options
+        )
+        return results, [[{mode: score} for _, score, _ in query_results] for query_results in results]
+    
+    candidates = max(top_k, config.HYBRID_CANDIDATES)
+    dense, sparse = await asyncio.gather(
+        run_io(
+            vector_store.search_many, document_id=document_id, queries=queries, top_k=candidates, mode="dense",
+            **search_options
+        ),
+        run_io(vector_store.search_many, document_id=document_id, queries=queries, top_k=candidates, mode="sparse")
+    )
+    fused = [
+        reciprocal_rank_fusion({"dense": dense_results, "sparse": sparse_results}, top_k, config.HYBRID_RRF_K)
+        for dense_results, sparse_results in zip(dense, sparse)
+    ]
+    return [results for results, _ in fused], [scores for _, scores in fused]
+
+
+@app.post("/api/documents/search/batch", response_model=BatchSearchResponse)
+async def search_document_batch(search_request: BatchSearchRequest):
+    """
+    Retrieve the most relevant chunks of one document for many questions at once
+    """
+    start_time = time.time()
+    
+    try:
+        questions = [question.strip() for question in search_request.questions]
+        if not questions or not all(questions):
+            raise HTTPException(status_code=400, detail="Questions cannot be empty")
+        if len(questions) > config.MAX_BATCH_QUESTIONS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {config.MAX_BATCH_QUESTIONS} questions are allowed per request"
+            )
+        
+        try:
+            # All questions are embedded and searched in a single matrix call per ranker
+            results, ranker_scores = await _search(
+                search_request.document_id,
+                questions,
+                top_k=search_request.top_k or config.TOP_K_RESULTS,
+                mode=search_request.retrieval_mode,
+                min_score=search_request.min_score,
+                nprobe=search_request.nprobe,
+                ef_search=search_request.ef_search
+            )
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Document not found")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error searching vector store: {str(e)}")
+        
+        return BatchSearchResponse(
+            document_id=search_request.document_id,
+            results=[
+                SearchResult(question=question, sources=_source_references(question_results, question_scores))
+                for question, question_results, question_scores in zip(questions, results, ranker_scores)
+            ],
+            processing_time=round(time.time() - start_time, 2)
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@app.post("/api/documents/query/batch", response_model=BatchQueryResponse)
+async def query_documents_batch(batch_request: BatchQueryRequest):
+    """
+    Answer many questions about one or more documents in a single request.
+    
+    Each document's index is loaded and searched once for all of its questions, and
+    answers are generated concurrently, up to the LLM client's concurrency limit.
+    A failing question is reported in its result without failing the batch.
+    """
+    start_time = time.time()
+    
+    try:
+        queries = batch_request.queries
+        if not queries or not all(item.question.strip() for item in queries):
+            raise HTTPException(status_code=400, detail="Questions cannot be empty")
+        if len(queries) > config.MAX_BATCH_QUESTIONS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {config.MAX_BATCH_QUESTIONS} questions are allowed per request"
+            )
+        
+        # Group question positions by document so each index is searched once
+        positions_by_document: Dict[str, List[int]] = {}
+        for position, item in enumerate(queries):
+            positions_by_document.setdefault(item.document_id, []).append(position)
+        
+        async def retrieve(document_id: str, positions: List[int]) -> Tuple[list, list, Optional[str], Optional[str], float]:
+            """Search one document for all of its questions: (results, ranker_scores, document_name, error, seconds)"""
+            retrieval_start = time.time()
+            try:
+                results, ranker_scores = await _search(
+                    document_id,
+                    [queries[position].question for position in positions],
+                    top_k=config.TOP_K_RESULTS,
+                    mode=batch_request.retrieval_mode,
+                    nprobe=batch_request.nprobe,
+                    ef_search=batch_request.ef_search
+                )
+            except FileNotFoundError:
+                return [], [], None, "Document not found", time.time() - retrieval_start
+            except HTTPException as e:
+                return [], [], None, e.detail, time.time() - retrieval_start
+            except Exception as e:
+                return [], [], None, f"Error searching vector store: {str(e)}", time.time() - retrieval_start
+            
+            document_name = await _document_name(document_id)
+            return results, ranker_scores, document_name, None, time.time() - retrieval_start
+        
+        async def answer(position: int, results: list, ranker_scores: list, document_name: Optional[str],
+                         error: Optional[str], retrieval_time: float) -> BatchQueryResult:
+            item = queries[position]
+            answer_text = None
+            cached = False
+            generation_time = 0.0
+            packed = llm_service.pack_context(results)
+            
+            if error is None and not results:
+                error = "No relevant information found in document"
+            if error is None:
+                generation_start = time.time()
+                try:
+                    answer_text, cached = await generate_answer_cached(item.document_id, item.question, packed)
+                except HTTPException as e:
+                    error = e.detail
+                except Exception as e:
+                    error = f"Error generating answer: {str(e)}"
+                generation_time = time.time() - generation_start
+            
+            if answer_text is not None:
+                history_writer.submit(item.document_id, item.question, answer_text)
+            
+            return BatchQueryResult(
+                question=item.question,
+                document_id=item.document_id,
+                document_name=document_name,
+                answer=answer_text,
+                sources=_source_references(results, ranker_scores),
+                error=error,
+                retrieval_time=round(retrieval_time, 3),
+                generation_time=round(generation_time, 3),
+                processing_time=round(time.time() - start_time, 3),
+                cached=cached,
+                context_tokens=packed.tokens,
+                context_tokens_saved=packed.tokens_saved
+            )
+        
+        retrievals = await asyncio.gather(*(
+            retrieve(document_id, positions) for document_id, positions in positions_by_document.items()
+        ))
+        
+        answers = []
+        for positions, (results, ranker_scores, document_name, error, retrieval_time) in zip(
+                positions_by_document.values(), retrievals):
+            for i, position in enumerate(positions):
+                answers.append(answer(
+                    position, results[i] if results else [], ranker_scores[i] if results else [],
+                    document_name, error, retrieval_time
+                ))
+        
+        # Answers come back grouped by document; restore the request order
+        order = [position for positions in positions_by_document.values() for position in positions]
+        batch_results: List[Optional[BatchQueryResult]] = [None] * len(queries)
+        for position, result in zip(order, await asyncio.gather(*answers)):
+            batch_results[position] = result
+        
+        return BatchQueryResponse(
+            results=batch_results,
+            processing_time=round(time.time() - start_time, 2)
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+def _search_corpus(query_request: CorpusQueryRequest) -> List[Tuple[str, float, int, str, str]]:
+    """Search the corpus index and resolve hits to (chunk_text, score, chunk_index, document_id, filename)"""
+    hits = corpus_index.search(
+        query_request.question,
+        query_request.top_k or config.TOP_K_RESULTS,
+        query_request.document_ids,
+        nprobe=query_request.nprobe,
+        ef_search=query_request.ef_search
+    )
+    results = []
+    unreadable = set()
+    for document_id, chunk_index, score in hits:
+        if document_id in unreadable:
+            continue
+        try:
+            _, chunks, _, metadata = vector_store.load_index(document_id)
+        except FileNotFoundError:
+            continue  # Deleted after the corpus search
+        except ValueError as e:
+            # Built with another embedder or in an old format; the other hits still answer
+            unreadable.add(document_id)
+            print(f"Skipping corpus hits from {document_id}: {e}")
+            continue
+        if chunk_index >= len(chunks):
+            continue  # Re-indexed with fewer chunks after the corpus search
+        results.append((chunks[chunk_index], score, chunk_index, document_id, metadata.get("filename", "Unknown Document")))
+    return results
+
+
+@app.post("/api/corpus/query", response_model=CorpusQueryResponse)
+async def query_corpus(query_request: CorpusQueryRequest):
+    """
+    Ask a question across all documents, or a subset of them, using the shared corpus index
+    """
+    start_time = time.time()
+    
+    try:
+        if not query_request.question.strip():
+            raise HTTPException(status_code=400, detail="Question cannot be empty")
+        
+        try:
+            results = await run_io(_search_corpus, query_request)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error searching corpus index: {str(e)}")
+        
+        if not results:
+            raise HTTPException(status_code=404, detail="No relevant information found in documents")
+        
+        # Chunks only merge with neighbours from the same document
+        packed = llm_service.pack_context(
+            [(chunk_text, score, idx) for chunk_text, score, idx, _, _ in results],
+            groups=[document_id for _, _, _, document_id, _ in results]
+        )
+        
+        try:
+            answer = await llm_service.generate_answer(query_request.question, packed.passages)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error generating answer: {str(e)}")
+        
+        sources = [
+            SourceReference(
+                chunk_text=chunk_text[:300] + "..." if len(chunk_text) > 300 else chunk_text,
+                relevance_score=round(score, 4),
+                chunk_index=idx,
+                document_id=document_id,
+                document_name=document_name
+            )
+            for chunk_text, score, idx, document_id, document_name in results
+        ]
+        
+        return CorpusQueryResponse(
+            question=query_request.question,
+            answer=answer,
+            sources=sources,
+            processing_time=round(time.time() - start_time, 2),
+            context_tokens=packed.tokens,
+            context_tokens_saved=packed.tokens_saved
         )
         
     except HTTPException:
@@ -271,11 +1458,18 @@ async def delete_document(document_id: str):
     """
     try:
         # Delete from database
-        db_service.delete_document(document_id)
+        await run_io(db_service.delete_document, document_id)
+        document_catalog.remove(document_id)
         
         # Delete vector store
         try:
-            vector_store.delete_index(document_id)
+            answer_cache.invalidate_document(document_id)
+            await run_io(vector_store.delete_index, document_id)
+            await run_io(corpus_index.remove_document, document_id)
+            # Documents sharing its content keep their hard-linked copies of the index files
+            await run_io(document_registry.remove, document_id)
+        except HTTPException:
+            raise
         except:
             pass  # Continue even if vector store deletion fails
         
@@ -292,6 +1486,8 @@ async def delete_document(document_id: str):
             "document_id": document_id
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting document: {str(e)}")
 
@@ -302,11 +1498,15 @@ async def get_document_history(document_id: str):
     Get query history for a specific document (bonus feature)
     """
     try:
-        history = db_service.get_query_history(document_id)
+        history = await run_io(db_service.get_query_history, document_id)
+        # Questions still waiting for the next history flush come first, newest first
+        history = history_writer.pending(document_id) + history
         return {
             "document_id": document_id,
             "history": history
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving history: {str(e)}")
 
@@ -316,7 +1516,8 @@ async def get_document_history(document_id: str):
 async def http_exception_handler(request, exc):
     return JSONResponse(
         status_code=exc.status_code,
-        content=ErrorResponse(error=exc.detail).dict()
+        content=ErrorResponse(error=exc.detail).dict(),
+        headers=getattr(exc, "headers", None)
     )
 
 
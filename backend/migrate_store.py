@@ -0,0 +1,91 @@
+"""Convert documents saved in the original pickle format to the memory-mapped store format.
+
+Chunk lists become chunks.bin + chunk_offsets.npy and pickled TF-IDF vectorizers become a
+vocabulary/IDF pair. The server runs this at startup; run it by hand to convert a copied store:
+
+    python migrate_store.py --store-dir vector_store
+"""
+import argparse
+import json
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import faiss
+
+from chunk_store import write_chunks
+from embeddings import TfidfEmbeddingModel
+from index_factory import index_type_of
+from vector_store import LEGACY_FILES, STORE_FORMAT
+
+
+def needs_migration(doc_dir: str) -> bool:
+    return os.path.exists(os.path.join(doc_dir, "chunks.pkl"))
+
+
+def migrate_document(doc_dir: str):
+    """Rewrite one document directory in place.
+
+    New files are written before metadata is updated and the pickles are removed last,
+    so an interrupted migration leaves a directory that is simply migrated again.
+    """
+    with open(os.path.join(doc_dir, "chunks.pkl"), 'rb') as f:
+        chunks = pickle.load(f)
+    write_chunks(doc_dir, chunks)
+
+    index = faiss.read_index(os.path.join(doc_dir, "index.faiss"))
+    vectorizer_path = os.path.join(doc_dir, "vectorizer.pkl")
+    if os.path.exists(vectorizer_path):
+        with open(vectorizer_path, 'rb') as f:
+            TfidfEmbeddingModel(pickle.load(f), index.d).save(doc_dir)
+
+    metadata_path = os.path.join(doc_dir, "metadata.json")
+    with open(metadata_path, 'r') as f:
+        metadata = json.load(f)
+    metadata.update(index_type=index_type_of(index), format=STORE_FORMAT)
+    with open(metadata_path + ".tmp", 'w') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(metadata_path + ".tmp", metadata_path)
+
+    for name in LEGACY_FILES:
+        if os.path.exists(os.path.join(doc_dir, name)):
+            os.remove(os.path.join(doc_dir, name))
+
+
+def migrate_store(store_dir: str, workers: int = 4) -> List[str]:
+    """Migrate every document in a vector store that still uses pickles; returns the IDs converted"""
+    if not os.path.isdir(store_dir):
+        return []
+    pending = [
+        name for name in sorted(os.listdir(store_dir))
+        if not name.startswith(".") and needs_migration(os.path.join(store_dir, name))
+    ]
+
+    def migrate(name: str) -> bool:
+        try:
+            migrate_document(os.path.join(store_dir, name))
+            return True
+        except Exception as e:
+            # Left as is; the startup scan quarantines documents that could not be converted
+            print(f"Could not migrate document {name}: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [name for name, migrated in zip(pending, pool.map(migrate, pending)) if migrated]
+
+
+def main():
+    from config import config
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--store-dir", default=config.VECTOR_STORE_DIR)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    migrated = migrate_store(args.store_dir, args.workers)
+    print(f"Migrated {len(migrated)} document(s) in {args.store_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Literal
 from datetime import datetime
 
 class DocumentUploadResponse(BaseModel):
@@ -8,6 +8,45 @@ class DocumentUploadResponse(BaseModel):
     upload_time: str
     chunk_count: int
     message: str
+    duplicate_of: Optional[str] = None  # Document with identical content whose processed index was reused
+    reused_chunks: int = 0  # Chunks not embedded again
+    bytes_saved: int = 0  # Upload and index bytes not stored again
+    seconds_saved: float = 0.0  # Estimated processing time avoided
+    page_count: int = 0  # PDF pages extracted
+    skipped_pages: List[int] = []  # Unreadable PDF pages (1-based) left out under the "skip" page error policy
+    slowest_page_seconds: float = 0.0  # Longest extraction time of a single PDF page
+
+class IngestionJobResponse(BaseModel):
+    job_id: str
+    status: str
+    stage: str
+    progress: float
+    document_id: str
+    filename: str
+    created_at: float
+    updated_at: float
+    error: Optional[str] = None
+    result: Optional[DocumentUploadResponse] = None
+
+class BulkFileResult(BaseModel):
+    filename: str  # Uploaded filename, or "archive/entry" for a file read from an archive
+    status: Literal["completed", "failed", "skipped"]
+    document_id: Optional[str] = None
+    chunk_count: int = 0
+    file_size: int = 0
+    duplicate_of: Optional[str] = None
+    processing_time: float = 0.0
+    error: Optional[str] = None  # Why the file failed or was skipped; the rest of the batch still runs
+
+class BulkIngestResponse(BaseModel):
+    results: List[BulkFileResult]
+    completed: int
+    failed: int
+    skipped: int
+    total_bytes: int  # Bytes of the documents completed
+    processing_time: float
+    documents_per_second: float
+    mb_per_second: float
 
 class DocumentInfo(BaseModel):
     id: str
@@ -16,14 +55,49 @@ class DocumentInfo(BaseModel):
     chunk_count: int
     file_size: int
 
+RetrievalMode = Literal["dense", "sparse", "hybrid"]
+
 class QueryRequest(BaseModel):
     document_id: str
     question: str
+    nprobe: Optional[int] = None  # IVF lists to scan for this query
+    ef_search: Optional[int] = None  # HNSW search depth for this query
+    retrieval_mode: Optional[RetrievalMode] = None  # Overrides config.RETRIEVAL_MODE
+
+class CorpusQueryRequest(BaseModel):
+    question: str
+    document_ids: Optional[List[str]] = None  # Restrict the search to these documents
+    top_k: Optional[int] = Field(None, ge=1)
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+
+class BatchSearchRequest(BaseModel):
+    document_id: str
+    questions: List[str]
+    top_k: Optional[int] = Field(None, ge=1)
+    min_score: Optional[float] = None  # Minimum cosine similarity for returned chunks (dense only)
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    retrieval_mode: Optional[RetrievalMode] = None
+
+class BatchQueryItem(BaseModel):
+    document_id: str
+    question: str
+
+class BatchQueryRequest(BaseModel):
+    queries: List[BatchQueryItem]
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    retrieval_mode: Optional[RetrievalMode] = None
 
 class SourceReference(BaseModel):
     chunk_text: str
-    relevance_score: float
+    relevance_score: float  # Cosine similarity, BM25 score, or fused RRF score in hybrid mode
     chunk_index: int
+    dense_score: Optional[float] = None  # Cosine similarity from the vector ranker, if it found the chunk
+    sparse_score: Optional[float] = None  # BM25 score from the lexical ranker, if it found the chunk
+    document_id: Optional[str] = None
+    document_name: Optional[str] = None
 
 class QueryResponse(BaseModel):
     question: str
@@ -32,6 +106,44 @@ class QueryResponse(BaseModel):
     document_name: str
     sources: List[SourceReference]
     processing_time: float
+    cached: bool = False  # Answer served from the answer cache
+    context_tokens: int = 0  # Estimated prompt tokens of retrieved context
+    context_tokens_saved: int = 0  # Removed by merging overlapping chunks and the token budget
+
+class CorpusQueryResponse(BaseModel):
+    question: str
+    answer: str
+    sources: List[SourceReference]
+    processing_time: float
+    context_tokens: int = 0
+    context_tokens_saved: int = 0
+
+class SearchResult(BaseModel):
+    question: str
+    sources: List[SourceReference]
+
+class BatchSearchResponse(BaseModel):
+    document_id: str
+    results: List[SearchResult]
+    processing_time: float
+
+class BatchQueryResult(BaseModel):
+    question: str
+    document_id: str
+    document_name: Optional[str] = None
+    answer: Optional[str] = None
+    sources: List[SourceReference] = []
+    error: Optional[str] = None  # Set when this question failed; the rest of the batch still runs
+    retrieval_time: float  # Shared by every question on the same document
+    generation_time: float
+    processing_time: float
+    cached: bool = False
+    context_tokens: int = 0
+    context_tokens_saved: int = 0
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryResult]
+    processing_time: float
 
 class ErrorResponse(BaseModel):
     error: str
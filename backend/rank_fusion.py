@@ -0,0 +1,27 @@
+from typing import Dict, List, Tuple
+
+# Damping constant from the original RRF paper; keeps one ranker's top hit from dominating
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[Tuple[str, float, int]]], top_k: int = 3,
+                           k: int = RRF_K) -> Tuple[List[Tuple[str, float, int]], List[Dict[str, float]]]:
+    """Fuse several rankings of the same document's chunks by summing 1 / (k + rank).
+
+    rankings maps a ranker name ("dense", "sparse") to its (chunk_text, score, chunk_index)
+    results, best first. Rank fusion ignores the rankers' incomparable score scales.
+    Returns the fused top_k as (chunk_text, rrf_score, chunk_index) tuples, plus each fused
+    chunk's original score from every ranker that returned it.
+    """
+    fused: Dict[int, float] = {}
+    texts: Dict[int, str] = {}
+    ranker_scores: Dict[int, Dict[str, float]] = {}
+    for name, results in rankings.items():
+        for rank, (chunk_text, score, idx) in enumerate(results, 1):
+            fused[idx] = fused.get(idx, 0.0) + 1.0 / (k + rank)
+            texts[idx] = chunk_text
+            ranker_scores.setdefault(idx, {})[name] = score
+
+    # Ties (equal summed ranks) go to the lower chunk index, so results are deterministic
+    best = sorted(fused, key=lambda idx: (-fused[idx], idx))[:top_k]
+    return [(texts[idx], fused[idx], idx) for idx in best], [ranker_scores[idx] for idx in best]
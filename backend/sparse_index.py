@@ -0,0 +1,106 @@
+import json
+import os
+import sys
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+from typing import List, Sequence, Tuple
+
+MATRIX_FILE = "bm25.npz"
+VOCABULARY_FILE = "bm25_vocabulary.json"
+
+
+def _vectorizer(vocabulary=None) -> CountVectorizer:
+    # Same tokenization as the TF-IDF models, but with no cap on the vocabulary
+    return CountVectorizer(vocabulary=vocabulary, dtype=np.float32)
+
+
+class SparseIndex:
+    """BM25 over a document's chunks, scored with sparse matrix products and never densified.
+
+    postings is an inverted index: a term x chunk CSR matrix whose row for each term holds the
+    full BM25 weight of that term in every chunk containing it. A query's term counts times
+    postings reads only the rows of the query's terms. On disk it is a compressed scipy .npz
+    plus the vocabulary as a JSON list of terms in row order.
+    """
+
+    def __init__(self, postings: sp.csr_matrix, terms: List[str], k1: float = 1.2, b: float = 0.75):
+        self.postings = postings
+        self.terms = terms
+        self.k1 = k1
+        self.b = b
+        self._query_vectorizer = _vectorizer({term: i for i, term in enumerate(terms)})
+
+    @classmethod
+    def build(cls, chunks: Sequence[str], k1: float = 1.2, b: float = 0.75) -> "SparseIndex":
+        """Count terms per chunk and fold BM25 term saturation, length normalization and IDF into weights"""
+        vectorizer = _vectorizer()
+        try:
+            counts = vectorizer.fit_transform(chunks).tocsr()
+            terms = vectorizer.get_feature_names_out().tolist()
+        except ValueError:
+            # No chunk has a single indexable term
+            return cls(sp.csr_matrix((0, len(chunks)), dtype=np.float32), [], k1, b)
+
+        n_chunks = counts.shape[0]
+        lengths = np.asarray(counts.sum(axis=1)).ravel()
+        avg_length = lengths.mean() or 1.0
+        document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log1p((n_chunks - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+
+        rows = np.repeat(np.arange(n_chunks), np.diff(counts.indptr))
+        tf = counts.data
+        norm = k1 * (1 - b + b * lengths[rows] / avg_length)
+        counts.data = (tf * (k1 + 1) / (tf + norm) * idf[counts.indices]).astype(np.float32)
+        return cls(counts.T.tocsr(), terms, k1, b)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate in-memory size of the matrix and vocabulary"""
+        matrix = self.postings.data.nbytes + self.postings.indices.nbytes + self.postings.indptr.nbytes
+        # Each vocabulary entry holds a key string, an int and a dict slot
+        return matrix + sum(sys.getsizeof(term) + 64 for term in self.terms)
+
+    def search(self, queries: List[str], top_k: int = 3) -> List[List[Tuple[int, float]]]:
+        """Score every chunk for every query in one sparse product.
+
+        Returns one (chunk_index, bm25_score) list per query, best first. Chunks sharing no
+        term with the query are left out.
+        """
+        n_chunks = self.postings.shape[1]
+        if not self.terms or n_chunks == 0:
+            return [[] for _ in queries]
+
+        query_counts = self._query_vectorizer.transform(queries)
+        scores = (query_counts @ self.postings).toarray()
+
+        k = min(top_k, n_chunks)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top, top_scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+        return [
+            [(idx, score) for idx, score in zip(row_indices[row_scores > 0].tolist(), row_scores[row_scores > 0].tolist())]
+            for row_indices, row_scores in zip(top, top_scores)
+        ]
+
+    def save(self, directory: str):
+        sp.save_npz(os.path.join(directory, MATRIX_FILE), self.postings)
+        with open(os.path.join(directory, VOCABULARY_FILE), 'w') as f:
+            json.dump({"layout": "postings", "k1": self.k1, "b": self.b, "terms": self.terms}, f)
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, MATRIX_FILE)) and \
+            os.path.exists(os.path.join(directory, VOCABULARY_FILE))
+
+    @classmethod
+    def load(cls, directory: str) -> "SparseIndex":
+        postings = sp.load_npz(os.path.join(directory, MATRIX_FILE)).tocsr()
+        with open(os.path.join(directory, VOCABULARY_FILE), 'r') as f:
+            state = json.load(f)
+        if state.get("layout") != "postings":
+            # The first format stored the chunk x term matrix
+            postings = postings.T.tocsr()
+        return cls(postings, state["terms"], state["k1"], state["b"])
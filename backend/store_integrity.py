@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+from typing import Optional
+
+MANIFEST_FILE = "manifest.json"
+_BLOCK_SIZE = 1024 * 1024
+
+
+def fsync_dir(directory: str):
+    """Persist a directory's entries, so renames and new files inside it survive a crash"""
+    if os.name == "nt":
+        # Windows cannot open directories; NTFS journals metadata on its own
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _hash_file(path: str, sync: bool = False) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_BLOCK_SIZE), b""):
+            digest.update(block)
+        if sync:
+            os.fsync(f.fileno())
+    return digest.hexdigest()
+
+
+def seal_directory(directory: str, format_version: int):
+    """Fsync every file in a directory and record their sizes and SHA-256 checksums in a manifest.
+
+    The manifest is written last, so its presence means everything it lists reached disk.
+    Sealing again after adding files replaces the manifest atomically.
+    """
+    files = {}
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name != MANIFEST_FILE and os.path.isfile(path):
+            files[name] = {"size": os.path.getsize(path), "sha256": _hash_file(path, sync=True)}
+
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    with open(manifest_path + ".tmp", 'w') as f:
+        json.dump({"format": format_version, "files": files}, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(manifest_path + ".tmp", manifest_path)
+    fsync_dir(directory)
+
+
+def has_manifest(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, MANIFEST_FILE))
+
+
+def verify_directory(directory: str, format_version: int) -> Optional[str]:
+    """Check a sealed directory against its manifest; returns why it is invalid, or None"""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        return f"unreadable manifest: {e}"
+
+    if manifest.get("format") != format_version:
+        return f"unsupported format {manifest.get('format')}, expected {format_version}"
+    for name, expected in manifest.get("files", {}).items():
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            return f"missing {name}"
+        if os.path.getsize(path) != expected["size"]:
+            return f"{name} is {os.path.getsize(path)} bytes, expected {expected['size']}"
+        if _hash_file(path) != expected["sha256"]:
+            return f"checksum mismatch in {name}"
+    return None
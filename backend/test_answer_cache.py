@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache, context_hash, normalize_question
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_normalized_question_variants_share_an_entry():
+    assert normalize_question("  What IS  this?? ") == normalize_question("what is this") == "what is this"
+    cache = AnswerCache()
+    cache.put("doc", "What is this?", "ctx", "answer", 2.0)
+    assert cache.get("doc", "what   is THIS", "ctx") == "answer"
+    assert cache.stats()["seconds_saved"] == 2.0
+
+
+def test_key_includes_document_and_context():
+    cache = AnswerCache()
+    cache.put("doc", "q", context_hash([1, 2], "prompt"), "answer", 1.0)
+    assert cache.get("doc", "q", context_hash([1, 2], "prompt")) == "answer"
+    assert cache.get("doc", "q", context_hash([2, 1], "prompt")) is None
+    assert cache.get("doc", "q", context_hash([1, 2], "other prompt")) is None
+    assert cache.get("other", "q", context_hash([1, 2], "prompt")) is None
+    assert cache.stats()["misses"] == 3
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2)
+    cache.put("doc", "a", "ctx", "A", 0.0)
+    cache.put("doc", "b", "ctx", "B", 0.0)
+    cache.get("doc", "a", "ctx")
+    cache.put("doc", "c", "ctx", "C", 0.0)
+    assert cache.get("doc", "b", "ctx") is None
+    assert cache.get("doc", "a", "ctx") == "A"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache = AnswerCache(ttl_seconds=10)
+    cache.put("doc", "q", "ctx", "answer", 0.0)
+    now[0] += 9
+    assert cache.get("doc", "q", "ctx") == "answer"
+    now[0] += 2
+    assert cache.get("doc", "q", "ctx") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_near_duplicate_questions_hit_above_the_threshold():
+    cache = AnswerCache(similarity_threshold=0.95)
+    cache.put("doc", "how big is it", "ctx", "answer", 1.0, unit(1, 0.1))
+    assert cache.get("doc", "what size is it", "ctx", unit(1, 0.15)) == "answer"
+    assert cache.get("doc", "who wrote it", "ctx", unit(0.2, 1)) is None
+    assert cache.get("doc", "what size is it", "other ctx", unit(1, 0.15)) is None
+    assert cache.stats()["near_duplicate_hits"] == 1
+
+
+def test_near_duplicates_are_off_without_a_threshold():
+    cache = AnswerCache()
+    cache.put("doc", "how big is it", "ctx", "answer", 1.0, unit(1, 0))
+    assert cache.get("doc", "what size is it", "ctx", unit(1, 0)) is None
+
+
+def test_invalidate_document():
+    cache = AnswerCache()
+    cache.put("doc", "a", "ctx", "A", 0.0)
+    cache.put("doc", "b", "ctx", "B", 0.0)
+    cache.put("other", "a", "ctx", "A", 0.0)
+    assert cache.invalidate_document("doc") == 2
+    assert cache.get("doc", "a", "ctx") is None
+    assert cache.get("other", "a", "ctx") == "A"
+    assert cache.stats()["hit_rate"] == pytest.approx(0.5)
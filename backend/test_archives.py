@@ -0,0 +1,87 @@
+import hashlib
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from archives import archive_suffix, read_archive
+
+ALLOWED = {".txt", ".pdf"}
+
+
+def make_zip(path, entries):
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+
+
+def make_tar(path, entries):
+    with tarfile.open(path, "w:gz") as archive:
+        for name, data in entries:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+def read(path, suffix, directory, max_file_size=1000, max_entries=10):
+    count = iter(range(1000))
+    return list(read_archive(
+        str(path), suffix, lambda name: os.path.join(directory, f"{next(count)}{os.path.splitext(name)[1]}"),
+        ALLOWED, max_file_size, max_entries, chunk_size=64
+    ))
+
+
+@pytest.mark.parametrize("filename, suffix", [
+    ("a.zip", ".zip"), ("A.TAR.GZ", ".tar.gz"), ("b.tgz", ".tgz"), ("c.tar", ".tar"), ("d.txt", None), ("zip", None),
+])
+def test_archive_suffix(filename, suffix):
+    assert archive_suffix(filename) == suffix
+
+
+@pytest.mark.parametrize("make, suffix", [(make_zip, ".zip"), (make_tar, ".tar.gz")])
+def test_entries_are_copied_with_hashes(tmp_path, make, suffix):
+    data = b"hello archive " * 20
+    make(tmp_path / f"in{suffix}", [("docs/a.txt", data), ("docs/b.pdf", b"%PDF-1.4")])
+    out = tmp_path / "out"
+    out.mkdir()
+    first, second = read(tmp_path / f"in{suffix}", suffix, out)
+    assert (first.name, first.size, first.sha256) == ("docs/a.txt", len(data), hashlib.sha256(data).hexdigest())
+    assert open(first.path, "rb").read() == data
+    assert second.name == "docs/b.pdf" and second.error is None
+
+
+def test_unsupported_and_excess_entries_are_skipped(tmp_path):
+    make_zip(tmp_path / "in.zip", [("notes.md", b"x"), ("dir/", b"")] + [(f"{i}.txt", b"x") for i in range(4)])
+    entries = read(tmp_path / "in.zip", ".zip", tmp_path, max_entries=3)
+    assert [(e.name, e.skipped) for e in entries] == [
+        ("notes.md", True), ("0.txt", False), ("1.txt", False), ("2.txt", False), ("3.txt", True),
+    ]
+    assert "not supported" in entries[0].error and "more than 3" in entries[-1].error
+
+
+def test_oversized_entry_fails_on_bytes_read(tmp_path):
+    # Highly compressible, so the archive itself stays small
+    make_zip(tmp_path / "in.zip", [("big.txt", b"a" * 5000), ("ok.txt", b"fine")])
+    out = tmp_path / "out"
+    out.mkdir()
+    big, ok = read(tmp_path / "in.zip", ".zip", out, max_file_size=1000)
+    assert big.path is None and not big.skipped and "exceeds" in big.error
+    assert ok.error is None
+    assert os.listdir(out) == [os.path.basename(ok.path)]
+
+
+def test_entry_names_are_never_used_as_paths(tmp_path):
+    make_tar(tmp_path / "in.tar.gz", [("../../escape.txt", b"x"), ("/etc/passwd.txt", b"y")])
+    out = tmp_path / "out"
+    out.mkdir()
+    entries = read(tmp_path / "in.tar.gz", ".tar.gz", out)
+    assert all(os.path.dirname(e.path) == str(out) for e in entries)
+    assert not (tmp_path.parent / "escape.txt").exists()
+
+
+def test_corrupt_archive_raises(tmp_path):
+    (tmp_path / "bad.zip").write_bytes(b"not a zip")
+    with pytest.raises(zipfile.BadZipFile):
+        read(tmp_path / "bad.zip", ".zip", tmp_path)
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from catalog import DocumentCatalog, decode_cursor, encode_cursor
+
+
+def record(n: int, filename: str = None) -> dict:
+    # Alternate the two stored timestamp formats
+    upload_time = datetime(2024, 1, 1) + timedelta(hours=n)
+    text = upload_time.isoformat() if n % 2 else upload_time.strftime("%Y-%m-%d %H:%M:%S")
+    return {"id": f"doc-{n:03d}", "filename": filename or f"file{n}.txt", "upload_time": text}
+
+
+@pytest.fixture
+def catalog():
+    catalog = DocumentCatalog()
+    catalog.load(record(n) for n in range(25))
+    return catalog
+
+
+def ids(documents):
+    return [document["id"] for document in documents]
+
+
+def test_pages_walk_every_document_newest_first(catalog):
+    seen, cursor = [], None
+    while True:
+        documents, cursor = catalog.page(limit=10, cursor=cursor)
+        seen += ids(documents)
+        if cursor is None:
+            break
+    assert seen == [f"doc-{n:03d}" for n in range(24, -1, -1)]
+
+
+def test_last_full_page_has_no_cursor(catalog):
+    documents, cursor = catalog.page(limit=25)
+    assert len(documents) == 25 and cursor is None
+
+
+def test_cursor_is_stable_across_inserts_and_deletes(catalog):
+    first, cursor = catalog.page(limit=5)
+    catalog.add(record(100))
+    catalog.remove("doc-019")
+    second, _ = catalog.page(limit=3, cursor=cursor)
+    assert ids(first) == ["doc-024", "doc-023", "doc-022", "doc-021", "doc-020"]
+    assert ids(second) == ["doc-018", "doc-017", "doc-016"]
+
+
+def test_filters(catalog):
+    catalog.add(record(30, "Report-Q1.pdf"))
+    catalog.add(record(31, "report-q2.pdf"))
+    documents, _ = catalog.page(filename_prefix="REPORT")
+    assert ids(documents) == ["doc-031", "doc-030"]
+
+    documents, _ = catalog.page(uploaded_after=datetime(2024, 1, 1, 3), uploaded_before=datetime(2024, 1, 1, 5))
+    assert ids(documents) == ["doc-005", "doc-004", "doc-003"]
+
+    aware = datetime(2024, 1, 1, 7, tzinfo=timezone(timedelta(hours=2)))
+    documents, _ = catalog.page(uploaded_before=aware)
+    assert ids(documents)[0] == "doc-005"
+
+
+def test_add_replaces_existing_record(catalog):
+    catalog.add(dict(record(3), filename="renamed.txt", upload_time="2025-01-01T00:00:00"))
+    assert len(catalog) == 25
+    documents, _ = catalog.page(limit=1)
+    assert documents[0]["filename"] == "renamed.txt"
+
+
+def test_cursor_encoding():
+    key = ("2024-01-01T00:00:00", "doc-1")
+    assert decode_cursor(encode_cursor(key)) == key
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
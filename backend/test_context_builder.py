@@ -0,0 +1,49 @@
+from context_builder import Passage, estimate_tokens, merge_adjacent, pack_context
+
+
+def words(start: int, end: int) -> str:
+    return " ".join(f"w{i}" for i in range(start, end))
+
+
+def test_estimate_tokens_rounds_up():
+    assert [estimate_tokens(text) for text in ("", "a", "abcd", "abcde")] == [0, 1, 1, 2]
+
+
+def test_adjacent_chunks_merge_without_their_overlap():
+    # Chunk 4 repeats the last three words of chunk 3, as the chunker's overlap does
+    results = [(words(0, 10), 0.5, 3), (words(7, 17), 0.9, 4), (words(50, 55), 0.7, 9)]
+    merged, separate = merge_adjacent(results)
+    assert merged == Passage(words(0, 17), 0.9, (3, 4))
+    assert separate == Passage(words(50, 55), 0.7, (9,))
+    assert (merged.label, separate.label) == ("Chunks 4-5", "Chunk 10")
+
+
+def test_chunks_only_merge_within_a_group():
+    results = [("a b", 0.9, 1), ("c d", 0.8, 2), ("e f", 0.7, 2)]
+    passages = merge_adjacent(results, groups=["doc1", "doc2", "doc1"])
+    assert [(p.group, p.chunk_indices) for p in passages] == [("doc1", (1, 2)), ("doc2", (2,))]
+
+
+def test_packing_follows_relevance_within_the_budget():
+    big, small = "x" * 400, "y" * 40
+    results = [(big, 0.9, 0), (small, 0.5, 5), ("z" * 400, 0.4, 9)]
+    packed = pack_context(results, token_budget=120)
+    # The second large passage no longer fits, but the smaller, less relevant one does
+    assert [p.chunk_indices for p in packed.passages] == [(0,), (5,)]
+    assert packed.tokens == 110
+    assert packed.tokens_saved == 100
+
+
+def test_most_relevant_passage_is_truncated_at_a_word_boundary():
+    text = " ".join(["word"] * 100)
+    packed = pack_context([(text, 1.0, 0)], token_budget=10)
+    [passage] = packed.passages
+    assert passage.text == " ".join(["word"] * 8)
+    assert packed.tokens <= 10
+
+
+def test_no_budget_keeps_everything():
+    results = [(words(0, 5), 0.3, 0), (words(20, 25), 0.6, 4)]
+    packed = pack_context(results)
+    assert [p.chunk_indices for p in packed.passages] == [(4,), (0,)]
+    assert packed.tokens_saved == 0
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import os
+
+from history_writer import HistoryWriter
+
+
+class Database:
+    def __init__(self):
+        self.rows = []
+        self.down = False
+
+    def write_batch(self, rows):
+        if self.down:
+            raise RuntimeError("database unavailable")
+        self.rows.extend(rows)
+
+
+def writer(tmp_path, database, **kwargs) -> HistoryWriter:
+    kwargs.setdefault("flush_interval", 60)
+    return HistoryWriter(database.write_batch, spill_path=str(tmp_path / "spill.jsonl"), **kwargs)
+
+
+def questions(rows):
+    return [row["question"] for row in rows]
+
+
+def test_rows_are_written_in_batches(tmp_path):
+    database = Database()
+    history = writer(tmp_path, database, batch_size=2)
+
+    async def run():
+        for i in range(5):
+            history.submit("doc", f"q{i}", "a")
+        assert questions(history.pending("doc")) == ["q4", "q3", "q2", "q1", "q0"]
+        await history.flush()
+
+    asyncio.run(run())
+    assert questions(database.rows) == [f"q{i}" for i in range(5)]
+    assert history.stats()["batches"] == 3
+
+
+def test_overflow_is_spilled_by_the_flush_task_and_replayed_in_order(tmp_path):
+    database = Database()
+    database.down = True
+    history = writer(tmp_path, database, batch_size=2, max_pending=3)
+
+    async def run():
+        for i in range(10):
+            history.submit("doc", f"q{i}", "a")
+        # submit() never touches the file
+        assert not os.path.exists(history.spill_path)
+        assert not await history.flush()
+        assert history.stats()["spilled"] == 7
+        database.down = False
+        while history._pending or history._has_spill():
+            await history.flush()
+            # Replay never fills the buffer past max_pending
+            assert len(history._pending) <= 3
+
+    asyncio.run(run())
+    assert questions(database.rows) == [f"q{i}" for i in range(10)]
+    assert not history._has_spill()
+
+
+def test_unreadable_spill_lines_are_skipped(tmp_path):
+    database = Database()
+    row = {"document_id": "doc", "question": "kept", "answer": "a", "query_time": "2024-01-01T00:00:00"}
+    with open(tmp_path / "spill.jsonl", "w") as f:
+        f.write(json.dumps(row) + "\n" + '{"document_id": "doc", "quest')
+    history = writer(tmp_path, database, max_pending=3)
+
+    async def run():
+        # A row spilled after the crash must not be glued onto the truncated line
+        history.submit("doc", "q0", "a")
+        history._overflow.append(dict(row, question="late"))
+        await history.stop()
+
+    asyncio.run(run())
+    assert questions(database.rows) == ["q0", "kept", "late"]
+    assert history.stats()["corrupt"] == 1
+
+
+def test_flush_task_survives_errors(tmp_path):
+    database = Database()
+    history = writer(tmp_path, database, batch_size=1, flush_interval=0.01)
+    (tmp_path / "spill.jsonl").write_text("")
+    calls = []
+
+    def broken_take_spill(limit):
+        calls.append(limit)
+        raise OSError("disk error")
+
+    history._take_spill = broken_take_spill
+
+    async def run():
+        await history.start()
+        await asyncio.sleep(0.05)
+        assert calls and not history._task.done()
+        os.remove(history.spill_path)
+        history.submit("doc", "after", "a")
+        await asyncio.sleep(0.05)
+        await history.stop()
+
+    asyncio.run(run())
+    assert questions(database.rows) == ["after"]
@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+
+from llm_client import LLMClient, LLMError, LLMProvider, LLMRetryableError
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+class ScriptedProvider(LLMProvider):
+    """Answers each call from a script of results; exceptions in the script are raised"""
+
+    def __init__(self, script, delay: float = 0.0):
+        self.script = list(script)
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def _next(self):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            result = self.script.pop(0) if len(self.script) > 1 else self.script[0]
+        finally:
+            self.active -= 1
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def complete(self, messages, model, temperature, max_tokens):
+        return await self._next()
+
+    async def stream(self, messages, model, temperature, max_tokens):
+        result = await self._next()
+        for token in result.split():
+            if token == "<drop>":
+                raise LLMRetryableError("connection dropped")
+            yield token
+
+
+def client(provider, **kwargs) -> LLMClient:
+    kwargs.setdefault("backoff_base", 0.001)
+    return LLMClient(provider, **kwargs)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_provider_interface_is_abstract():
+    with pytest.raises(TypeError):
+        LLMProvider()
+
+
+def test_retryable_errors_are_retried():
+    provider = ScriptedProvider([LLMRetryableError("429"), LLMRetryableError("503"), "answer"])
+    llm = client(provider)
+    assert run(llm.complete(MESSAGES, "model")) == "answer"
+    assert provider.calls == 3
+    assert llm.stats()["retries"] == 2
+
+
+def test_retries_give_up_after_max_retries():
+    provider = ScriptedProvider([LLMRetryableError("429")])
+    llm = client(provider, max_retries=2)
+    with pytest.raises(LLMRetryableError):
+        run(llm.complete(MESSAGES, "model"))
+    assert provider.calls == 3
+    assert llm.stats()["failures"] == 1
+
+
+def test_other_errors_are_not_retried():
+    provider = ScriptedProvider([LLMError("bad request"), "answer"])
+    llm = client(provider)
+    with pytest.raises(LLMError):
+        run(llm.complete(MESSAGES, "model"))
+    assert provider.calls == 1
+
+
+def test_retry_after_longer_than_the_deadline_fails_fast():
+    provider = ScriptedProvider([LLMRetryableError("429", retry_after=60), "answer"])
+    with pytest.raises(LLMRetryableError):
+        run(client(provider).complete(MESSAGES, "model", timeout=1.0))
+    assert provider.calls == 1
+
+
+def test_deadline_covers_the_whole_call():
+    llm = client(ScriptedProvider(["answer"], delay=1.0))
+    with pytest.raises(LLMError, match="timed out"):
+        run(llm.complete(MESSAGES, "model", timeout=0.05))
+    assert llm.stats()["timeouts"] == 1
+
+
+def test_identical_requests_in_flight_are_coalesced():
+    provider = ScriptedProvider(["answer"], delay=0.05)
+    llm = client(provider)
+
+    async def ask():
+        return await asyncio.gather(
+            *(llm.complete(MESSAGES, "model") for _ in range(5)),
+            llm.complete(MESSAGES, "model", temperature=0.9),
+        )
+
+    assert run(ask()) == ["answer"] * 6
+    assert provider.calls == 2
+    assert llm.stats()["coalesced"] == 4
+    assert llm.stats()["in_flight"] == 0
+
+
+def test_concurrency_is_limited():
+    provider = ScriptedProvider(["answer"], delay=0.02)
+    llm = client(provider, concurrency=2)
+
+    async def ask():
+        return await asyncio.gather(*(llm.complete([{"role": "user", "content": str(i)}], "model") for i in range(6)))
+
+    run(ask())
+    assert provider.calls == 6
+    assert provider.max_active == 2
+
+
+def collect(stream):
+    async def tokens():
+        return [token async for token in stream]
+    return run(tokens())
+
+
+def test_stream_retries_before_the_first_token():
+    provider = ScriptedProvider([LLMRetryableError("503"), "streamed answer"])
+    llm = client(provider)
+    assert collect(llm.stream(MESSAGES, "model")) == ["streamed", "answer"]
+    assert llm.stats()["retries"] == 1
+
+
+def test_stream_failure_after_the_first_token_is_raised():
+    provider = ScriptedProvider(["partial <drop> rest", "never used"])
+    llm = client(provider)
+    with pytest.raises(LLMRetryableError):
+        collect(llm.stream(MESSAGES, "model"))
+    assert provider.calls == 1
+    assert llm.stats()["failures"] == 1
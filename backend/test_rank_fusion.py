@@ -0,0 +1,34 @@
+import pytest
+
+from rank_fusion import RRF_K, reciprocal_rank_fusion
+
+DENSE = [("c2", 0.91, 2), ("c0", 0.80, 0), ("c5", 0.42, 5)]
+SPARSE = [("c0", 7.5, 0), ("c7", 3.1, 7), ("c2", 1.2, 2)]
+
+
+def test_scores_sum_reciprocal_ranks():
+    results, _ = reciprocal_rank_fusion({"dense": DENSE, "sparse": SPARSE}, top_k=10)
+    scores = {idx: score for _, score, idx in results}
+    assert scores[0] == pytest.approx(1 / (RRF_K + 2) + 1 / (RRF_K + 1))
+    assert scores[2] == pytest.approx(1 / (RRF_K + 1) + 1 / (RRF_K + 3))
+    assert scores[7] == pytest.approx(1 / (RRF_K + 2))
+    assert scores[5] == pytest.approx(1 / (RRF_K + 3))
+
+
+def test_chunks_found_by_both_rankers_come_first():
+    results, ranker_scores = reciprocal_rank_fusion({"dense": DENSE, "sparse": SPARSE}, top_k=3)
+    assert [idx for _, _, idx in results] == [0, 2, 7]
+    assert [text for text, _, _ in results] == ["c0", "c2", "c7"]
+    assert ranker_scores == [{"dense": 0.80, "sparse": 7.5}, {"dense": 0.91, "sparse": 1.2}, {"sparse": 3.1}]
+
+
+def test_ties_go_to_the_lower_chunk_index():
+    results, _ = reciprocal_rank_fusion({"dense": [("b", 1.0, 9)], "sparse": [("a", 1.0, 4)]})
+    assert [idx for _, _, idx in results] == [4, 9]
+
+
+def test_single_ranker_and_empty_rankings():
+    results, ranker_scores = reciprocal_rank_fusion({"dense": DENSE, "sparse": []}, top_k=2)
+    assert [idx for _, _, idx in results] == [2, 0]
+    assert ranker_scores == [{"dense": 0.91}, {"dense": 0.80}]
+    assert reciprocal_rank_fusion({"dense": [], "sparse": []}) == ([], [])
@@ -0,0 +1,63 @@
+import math
+
+import pytest
+
+from sparse_index import SparseIndex, _vectorizer
+
+CHUNKS = [
+    "the quick brown fox jumps over the lazy dog",
+    "a fox is a small omnivorous mammal",
+    "dogs and cats are common household pets",
+    "the stock market fell sharply on tuesday",
+]
+
+
+def reference_bm25(chunks, query, k1=1.2, b=0.75):
+    """Textbook BM25 over the same tokens, one chunk at a time"""
+    analyzer = _vectorizer().build_analyzer()
+    tokens = [analyzer(chunk) for chunk in chunks]
+    avg_length = sum(map(len, tokens)) / len(tokens)
+    scores = []
+    for chunk_tokens in tokens:
+        score = 0.0
+        for term in set(analyzer(query)):
+            df = sum(term in t for t in tokens)
+            tf = chunk_tokens.count(term)
+            if not df or not tf:
+                continue
+            idf = math.log1p((len(tokens) - df + 0.5) / (df + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(chunk_tokens) / avg_length))
+        scores.append(score)
+    return scores
+
+
+@pytest.mark.parametrize("query", ["fox", "the lazy dog", "market fox pets", "household"])
+def test_scores_match_reference(query):
+    index = SparseIndex.build(CHUNKS)
+    expected = reference_bm25(CHUNKS, query)
+    [results] = index.search([query], top_k=len(CHUNKS))
+    assert {i: pytest.approx(expected[i], rel=1e-5) for i, _ in results} == dict(results)
+    assert {i for i, _ in results} == {i for i, score in enumerate(expected) if score > 0}
+
+
+def test_results_are_ranked_and_cut_to_top_k():
+    index = SparseIndex.build(CHUNKS)
+    [results] = index.search(["the fox dog"], top_k=2)
+    assert len(results) == 2
+    assert results[0][1] >= results[1][1]
+    assert results[0][0] == 0
+
+
+def test_unknown_terms_and_empty_chunks_return_nothing():
+    index = SparseIndex.build(CHUNKS)
+    assert index.search(["zebra", "fox"], top_k=3)[0] == []
+    assert SparseIndex.build(["", "!!"]).search(["fox"]) == [[]]
+
+
+def test_round_trip(tmp_path):
+    index = SparseIndex.build(CHUNKS, k1=1.5, b=0.5)
+    index.save(str(tmp_path))
+    assert SparseIndex.exists(str(tmp_path))
+    loaded = SparseIndex.load(str(tmp_path))
+    assert (loaded.k1, loaded.b) == (1.5, 0.5)
+    assert loaded.search(["lazy fox"]) == index.search(["lazy fox"])
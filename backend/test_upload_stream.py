@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+from starlette.requests import Request
+
+from upload_stream import UploadRejected, receive_files
+
+BOUNDARY = "test-boundary"
+
+
+def multipart(parts) -> bytes:
+    """Encode (field, filename, data) parts; filename None makes a plain form field"""
+    body = b""
+    for field, filename, data in parts:
+        disposition = f'form-data; name="{field}"' + (f'; filename="{filename}"' if filename is not None else "")
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def receive(body: bytes, directory, read_size: int = 7, content_length: int = None, **kwargs):
+    """Run receive_files over body delivered in read_size pieces"""
+    pieces = [body[i:i + read_size] for i in range(0, len(body), read_size)] or [b""]
+    messages = [{"type": "http.request", "body": piece, "more_body": i < len(pieces) - 1}
+                for i, piece in enumerate(pieces)]
+
+    async def receive_message():
+        return messages.pop(0)
+
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode()),
+               (b"content-length", str(content_length or len(body)).encode())]
+    request = Request({"type": "http", "method": "POST", "headers": headers}, receive_message)
+
+    def destination(filename):
+        if filename.endswith(".exe"):
+            raise UploadRejected(400, "File type .exe not supported")
+        return os.path.join(directory, f"{len(os.listdir(directory))}-{filename}")
+
+    return asyncio.run(receive_files(request, destination, chunk_size=16, **kwargs))
+
+
+def test_files_are_written_with_size_and_hash(tmp_path):
+    data = os.urandom(1000)
+    body = multipart([("note", None, b"ignored"), ("file", "a.txt", data)])
+    [upload] = receive(body, tmp_path, max_file_size=1000)
+    assert (upload.filename, upload.size, upload.sha256) == ("a.txt", 1000, hashlib.sha256(data).hexdigest())
+    with open(upload.path, "rb") as f:
+        assert f.read() == data
+
+
+def test_several_files_and_other_fields_are_skipped(tmp_path):
+    body = multipart([("files", "a.txt", b"first"), ("other", "b.txt", b"not mine"), ("files", "c.txt", b"third")])
+    uploads = receive(body, tmp_path, max_file_size=100, field_name="files", max_files=2)
+    assert [(u.filename, u.size) for u in uploads] == [("a.txt", 5), ("c.txt", 5)]
+    assert len(os.listdir(tmp_path)) == 2
+
+
+@pytest.mark.parametrize("parts, kwargs, detail", [
+    ([("file", "a.txt", b"x" * 101)], {"max_file_size": 100}, "File size exceeds"),
+    ([("files", "a.txt", b"x" * 60), ("files", "b.txt", b"x" * 60)],
+     {"max_file_size": 100, "field_name": "files", "max_files": 2, "max_total_size": 100}, "Upload exceeds"),
+    ([("files", "a.txt", b"1"), ("files", "b.txt", b"2")],
+     {"max_file_size": 100, "field_name": "files"}, "At most 1 file"),
+    ([("file", "a.txt", b"ok"), ("file", "b.exe", b"MZ")],
+     {"max_file_size": 100, "max_files": 2}, "not supported"),
+])
+def test_rejected_uploads_leave_no_files(tmp_path, parts, kwargs, detail):
+    with pytest.raises(UploadRejected) as error:
+        receive(multipart(parts), tmp_path, **kwargs)
+    assert error.value.status_code == 400 and detail in error.value.detail
+    assert os.listdir(tmp_path) == []
+
+
+def test_content_length_over_the_limit_is_refused_unread(tmp_path):
+    with pytest.raises(UploadRejected, match="Upload exceeds"):
+        receive(b"", tmp_path, content_length=10 * 1024 * 1024, max_file_size=100)
+
+
+def test_truncated_upload_is_removed(tmp_path):
+    body = multipart([("file", "a.txt", b"x" * 50)])
+    with pytest.raises(UploadRejected, match="ended before"):
+        receive(body[:-40], tmp_path, max_file_size=100)
+    assert os.listdir(tmp_path) == []
+
+
+def test_per_file_limits_can_skip_oversized_parts(tmp_path):
+    body = multipart([("files", "big.txt", b"x" * 200), ("files", "a.zip", b"z" * 200), ("files", "c.txt", b"ok")])
+    uploads = receive(
+        body, tmp_path, max_file_size=100, field_name="files", max_files=3, max_total_size=1000,
+        file_size_limit=lambda name: 500 if name.endswith(".zip") else 100, skip_oversized=True
+    )
+    big, archive, small = uploads
+    assert big.path is None and big.size == 200 and "exceeds" in big.error
+    assert archive.error is None and archive.size == 200
+    assert small.error is None and small.size == 2
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(u.path) for u in (archive, small))
+
+
+def test_non_multipart_request_is_rejected(tmp_path):
+    async def receive_message():
+        return {"type": "http.request", "body": b"{}", "more_body": False}
+
+    request = Request({"type": "http", "method": "POST", "headers": [(b"content-type", b"application/json")]},
+                      receive_message)
+    with pytest.raises(UploadRejected, match="multipart"):
+        asyncio.run(receive_files(request, lambda name: str(tmp_path / name), 100))
@@ -0,0 +1,172 @@
+import hashlib
+import os
+from typing import Callable, List, Optional
+
+import aiofiles
+from starlette.requests import Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:
+    # python-multipart releases before 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Multipart boundaries and part headers around each file
+PART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """An upload refused while it streams in; status_code and detail are meant for the response"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class StreamedFile:
+    """A file part written to disk, with its size and SHA-256 computed on the way.
+
+    A part skipped for its size has no path or hash, and says why in error.
+    """
+
+    __slots__ = ("filename", "path", "size", "sha256", "error")
+
+    def __init__(self, filename: str, path: Optional[str], size: int, sha256: Optional[str],
+                 error: Optional[str] = None):
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.error = error
+
+
+class _FilePart:
+    def __init__(self, filename: str, path: str, file, max_size: int):
+        self.filename = filename
+        self.path = path
+        self.file = file
+        self.max_size = max_size
+        self.error = None
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.buffer = bytearray()
+
+
+async def receive_files(request: Request, destination: Callable[[str], str], max_file_size: int,
+                        field_name: str = "file", max_files: int = 1, max_total_size: Optional[int] = None,
+                        file_size_limit: Optional[Callable[[str], int]] = None, skip_oversized: bool = False,
+                        chunk_size: int = 1024 * 1024) -> List[StreamedFile]:
+    """Stream the file parts of a multipart request straight to disk.
+
+    destination(filename) returns where a part is written, or raises UploadRejected to refuse
+    it before any of its data is read. Parts are written with async I/O in chunk_size blocks,
+    so memory per upload stays near chunk_size whatever the file size. A request whose
+    Content-Length already exceeds the limits is refused unread, and all parts together
+    growing past max_total_size abort the request at that point. A part growing past
+    max_file_size, or file_size_limit(filename) if given, aborts it too, unless
+    skip_oversized is set: then the part is deleted, the rest of its data is discarded and
+    it comes back with an error. Other form fields are read and ignored. On any error,
+    every file written so far is removed.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise UploadRejected(400, "Expected a multipart/form-data upload")
+
+    if max_total_size is None:
+        max_total_size = max_files * max_file_size
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and \
+            int(content_length) > max_total_size + max_files * PART_OVERHEAD_BYTES:
+        raise UploadRejected(400, f"Upload exceeds maximum allowed size of {max_total_size / (1024*1024)}MB")
+
+    # The parser's callbacks are synchronous, so they only record events; writes happen after each feed
+    events = []
+    header = {"field": b"", "value": b"", "headers": {}}
+
+    def on_header_field(data, start, end):
+        header["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header["value"] += data[start:end]
+
+    def on_header_end():
+        header["headers"][header["field"].lower()] = header["value"]
+        header["field"], header["value"] = b"", b""
+
+    def on_headers_finished():
+        events.append(("headers", header["headers"]))
+        header["headers"] = {}
+
+    parser = MultipartParser(options[b"boundary"], {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+        "on_part_end": lambda: events.append(("end", None)),
+    })
+
+    received: List[StreamedFile] = []
+    part: Optional[_FilePart] = None
+    total_size = 0
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for event, value in events:
+                if event == "headers":
+                    _, disposition = parse_options_header(value.get(b"content-disposition", b""))
+                    filename = disposition.get(b"filename")
+                    if filename is None or disposition.get(b"name", b"").decode() != field_name:
+                        continue
+                    if len(received) == max_files:
+                        raise UploadRejected(400, f"At most {max_files} file(s) can be uploaded at once")
+                    filename = filename.decode("utf-8", "replace")
+                    path = destination(filename)
+                    max_size = file_size_limit(filename) if file_size_limit else max_file_size
+                    part = _FilePart(filename, path, await aiofiles.open(path, "wb"), max_size)
+                elif part is None:
+                    continue
+                elif event == "data":
+                    part.size += len(value)
+                    total_size += len(value)
+                    if part.error is None and part.size > part.max_size:
+                        error = f"File size exceeds maximum allowed size of {part.max_size / (1024*1024)}MB"
+                        if not skip_oversized:
+                            raise UploadRejected(400, error)
+                        part.error = error
+                        part.buffer.clear()
+                        await part.file.close()
+                        os.remove(part.path)
+                    if total_size > max_total_size:
+                        raise UploadRejected(
+                            400, f"Upload exceeds maximum allowed size of {max_total_size / (1024*1024)}MB"
+                        )
+                    if part.error is not None:
+                        continue
+                    part.digest.update(value)
+                    part.buffer += value
+                    if len(part.buffer) >= chunk_size:
+                        await part.file.write(part.buffer)
+                        part.buffer.clear()
+                elif part.error is not None:
+                    received.append(StreamedFile(part.filename, None, part.size, None, part.error))
+                    part = None
+                else:
+                    await part.file.write(part.buffer)
+                    await part.file.close()
+                    received.append(StreamedFile(part.filename, part.path, part.size, part.digest.hexdigest()))
+                    part = None
+            events.clear()
+        parser.finalize()
+        if part is not None:
+            raise UploadRejected(400, "Upload ended before the file was complete")
+    except BaseException:
+        if part is not None:
+            await part.file.close()
+            received.append(part)
+        for upload in received:
+            if upload.path and os.path.exists(upload.path):
+                os.remove(upload.path)
+        raise
+    return received
@@ -1,149 +1,509 @@
 import os
 import faiss
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from typing import List, Tuple
-import pickle
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 import json
+import shutil
+import sys
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import LRUCache
+from chunk_store import OFFSETS_FILE, TEXT_FILE, MappedChunks, chunks_exist, write_chunks
+from embeddings import CachedEmbedder, Embedder, TfidfEmbeddingModel
+from index_factory import create_index, index_type_of, resolve_index_type, search_parameters
+from sparse_index import SparseIndex
+from store_integrity import MANIFEST_FILE, fsync_dir, has_manifest, seal_directory, verify_directory
+
+METRICS = {"cosine": faiss.METRIC_INNER_PRODUCT, "l2": faiss.METRIC_L2}
+# "dense" searches the FAISS index, "sparse" the BM25 index stored beside it
+RETRIEVAL_MODES = ("dense", "sparse")
+# Recorded in metadata.json for documents embedded with their own fitted TF-IDF model
+TFIDF_EMBEDDER = "tfidf"
+# Version 1 pickled the chunk list and vectorizer; version 2 memory-maps everything
+STORE_FORMAT = 2
+LEGACY_FILES = ("chunks.pkl", "vectorizer.pkl")
+# Files every complete document directory has, whatever its embedder
+REQUIRED_FILES = ("index.faiss", TEXT_FILE, OFFSETS_FILE, "metadata.json")
+
+# Saves are staged, and deletes moved aside, under dot-directories that document listings skip
+STAGING_PREFIX = ".staging-"
+TRASH_PREFIX = ".trash-"
+QUARANTINE_DIR = ".quarantine"
+
+# IVF inverted lists and flat codes have separate mmap flags, which cannot be combined.
+# Older FAISS builds lack the flat-codes flag and read flat indexes into memory instead.
+MMAP_IVF_FLAGS = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+MMAP_FLAT_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
+
+# A document's embedding model: its own TF-IDF fit, or the shared embedder
+EmbeddingModel = Union[TfidfEmbeddingModel, Embedder]
+
+def batched(items: Iterable, batch_size: int) -> Iterator[list]:
+    """Group an iterable into lists of at most batch_size items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_embeddings(chunks: Iterable[str], embedding_dim: int = 384,
+                     batch_size: int = 256) -> Tuple[TfidfEmbeddingModel, np.ndarray]:
+    """Fit a document's embedding model and embed its chunks.
+
+    Module-level so it can run in a worker process; the index write happens in the parent.
+    TF-IDF must see every chunk before fitting, so chunks are materialized once, but
+    dense vectors are produced batch by batch into a preallocated matrix.
+    """
+    chunks = list(chunks)
+    model = TfidfEmbeddingModel.fit(chunks, embedding_dim)
+    
+    embeddings = np.empty((len(chunks), embedding_dim), dtype=np.float32)
+    offset = 0
+    for batch in batched(chunks, batch_size):
+        embeddings[offset:offset + len(batch)] = model.embed(batch)
+        offset += len(batch)
+    
+    return model, embeddings
+
 
 class VectorStore:
-    """Manages FAISS vector store for document embeddings using TF-IDF"""
+    """Manages FAISS vector store for document embeddings"""
     
-    def __init__(self, model_name: str = "tfidf", store_dir: str = "vector_store"):
-        # Use TF-IDF for embeddings - pure Python, no DLL dependencies
-        self.vectorizer = TfidfVectorizer(max_features=384, ngram_range=(1, 2), min_df=1)
+    def __init__(self, embedder: Optional[Embedder] = None, store_dir: str = "vector_store",
+                 cache_max_bytes: int = 256 * 1024 * 1024, batch_size: int = 256,
+                 index_type: str = "auto", nprobe: int = 16, ef_search: int = 64, hnsw_m: int = 32,
+                 metric: str = "cosine", min_score: float = 0.0, retrieval_mode: str = "dense"):
+        # Without a shared embedder each new document fits its own TF-IDF model - pure Python,
+        # no DLL dependencies. Documents indexed with TF-IDF keep using their own model either way.
+        self.embedder = embedder
         self.store_dir = store_dir
-        self.embedding_dim = 384
-        self.fitted = False
+        self.embedding_dim = embedder.embedding_dim if embedder is not None else 384
+        self.batch_size = batch_size
+        
+        # FAISS index type for new documents ("auto" picks by vector count) and default search knobs
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.hnsw_m = hnsw_m
+        
+        # "cosine" builds inner-product indexes over normalized vectors; "l2" keeps the original
+        # L2 indexes. Either way, search scores are reported as cosine similarity.
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}. Supported: {', '.join(METRICS)}")
+        self.metric = metric
+        self.min_score = min_score
+        
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {retrieval_mode}. Supported: {', '.join(RETRIEVAL_MODES)}")
+        self.retrieval_mode = retrieval_mode
+        
+        # Loaded (index, chunks, model, metadata) tuples keyed by document_id, and
+        # (SparseIndex, chunks) tuples keyed by (document_id, "bm25"), sharing one budget
+        self.cache = LRUCache(max_bytes=cache_max_bytes, sizeof=self._estimate_entry_size)
         
         # Create store directory if it doesn't exist
         os.makedirs(store_dir, exist_ok=True)
     
-    def create_embeddings(self, texts: List[str]) -> np.ndarray:
-        """Generate embeddings for a list of texts using TF-IDF"""
-        if not self.fitted:
-            # Fit the vectorizer on the texts
-            embeddings = self.vectorizer.fit_transform(texts).toarray().astype(np.float32)
-            self.fitted = True
-        else:
-            # Transform using fitted vectorizer
-            embeddings = self.vectorizer.transform(texts).toarray().astype(np.float32)
+    def create_embeddings(self, model: EmbeddingModel, texts: List[str]) -> np.ndarray:
+        """Generate embeddings for a list of texts with a document's model"""
+        return model.embed(texts)
+    
+    def embed_chunks(self, chunks: List[str]) -> Tuple[EmbeddingModel, np.ndarray, int]:
+        """Embed a new document's chunks with the shared embedder, or a freshly fitted TF-IDF model.
         
-        # Pad or truncate to fixed dimension
-        if embeddings.shape[1] < self.embedding_dim:
-            padding = np.zeros((embeddings.shape[0], self.embedding_dim - embeddings.shape[1]), dtype=np.float32)
-            embeddings = np.hstack([embeddings, padding])
-        elif embeddings.shape[1] > self.embedding_dim:
-            embeddings = embeddings[:, :self.embedding_dim]
+        Also returns how many chunk embeddings were reused from the embedding cache; unchanged
+        chunks of a revised document are never embedded again.
+        """
+        if self.embedder is None:
+            return (*build_embeddings(chunks, self.embedding_dim, self.batch_size), 0)
         
-        return embeddings
+        embeddings = np.empty((len(chunks), self.embedding_dim), dtype=np.float32)
+        reused = 0
+        for start in range(0, len(chunks), self.batch_size):
+            batch = chunks[start:start + self.batch_size]
+            if isinstance(self.embedder, CachedEmbedder):
+                embeddings[start:start + self.batch_size], hits = self.embedder.embed_counted(batch)
+                reused += hits
+            else:
+                embeddings[start:start + self.batch_size] = self.embedder.embed(batch)
+        return self.embedder, embeddings, reused
     
-    def create_index(self, embeddings: np.ndarray) -> faiss.IndexFlatL2:
+    def create_index(self, embeddings: np.ndarray) -> faiss.Index:
         """Create a FAISS index from embeddings"""
         # Normalize embeddings for cosine similarity
-        faiss.normalize_L2(embeddings)
+        for start in range(0, len(embeddings), self.batch_size):
+            faiss.normalize_L2(embeddings[start:start + self.batch_size])
         
-        # Create a flat L2 index
-        index = faiss.IndexFlatL2(self.embedding_dim)
-        index.add(embeddings)
+        # Create an index of the configured type and metric, training it if needed
+        index_type = resolve_index_type(self.index_type, len(embeddings))
+        index = create_index(index_type, embeddings.shape[1], METRICS[self.metric], embeddings, self.hnsw_m)
+        
+        # Add embeddings in batches
+        for start in range(0, len(embeddings), self.batch_size):
+            index.add(embeddings[start:start + self.batch_size])
         
         return index
     
-    def save_index(self, document_id: str, index: faiss.IndexFlatL2, chunks: List[str], metadata: dict):
-        """Save FAISS index and associated data to disk"""
-        doc_dir = os.path.join(self.store_dir, document_id)
-        os.makedirs(doc_dir, exist_ok=True)
-        
-        # Save FAISS index
-        index_path = os.path.join(doc_dir, "index.faiss")
-        faiss.write_index(index, index_path)
+    def _move_aside(self, doc_dir: str) -> Optional[str]:
+        """Rename a document directory out of sight in one step; returns where it went"""
+        trash_dir = os.path.join(self.store_dir, f"{TRASH_PREFIX}{os.path.basename(doc_dir)}-{uuid.uuid4().hex[:8]}")
+        try:
+            os.rename(doc_dir, trash_dir)
+        except FileNotFoundError:
+            return None
+        return trash_dir
+    
+    def save_index(self, document_id: str, index: faiss.Index, chunks: List[str],
+                   model: EmbeddingModel, metadata: dict, sparse_index: Optional[SparseIndex] = None):
+        """Save FAISS index and associated data to disk.
         
-        # Save chunks
-        chunks_path = os.path.join(doc_dir, "chunks.pkl")
-        with open(chunks_path, 'wb') as f:
-            pickle.dump(chunks, f)
+        Everything is written to a staging directory, fsynced and sealed with a checksum manifest,
+        then renamed into place. A document directory is therefore either absent or complete:
+        no reader, and no restart after a crash, can see a half-written store. Readers that have
+        a replaced store's files memory-mapped keep their copy.
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        doc_dir = os.path.join(self.store_dir, document_id)
+        staging_dir = tempfile.mkdtemp(dir=self.store_dir, prefix=f"{STAGING_PREFIX}{document_id}-")
         
-        # Save vectorizer
-        vectorizer_path = os.path.join(doc_dir, "vectorizer.pkl")
-        with open(vectorizer_path, 'wb') as f:
-            pickle.dump(self.vectorizer, f)
+        try:
+            # Save FAISS index
+            faiss.write_index(index, os.path.join(staging_dir, "index.faiss"))
+            
+            # Save chunks as one contiguous text file plus an offset table
+            write_chunks(staging_dir, chunks)
+            
+            # Save BM25 index
+            if sparse_index is not None:
+                sparse_index.save(staging_dir)
+            
+            # Save vectorizer vocabulary and IDF; shared embedders only need their name recorded
+            if isinstance(model, TfidfEmbeddingModel):
+                model.save(staging_dir)
+            
+            # Save metadata
+            metadata = {
+                **metadata,
+                "embedder": model.name if isinstance(model, Embedder) else TFIDF_EMBEDDER,
+                "index_type": index_type_of(index),
+                "format": STORE_FORMAT
+            }
+            with open(os.path.join(staging_dir, "metadata.json"), 'w') as f:
+                json.dump(metadata, f, indent=2)
+            
+            seal_directory(staging_dir, STORE_FORMAT)
+            
+            # A directory cannot be renamed over a non-empty one, so a previous version moves aside first
+            trash_dir = self._move_aside(doc_dir)
+            os.rename(staging_dir, doc_dir)
+            fsync_dir(self.store_dir)
+            if trash_dir:
+                shutil.rmtree(trash_dir, ignore_errors=True)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+    
+    @staticmethod
+    def _chunks_size(chunks: Sequence[str]) -> int:
+        if isinstance(chunks, MappedChunks):
+            return chunks.nbytes
+        return sum(sys.getsizeof(chunk) for chunk in chunks)
+    
+    @staticmethod
+    def _estimate_entry_size(entry: tuple) -> int:
+        """Approximate in-memory size of a cached (index, chunks, model, metadata) or (SparseIndex, chunks) entry.
         
-        # Save metadata
-        metadata_path = os.path.join(doc_dir, "metadata.json")
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        Memory-mapped files count in full: every page may become resident.
+        """
+        if isinstance(entry[0], SparseIndex):
+            sparse_index, chunks = entry
+            return sparse_index.nbytes + VectorStore._chunks_size(chunks)
+        index, chunks, model, metadata = entry
+        size = index.ntotal * index.d * 4
+        size += VectorStore._chunks_size(chunks)
+        vocabulary = getattr(getattr(model, "vectorizer", None), "vocabulary_", None) or {}
+        # Each vocabulary entry holds a key string, an int and a dict slot
+        size += sum(sys.getsizeof(term) + 64 for term in vocabulary)
+        size += sys.getsizeof(json.dumps(metadata))
+        return size
     
-    def load_index(self, document_id: str) -> Tuple[faiss.IndexFlatL2, List[str], dict]:
-        """Load FAISS index and associated data from disk"""
+    def load_index(self, document_id: str) -> Tuple[faiss.Index, Sequence[str], EmbeddingModel, dict]:
+        """Load FAISS index and associated data, serving repeat loads from the LRU cache"""
+        entry = self.cache.get(document_id)
+        if entry is None:
+            entry = self._read_index(document_id)
+            self.cache.put(document_id, entry)
+        return entry
+    
+    def _document_dir(self, document_id: str) -> str:
+        """A document's directory, checking it exists in the current format"""
         doc_dir = os.path.join(self.store_dir, document_id)
-        
         if not os.path.exists(doc_dir):
             raise FileNotFoundError(f"Vector store for document {document_id} not found")
-        
-        # Load FAISS index
-        index_path = os.path.join(doc_dir, "index.faiss")
-        index = faiss.read_index(index_path)
-        
-        # Load chunks
-        chunks_path = os.path.join(doc_dir, "chunks.pkl")
-        with open(chunks_path, 'rb') as f:
-            chunks = pickle.load(f)
-        
-        # Load vectorizer
-        vectorizer_path = os.path.join(doc_dir, "vectorizer.pkl")
-        with open(vectorizer_path, 'rb') as f:
-            self.vectorizer = pickle.load(f)
-            self.fitted = True
+        if not chunks_exist(doc_dir) and os.path.exists(os.path.join(doc_dir, "chunks.pkl")):
+            raise ValueError(f"Document {document_id} is stored in the old pickle format; run migrate_store.py")
+        return doc_dir
+    
+    def _read_index(self, document_id: str) -> Tuple[faiss.Index, Sequence[str], EmbeddingModel, dict]:
+        """Memory-map FAISS index and chunk texts, and load the small remaining state, from disk"""
+        doc_dir = self._document_dir(document_id)
         
         # Load metadata
         metadata_path = os.path.join(doc_dir, "metadata.json")
         with open(metadata_path, 'r') as f:
             metadata = json.load(f)
         
-        return index, chunks, metadata
+        # Map FAISS index; pages are read on demand by the search itself
+        index_type = metadata.get("index_type", "flat")
+        flags = MMAP_IVF_FLAGS if index_type.startswith("ivf") else MMAP_FLAT_FLAGS
+        index = faiss.read_index(os.path.join(doc_dir, "index.faiss"), flags)
+        
+        # Map chunk texts; only returned chunks are ever decoded
+        chunks = MappedChunks(doc_dir)
+        
+        # Load vectorizer, or check the document shares the configured embedder's vector space
+        if TfidfEmbeddingModel.exists(doc_dir):
+            model = TfidfEmbeddingModel.load(doc_dir)
+        elif self.embedder is not None and metadata.get("embedder") == self.embedder.name:
+            model = self.embedder
+        else:
+            raise ValueError(
+                f"Document {document_id} was embedded with {metadata.get('embedder')}, "
+                f"but the configured embedder is {self.embedder.name if self.embedder else TFIDF_EMBEDDER}"
+            )
+        
+        return index, chunks, model, metadata
+    
+    def load_chunks(self, document_id: str) -> Sequence[str]:
+        """A document's chunk texts, whichever embedder indexed it"""
+        entry = self.cache.get(document_id) or self.cache.get((document_id, "bm25"))
+        if entry is not None:
+            return entry[1]
+        return MappedChunks(self._document_dir(document_id))
+    
+    def load_sparse_index(self, document_id: str) -> Tuple[SparseIndex, Sequence[str]]:
+        """Load a document's BM25 index and chunks, building it for documents stored before it existed"""
+        key = (document_id, "bm25")
+        entry = self.cache.get(key)
+        if entry is None:
+            chunks = self.load_chunks(document_id)
+            doc_dir = os.path.join(self.store_dir, document_id)
+            if SparseIndex.exists(doc_dir):
+                sparse_index = SparseIndex.load(doc_dir)
+            else:
+                sparse_index = SparseIndex.build(chunks)
+                self._add_files(doc_dir, sparse_index.save)
+            entry = (sparse_index, chunks)
+            self.cache.put(key, entry)
+        return entry
+    
+    def _embed_queries(self, model: EmbeddingModel, queries: List[str]) -> np.ndarray:
+        query_embeddings = self.create_embeddings(model, queries)
+        faiss.normalize_L2(query_embeddings)
+        return query_embeddings
     
-    def search(self, document_id: str, query: str, top_k: int = 3) -> List[Tuple[str, float, int]]:
-        """Search for similar chunks in the vector store"""
+    def embed_queries(self, document_id: str, queries: List[str]) -> np.ndarray:
+        """L2-normalized query embeddings in a document's vector space"""
+        _, _, model, _ = self.load_index(document_id)
+        return self._embed_queries(model, queries)
+    
+    def search(self, document_id: str, query: str, top_k: int = 3, min_score: float = None,
+               nprobe: int = None, ef_search: int = None, mode: str = None) -> List[Tuple[str, float, int]]:
+        """Search for similar chunks in the vector store.
+        
+        Chunks scoring below min_score (cosine similarity) are dropped.
+        nprobe (IVF) and ef_search (HNSW) override the defaults for this query only.
+        mode overrides the default retrieval mode ("dense" or "sparse").
+        """
+        return self.search_many(document_id, [query], top_k, min_score, nprobe, ef_search, mode)[0]
+    
+    def search_many(self, document_id: str, queries: List[str], top_k: int = 3, min_score: float = None,
+                    nprobe: int = None, ef_search: int = None, mode: str = None) -> List[List[Tuple[str, float, int]]]:
+        """Search one document for many queries with a single embedding and FAISS call, or one sparse product.
+        
+        Returns one (chunk_text, score, chunk_index) list per query, best first. Dense scores are
+        cosine similarities; sparse scores are unbounded BM25 scores, so min_score does not apply.
+        """
+        mode = mode or self.retrieval_mode
+        if mode == "sparse":
+            return self._search_sparse(document_id, queries, top_k)
+        if mode != "dense":
+            raise ValueError(f"Unknown retrieval mode: {mode}. Supported: {', '.join(RETRIEVAL_MODES)}")
+        
         # Load the index
-        index, chunks, metadata = self.load_index(document_id)
+        index, chunks, model, metadata = self.load_index(document_id)
         
-        # Create query embedding
-        query_embedding = self.create_embeddings([query])
-        faiss.normalize_L2(query_embedding)
+        # Embed every query at once with the document's own model
+        query_embeddings = self._embed_queries(model, queries)
         
         # Search
-        distances, indices = index.search(query_embedding, min(top_k, len(chunks)))
+        params = search_parameters(index, nprobe=nprobe or self.nprobe, ef_search=ef_search or self.ef_search)
+        scores, indices = index.search(query_embeddings, min(top_k, len(chunks)), params=params)
+        
+        if index.metric_type == faiss.METRIC_L2:
+            # Squared L2 distance between unit vectors is 2 - 2 * cosine
+            scores = 1.0 - scores / 2.0
+        
+        # Keep real hits at or above the cutoff; FAISS pads missing results with -1
+        min_score = self.min_score if min_score is None else min_score
+        keep = (indices >= 0) & (indices < len(chunks)) & (scores >= min_score)
         
-        # Prepare results with relevance scores
-        results = []
-        for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-            if idx < len(chunks):
-                # Convert L2 distance to similarity score (inverse relationship)
-                similarity_score = 1.0 / (1.0 + distance)
-                results.append((chunks[idx], float(similarity_score), int(idx)))
+        return [
+            [(chunks[idx], score, idx) for idx, score in zip(row_indices[row_keep].tolist(), row_scores[row_keep].tolist())]
+            for row_scores, row_indices, row_keep in zip(scores, indices, keep)
+        ]
+    
+    def _search_sparse(self, document_id: str, queries: List[str], top_k: int) -> List[List[Tuple[str, float, int]]]:
+        sparse_index, chunks = self.load_sparse_index(document_id)
+        return [
+            [(chunks[idx], score, idx) for idx, score in hits]
+            for hits in sparse_index.search(queries, top_k)
+        ]
+    
+    def link_document(self, source_id: str, document_id: str, metadata: dict) -> Tuple[dict, int]:
+        """Store a new document that shares an existing document's processed index.
         
-        return results
+        Index, chunk and model files are hard-linked rather than copied; the filesystem's link
+        count keeps them until the last document using them is deleted. Nothing ever rewrites a
+        stored file in place, so sharing is safe. Only metadata.json is the new document's own.
+        Returns the new metadata and the number of bytes linked instead of written.
+        
+        Linking again is a no-op once the document has a valid store, so an ingestion job
+        restarted after it linked returns that store; an invalid one is replaced.
+        """
+        doc_dir = os.path.join(self.store_dir, document_id)
+        if os.path.isdir(doc_dir) and self._check_document(doc_dir) is None:
+            with open(os.path.join(doc_dir, "metadata.json"), 'r') as f:
+                return json.load(f), 0
+        source_dir = self._document_dir(source_id)
+        staging_dir = tempfile.mkdtemp(dir=self.store_dir, prefix=f"{STAGING_PREFIX}{document_id}-")
+        linked = 0
+        try:
+            for name in os.listdir(source_dir):
+                if name in ("metadata.json", MANIFEST_FILE):
+                    continue
+                source, target = os.path.join(source_dir, name), os.path.join(staging_dir, name)
+                try:
+                    os.link(source, target)
+                    linked += os.path.getsize(target)
+                except OSError:
+                    # Filesystems without hard links get a copy
+                    shutil.copy2(source, target)
+            
+            with open(os.path.join(source_dir, "metadata.json"), 'r') as f:
+                metadata = {**json.load(f), **metadata}
+            with open(os.path.join(staging_dir, "metadata.json"), 'w') as f:
+                json.dump(metadata, f, indent=2)
+            
+            seal_directory(staging_dir, STORE_FORMAT)
+            trash_dir = self._move_aside(doc_dir)
+            os.rename(staging_dir, doc_dir)
+            fsync_dir(self.store_dir)
+            if trash_dir:
+                shutil.rmtree(trash_dir, ignore_errors=True)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        return metadata, linked
+    
+    def _add_files(self, doc_dir: str, write):
+        """Add files to a sealed document directory: write(directory) stages them, and each is renamed in"""
+        staging_dir = tempfile.mkdtemp(dir=self.store_dir, prefix=f"{STAGING_PREFIX}{os.path.basename(doc_dir)}-")
+        try:
+            write(staging_dir)
+            for name in os.listdir(staging_dir):
+                with open(os.path.join(staging_dir, name), 'rb') as f:
+                    os.fsync(f.fileno())
+                os.replace(os.path.join(staging_dir, name), os.path.join(doc_dir, name))
+            seal_directory(doc_dir, STORE_FORMAT)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
     
     def delete_index(self, document_id: str):
         """Delete vector store for a document"""
-        doc_dir = os.path.join(self.store_dir, document_id)
-        if os.path.exists(doc_dir):
-            # Remove all files in the directory
-            for file in os.listdir(doc_dir):
-                file_path = os.path.join(doc_dir, file)
-                os.remove(file_path)
-            # Remove the directory
-            os.rmdir(doc_dir)
+        self.cache.invalidate(document_id)
+        self.cache.invalidate((document_id, "bm25"))
+        # Move the directory aside first, so a concurrent reader never sees it partly removed
+        trash_dir = self._move_aside(os.path.join(self.store_dir, document_id))
+        if trash_dir:
+            shutil.rmtree(trash_dir)
+    
+    def _check_document(self, doc_dir: str) -> Optional[str]:
+        """Why a document directory cannot be served, or None.
+        
+        Sealed directories are verified against their manifest. Unsealed ones predate manifests:
+        if every required file is present they are sealed as they are.
+        """
+        if has_manifest(doc_dir):
+            return verify_directory(doc_dir, STORE_FORMAT)
+        if any(os.path.exists(os.path.join(doc_dir, name)) for name in LEGACY_FILES):
+            # Migration removes the pickles last, so any left over means it did not finish
+            return "not migrated from the pickle format"
+        missing = [name for name in REQUIRED_FILES if not os.path.isfile(os.path.join(doc_dir, name))]
+        if missing:
+            return f"missing {', '.join(missing)}"
+        try:
+            with open(os.path.join(doc_dir, "metadata.json"), 'r') as f:
+                json.load(f)
+        except ValueError as e:
+            return f"unreadable metadata.json: {e}"
+        seal_directory(doc_dir, STORE_FORMAT)
+        return None
+    
+    def quarantine_incomplete(self, workers: int = 4) -> dict:
+        """Startup scan: verify every document directory in parallel and quarantine invalid ones.
+        
+        Leftover staging and trash directories from interrupted saves and deletes are removed.
+        Invalid documents are moved under .quarantine/ for inspection rather than deleted.
+        Returns the quarantined document IDs with the reason for each.
+        """
+        if not os.path.isdir(self.store_dir):
+            return {}
+        names = []
+        for name in os.listdir(self.store_dir):
+            if name.startswith((STAGING_PREFIX, TRASH_PREFIX)):
+                shutil.rmtree(os.path.join(self.store_dir, name), ignore_errors=True)
+            elif not name.startswith(".") and os.path.isdir(os.path.join(self.store_dir, name)):
+                names.append(name)
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            reasons = dict(zip(names, pool.map(
+                lambda name: self._check_document(os.path.join(self.store_dir, name)), names
+            )))
+        
+        quarantined = {name: reason for name, reason in reasons.items() if reason}
+        if quarantined:
+            quarantine_dir = os.path.join(self.store_dir, QUARANTINE_DIR)
+            os.makedirs(quarantine_dir, exist_ok=True)
+            for name in quarantined:
+                self.cache.invalidate(name)
+                self.cache.invalidate((name, "bm25"))
+                os.rename(os.path.join(self.store_dir, name),
+                          os.path.join(quarantine_dir, f"{name}-{uuid.uuid4().hex[:8]}"))
+            fsync_dir(self.store_dir)
+        return quarantined
     
     def process_and_store(self, document_id: str, chunks: List[str], metadata: dict):
         """Complete pipeline: embed, index, and store"""
-        # Create embeddings
-        embeddings = self.create_embeddings(chunks)
-        
-        # Create index
+        model, embeddings, _ = self.embed_chunks(chunks)
+        return self.store_embeddings(document_id, chunks, model, embeddings, metadata)
+    
+    def store_embeddings(self, document_id: str, chunks: List[str], model: EmbeddingModel,
+                         embeddings: np.ndarray, metadata: dict):
+        """Index precomputed embeddings and store them with the chunks and model"""
+        # Create indexes
         index = self.create_index(embeddings)
+        sparse_index = SparseIndex.build(chunks)
         
         # Save everything
-        self.save_index(document_id, index, chunks, metadata)
+        self.save_index(document_id, index, chunks, model, metadata, sparse_index)
+        
+        # Drop any stale cached copy of a previous index for this document
+        self.cache.invalidate(document_id)
+        self.cache.invalidate((document_id, "bm25"))
         
         return len(chunks)
@@ -0,0 +1,2 @@
+# test_api.py drives a running server and is run directly, not collected by pytest
+collect_ignore = ["test_api.py"]
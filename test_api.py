@@ -3,9 +3,11 @@ API Test Script for RAG Document Q&A Application
 Run this script to test all API endpoints
 """
 
+import io
 import requests
 import json
 import time
+import zipfile
 from pathlib import Path
 
 BASE_URL = "http://localhost:8000"
@@ -169,22 +171,54 @@ def test_query(document_id, question):
         return None
 
 def test_query_batch(document_id, questions):
-    """Test multiple queries"""
+    """Test multiple queries in one batch request"""
     print("\n" + "="*60)
     print("TEST 4: Query Document")
     print("="*60)
     
-    results = []
-    for question in questions:
-        result = test_query(document_id, question)
-        if result:
+    try:
+        payload = {
+            "queries": [{"document_id": document_id, "question": question} for question in questions]
+        }
+        
+        start_time = time.time()
+        response = requests.post(
+            f"{BASE_URL}/api/documents/query/batch",
+            json=payload,
+            timeout=60
+        )
+        elapsed_time = time.time() - start_time
+        
+        if response.status_code != 200:
+            print_error(f"Batch query failed: {response.text}")
+            return []
+        
+        data = response.json()
+        results = []
+        for result in data['results']:
+            print(f"\n{'─'*60}")
+            print_info(f"Question: {result['question']}")
+            if result['error']:
+                print_error(f"Query failed: {result['error']}")
+                continue
+            print_success("Query successful!")
+            print(f"\n  💬 Answer:")
+            print(f"  {result['answer']}\n")
+            print(f"  ⏱️  Retrieval: {result['retrieval_time']}s, generation: {result['generation_time']}s")
+            print(f"  📚 Sources used: {len(result['sources'])} chunk(s)")
             results.append(result)
-        time.sleep(1)  # Rate limiting
-    
-    if results:
+        
         print_success(f"\nCompleted {len(results)}/{len(questions)} queries successfully")
-    
-    return results
+        print(f"  ⏱️  Batch processing time: {data['processing_time']}s")
+        print(f"  ⏱️  Total time: {elapsed_time:.2f}s")
+        return results
+        
+    except requests.exceptions.Timeout:
+        print_error("Batch query timeout - may need to increase timeout or check Groq API")
+        return []
+    except Exception as e:
+        print_error(f"Batch query error: {str(e)}")
+        return []
 
 def test_history(document_id):
     """Test query history"""
@@ -218,10 +252,241 @@ def test_history(document_id):
         print_warning(f"Query history error: {str(e)}")
         return []
 
+def test_async_upload(file_path):
+    """Test background upload and job polling"""
+    print("\n" + "="*60)
+    print("TEST 6: Background Upload Job")
+    print("="*60)
+    
+    try:
+        with open(file_path, 'rb') as f:
+            response = requests.post(
+                f"{BASE_URL}/api/documents/upload/async",
+                files={'file': f},
+                timeout=60
+            )
+        
+        if response.status_code != 202:
+            print_error(f"Background upload failed: {response.text}")
+            return None
+        
+        job = response.json()
+        print_success(f"Job {job['job_id']} accepted ({job['status']})")
+        
+        deadline = time.time() + 120
+        while job['status'] not in ("completed", "failed") and time.time() < deadline:
+            time.sleep(0.5)
+            response = requests.get(f"{BASE_URL}/api/jobs/{job['job_id']}", timeout=10)
+            if response.status_code != 200:
+                print_error(f"Job status failed: {response.text}")
+                return None
+            job = response.json()
+            print(f"  ⏳ {job['stage']} ({job['progress']:.0%})")
+        
+        if job['status'] != "completed":
+            print_error(f"Job did not complete: {job['error'] or job['status']}")
+            return None
+        
+        print_success(f"Job completed: {job['result']['chunk_count']} chunk(s)")
+        if job['result']['duplicate_of']:
+            print(f"  ♻️  Reused the index of {job['result']['duplicate_of']}")
+        
+        response = requests.get(f"{BASE_URL}/api/jobs/not-a-job", timeout=10)
+        if response.status_code == 404:
+            print_success("Unknown job returns 404")
+        else:
+            print_error(f"Unknown job returned {response.status_code}")
+        return job['document_id']
+        
+    except Exception as e:
+        print_error(f"Background upload error: {str(e)}")
+        return None
+
+def test_corpus_query(question, document_ids):
+    """Test a question across documents, then restricted to some of them"""
+    print("\n" + "="*60)
+    print("TEST 7: Corpus Query")
+    print("="*60)
+    print_info(f"Question: {question}")
+    
+    try:
+        response = requests.post(
+            f"{BASE_URL}/api/corpus/query",
+            json={"question": question},
+            timeout=30
+        )
+        if response.status_code != 200:
+            print_error(f"Corpus query failed: {response.text}")
+            return None
+        
+        data = response.json()
+        print_success("Corpus query successful!")
+        print(f"\n  💬 Answer:")
+        print(f"  {data['answer']}\n")
+        print(f"  ⏱️  Processing time: {data['processing_time']}s")
+        for i, source in enumerate(data['sources'], 1):
+            print(f"    {i}. {source['document_name']} chunk {source['chunk_index']} "
+                  f"(relevance: {source['relevance_score']:.2%})")
+        
+        response = requests.post(
+            f"{BASE_URL}/api/corpus/query",
+            json={"question": question, "document_ids": document_ids},
+            timeout=30
+        )
+        if response.status_code != 200:
+            print_error(f"Restricted corpus query failed: {response.text}")
+            return None
+        outside = [s for s in response.json()['sources'] if s['document_id'] not in document_ids]
+        if outside:
+            print_error(f"Restricted corpus query returned {len(outside)} chunk(s) from other documents")
+        else:
+            print_success(f"Restricted corpus query stayed within {len(document_ids)} document(s)")
+        return data
+        
+    except Exception as e:
+        print_error(f"Corpus query error: {str(e)}")
+        return None
+
+def test_search_batch(document_id, questions):
+    """Test retrieving chunks for many questions in one request"""
+    print("\n" + "="*60)
+    print("TEST 8: Batch Search")
+    print("="*60)
+    
+    try:
+        response = requests.post(
+            f"{BASE_URL}/api/documents/search/batch",
+            json={"document_id": document_id, "questions": questions, "top_k": 2},
+            timeout=30
+        )
+        if response.status_code != 200:
+            print_error(f"Batch search failed: {response.text}")
+            return []
+        
+        data = response.json()
+        for result in data['results']:
+            print(f"\n{'─'*60}")
+            print_info(f"Question: {result['question']}")
+            for i, source in enumerate(result['sources'], 1):
+                print(f"    {i}. Chunk {source['chunk_index']} (relevance: {source['relevance_score']:.2%})")
+        
+        if len(data['results']) == len(questions) and all(len(r['sources']) <= 2 for r in data['results']):
+            print_success(f"\nSearched {len(questions)} questions in {data['processing_time']}s")
+        else:
+            print_error("Batch search returned the wrong number of results")
+        
+        response = requests.post(
+            f"{BASE_URL}/api/documents/search/batch",
+            json={"document_id": "not-a-document", "questions": questions[:1]},
+            timeout=30
+        )
+        if response.status_code == 404:
+            print_success("Unknown document returns 404")
+        else:
+            print_error(f"Unknown document returned {response.status_code}")
+        return data['results']
+        
+    except Exception as e:
+        print_error(f"Batch search error: {str(e)}")
+        return []
+
+def test_query_stream(document_id, question):
+    """Test streaming an answer as Server-Sent Events"""
+    print("\n" + "="*60)
+    print("TEST 9: Streamed Query")
+    print("="*60)
+    print_info(f"Question: {question}")
+    
+    try:
+        response = requests.post(
+            f"{BASE_URL}/api/documents/query/stream",
+            json={"document_id": document_id, "question": question},
+            stream=True,
+            timeout=30
+        )
+        if response.status_code != 200:
+            print_error(f"Streamed query failed: {response.text}")
+            return None
+        
+        events = []
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((event, json.loads(line[len("data: "):])))
+        
+        names = [name for name, _ in events]
+        if names[-1:] == ["error"]:
+            print_error(f"Stream ended with an error: {events[-1][1]['detail']}")
+            return None
+        if names[:1] != ["sources"] or names[-1:] != ["done"] or "token" not in names:
+            print_error(f"Unexpected event sequence: {names}")
+            return None
+        
+        done = events[-1][1]
+        streamed = "".join(data['text'] for name, data in events if name == "token")
+        print_success("Streamed query successful!")
+        print(f"\n  💬 Answer ({names.count('token')} token event(s)):")
+        print(f"  {done['answer']}\n")
+        print(f"  ⏱️  First token after {done['time_to_first_token']}s, total {done['total_time']}s")
+        print(f"  📚 Sources used: {len(events[0][1]['sources'])} chunk(s)")
+        if streamed != done['answer']:
+            print_error("Streamed tokens do not add up to the final answer")
+        return done
+        
+    except Exception as e:
+        print_error(f"Streamed query error: {str(e)}")
+        return None
+
+def test_bulk_upload(file_paths):
+    """Test uploading plain files and a zip archive of them in one request"""
+    print("\n" + "="*60)
+    print("TEST 10: Bulk Upload")
+    print("="*60)
+    
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, 'w') as z:
+        for path in file_paths:
+            z.write(path, f"docs/{Path(path).name}")
+        z.writestr("docs/notes.md", "Not a supported type")
+    
+    files = [('files', (Path(path).name, open(path, 'rb'))) for path in file_paths]
+    files.append(('files', ('sample_documents.zip', archive.getvalue())))
+    try:
+        response = requests.post(f"{BASE_URL}/api/documents/bulk", files=files, timeout=120)
+        
+        if response.status_code != 200:
+            print_error(f"Bulk upload failed: {response.text}")
+            return []
+        
+        data = response.json()
+        for result in data['results']:
+            detail = result['error'] or f"{result['chunk_count']} chunks"
+            if result['duplicate_of']:
+                detail += f", duplicate of {result['duplicate_of']}"
+            print(f"  {result['status']:>9}  {result['filename']}  ({detail})")
+        
+        expected = len(file_paths) * 2
+        if data['completed'] == expected and data['skipped'] == 1 and data['failed'] == 0:
+            print_success(f"Bulk upload completed {data['completed']} document(s) "
+                          f"at {data['documents_per_second']} docs/s")
+        else:
+            print_error(f"Expected {expected} completed and 1 skipped, got {data['completed']} completed, "
+                        f"{data['skipped']} skipped and {data['failed']} failed")
+        return [result['document_id'] for result in data['results'] if result['document_id']]
+        
+    except Exception as e:
+        print_error(f"Bulk upload error: {str(e)}")
+        return []
+    finally:
+        for _, (_, f) in files[:-1]:
+            f.close()
+
 def test_delete(document_id):
     """Test deleting a document"""
     print("\n" + "="*60)
-    print("TEST 6: Delete Document")
+    print("TEST 11: Delete Document")
     print("="*60)
     
     print_warning(f"About to delete document: {document_id}")
@@ -287,8 +552,27 @@ def run_full_test_suite():
     # Test 5: History
     test_history(doc_id)
     
-    # Test 6: Delete (optional)
+    # Test 6: Background upload
+    job_doc_id = test_async_upload(str(sample_file))
+    
+    # Test 7: Corpus query
+    test_corpus_query(questions[0], [doc_id])
+    
+    # Test 8: Batch search
+    test_search_batch(doc_id, questions)
+    
+    # Test 9: Streamed query
+    test_query_stream(doc_id, questions[1])
+    
+    # Test 10: Bulk upload
+    bulk_doc_ids = test_bulk_upload(sorted(str(path) for path in SAMPLE_DOCS_DIR.glob("*.txt")))
+    if bulk_doc_ids:
+        print_info(f"Bulk upload left {len(bulk_doc_ids)} document(s) in place")
+    
+    # Test 11: Delete (optional)
     test_delete(doc_id)
+    if job_doc_id:
+        test_delete(job_doc_id)
     
     # Final summary
     print("\n" + "🎉 " + "="*58 + " 🎉")